@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import BrokenExecutor, Future
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    # multiprocessing is only imported once a pool is actually used
+    from concurrent.futures import ProcessPoolExecutor
+
+T = TypeVar("T")
+
+
+def parse_workers(value: str) -> int:
+    """AGGREGATION_WORKERS: a count, or 'auto' for every core but one"""
+    if value.strip().lower() == "auto":
+        return max(0, (os.cpu_count() or 1) - 1)
+    return max(0, int(value))
+
+
+class AggregationPool:
+    """Worker processes that turn raw event pages into mergeable partial aggregates"""
+
+    def __init__(self, workers: int = 0):
+        # 0 keeps aggregation in the calling thread
+        self.workers = max(0, workers)
+        self._executor: Optional["ProcessPoolExecutor"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _pool(self) -> "ProcessPoolExecutor":
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._executor is None:
+                # fork, so workers start with the modules already loaded instead
+                # of re-importing app.py, but only while no other thread could
+                # hold a lock mid-fork; a pool replaced later uses a forkserver
+                method = "fork" if threading.active_count() == 1 else "forkserver"
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context(method)
+                )
+                if method == "fork":
+                    # Fork every worker now, before the executor's own thread
+                    self._executor.submit(os.getpid).result()
+            return self._executor
+
+    def start(self) -> None:
+        """Start the workers; call before the server starts any threads"""
+        if self.enabled:
+            self._pool()
+
+    def map(
+        self, fn: Callable[..., T], pages: Iterable[bytes], *args: Any
+    ) -> Iterator[T]:
+        """fn(*args, page) for every page, in order, with a bounded number in flight"""
+        if not self.enabled:
+            for page in pages:
+                yield fn(*args, page)
+            return
+
+        pool = self._pool()
+        pending: Deque["Future[T]"] = deque()
+        try:
+            for page in pages:
+                pending.append(pool.submit(fn, *args, page))
+                # Two per worker keeps them busy while the next pages download
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BrokenExecutor:
+            # A worker died (e.g. OOM killed); start a fresh pool next time
+            with self._lock:
+                self._executor = None
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -1,138 +1,756 @@
-from flask import Flask, jsonify, send_from_directory, request
+from flask import Flask, Response, g, jsonify, send_from_directory, request
 from flask_cors import CORS
-import requests
 import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from aggregation_pool import AggregationPool, parse_workers
 from config_manager import ConfigManager
+from display_activity import DisplayActivity, adaptive_interval
+from event_batch import EventBatch
+from handoff import HandoffServer
 from ota_manager import OTAManager
-
+from stats_cache import StatsCache
+from stats_history import StatsHistory, parse_range
+from rollups import CalendarRollups, rollup_partial
+from boot_orchestrator import BootOrchestrator
+from fleet import FleetHub, FleetSubscriber, get_fleet_settings
+from health import HealthMonitor
+from history_backfill import HistoryBackfill
+from profiler import RequestProfiler
+from posthog_client import PostHogClient, PostHogError
+from project_fetcher import ProjectFetcher, load_projects, snapshot_name
+from rate_budget import BACKGROUND, RateBudgeter
+from release_manager import ReleaseManager
+from repo_maintenance import RepoMaintenance
+from stats_engine import merge_stats
+from wire_format import NegotiatingJSONProvider
+from telemetry import (
+    REGISTRY,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    STATS_CACHE_REQUESTS,
+)
+
+# Stays eager: every setting below is read from the environment at import.
+# python-dotenv costs about 3 ms of startup (bench_startup.py)
 load_dotenv()
 
 # Configure Flask to serve React build files
 app = Flask(__name__, static_folder="../frontend/build", static_url_path="")
+# jsonify() answers in CBOR or MessagePack when the Accept header prefers it
+app.json = NegotiatingJSONProvider(app)
 
+# Stays eager: Flask refuses new request hooks once the first request is
+# served. flask_cors costs about 1 ms of startup
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # PostHog configuration
 POSTHOG_API_KEY = os.getenv("POSTHOG_API_KEY")
 POSTHOG_PROJECT_ID = os.getenv("POSTHOG_PROJECT_ID")
 POSTHOG_HOST = os.getenv("POSTHOG_HOST", "https://app.posthog.com")
-
-# Initialize managers
-config_manager = ConfigManager()
+UPSTREAM_TIMEOUT = float(os.getenv("POSTHOG_TIMEOUT", "10"))
+POSTHOG_PAGE_SIZE = int(os.getenv("POSTHOG_PAGE_SIZE", "1000"))
+# Pages read per refresh, newest first; with more events than fit, the stats
+# cover the newest POSTHOG_MAX_PAGES * POSTHOG_PAGE_SIZE (0 reads every page)
+POSTHOG_MAX_PAGES = int(os.getenv("POSTHOG_MAX_PAGES", "10"))
+# Projects fetched at once; refresh time tracks the slowest project
+POSTHOG_MAX_WORKERS = int(os.getenv("POSTHOG_MAX_WORKERS", "4"))
+# 64 KB response chunks read ahead of parsing per project (0 disables)
+POSTHOG_PREFETCH_DEPTH = int(os.getenv("POSTHOG_PREFETCH_DEPTH", "8"))
+
+# Seconds a computed stats payload is reused before PostHog is queried again
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))
+# PostHog request budget per host; refreshes slow down when it pushes back
+POSTHOG_RATE_LIMIT = float(os.getenv("POSTHOG_RATE_LIMIT", "240"))
+POSTHOG_RATE_BURST = float(os.getenv("POSTHOG_RATE_BURST", "60"))
+# Processes that parse and aggregate backfill pages ("auto": all cores but one)
+AGGREGATION_WORKERS = parse_workers(os.getenv("AGGREGATION_WORKERS", "0"))
+# Days of hourly history rebuilt from PostHog on first run (0 disables)
+HISTORY_BACKFILL_DAYS = float(os.getenv("HISTORY_BACKFILL_DAYS", "7"))
+DASHBOARD_PORT = int(os.getenv("DASHBOARD_PORT", "5000"))
+
+# Initialize managers. Their constructors only record settings, so they stay
+# eager: none runs git or touches the network, and each takes microseconds.
+# ConfigManager reads the small config file the data directory comes from;
+# the stats snapshot and history files are read on first use
+# Releases in side-by-side worktrees share the main checkout's config file
+config_manager = ConfigManager(os.getenv("DASHBOARD_CONFIG_FILE", "device_config.json"))
 ota_manager = OTAManager(config_manager)
+server = HandoffServer(app, "0.0.0.0", DASHBOARD_PORT)
+release_manager = ReleaseManager(ota_manager, hand_over=server.hand_over)
+ota_manager.release_manager = release_manager
+repo_maintenance = RepoMaintenance(ota_manager)
+stats_cache = StatsCache(
+    os.path.join(config_manager.get_data_dir(), "stats_snapshot.json")
+)
+stats_history = StatsHistory(
+    os.path.join(config_manager.get_data_dir(), "stats_history.json")
+)
+boot_orchestrator = BootOrchestrator(
+    ota_manager, os.path.join(config_manager.get_data_dir(), "boot_state.json")
+)
+request_profiler = RequestProfiler()
+health_monitor = HealthMonitor(
+    {
+        "config": os.path.dirname(os.path.abspath(config_manager.config_file)),
+        "data": config_manager.get_data_dir(),
+    }
+)
+aggregation_pool = AggregationPool(AGGREGATION_WORKERS)
+rollups = CalendarRollups(config_manager.get_section("device").get("timezone", "UTC"))
+rollup_backfills: Set[str] = set()
+rollup_backfills_lock = threading.Lock()
+display_activity = DisplayActivity()
+# Held while the combined snapshot is refreshed, so a request arriving during
+# the warm-up after a wake waits for it instead of querying PostHog again
+stats_refresh = threading.Lock()
+
+
+def backfill_week(
+    client: PostHogClient, project: str, after: str, before: str, generation: int
+) -> None:
+    """Fold the part of this week older than the 24h window into the rollups"""
+    partial = CalendarRollups(rollups.timezone_name)
+    if aggregation_pool.enabled:
+        bodies = client.iter_page_bodies(after, before, BACKGROUND)
+        for buckets in aggregation_pool.map(
+            rollup_partial, bodies, partial.timezone_name, project
+        ):
+            partial.merge_buckets(buckets)
+    else:
+        for page in client.iter_event_chunks(after, before, BACKGROUND):
+            partial.add_events(project, page)
+    rollups.apply_backfill(project, partial, generation)
 
 
-@app.route("/api/stats")
-def get_stats():
-    """Get basic PostHog statistics"""
-    if not POSTHOG_API_KEY or not POSTHOG_PROJECT_ID:
-        return jsonify({"error": "PostHog credentials not configured"})
-
+def backfill_rollups(project: str, week: Optional[Tuple[str, str, int]]) -> None:
+    """Fetch what the refreshes left out of the rollups for one project"""
     try:
-        headers = {
-            "Authorization": f"Bearer {POSTHOG_API_KEY}",
-            "Content-Type": "application/json",
-        }
+        client = project_fetcher.clients.get(project)
+        if client is None:
+            return
+        if week is not None:
+            backfill_week(client, project, *week)
+        # Ranges skipped by page-capped refreshes, oldest first
+        while True:
+            pending = rollups.next_gap(project)
+            if pending is None:
+                break
+            gap, generation = pending
+            partial = CalendarRollups(rollups.timezone_name)
+            for page in client.iter_event_chunks(*gap.bounds(), BACKGROUND):
+                partial.add_events(project, page, keep=gap.covers)
+            if not rollups.apply_gap(project, gap, partial, generation):
+                break
+    except Exception as e:
+        print(f"Error backfilling rollups for {project}: {e}")
+    finally:
+        with rollup_backfills_lock:
+            rollup_backfills.discard(project)
+
+
+def ingest_rollup_events(project: str, events: EventBatch, after: str):
+    """Fold newly fetched events into the calendar rollups"""
+    rollups.set_timezone(config_manager.get_section("device").get("timezone") or "UTC")
+    rollups.ingest(project, events, after)
+
+    week = rollups.backfill_range(project, datetime.now(timezone.utc))
+    if week is None and rollups.next_gap(project) is None:
+        return
+    with rollup_backfills_lock:
+        if project in rollup_backfills:
+            return
+        rollup_backfills.add(project)
+    threading.Thread(
+        target=backfill_rollups,
+        args=(project, week),
+        name=f"rollup-backfill-{project}",
+        daemon=True,
+    ).start()
+
+
+upstream_budget = RateBudgeter(POSTHOG_RATE_LIMIT, POSTHOG_RATE_BURST)
+project_fetcher = ProjectFetcher(
+    POSTHOG_MAX_WORKERS,
+    health_monitor=health_monitor,
+    event_sink=ingest_rollup_events,
+    budget=upstream_budget,
+    prefetch_depth=POSTHOG_PREFETCH_DEPTH,
+    max_pages=POSTHOG_MAX_PAGES or None,
+)
+project_caches: Dict[str, StatsCache] = {}
+history_backfill = HistoryBackfill(
+    os.path.join(config_manager.get_data_dir(), "history_backfill.json"),
+    stats_history,
+    lambda: dict(project_fetcher.clients),
+    days=HISTORY_BACKFILL_DAYS,
+    pool=aggregation_pool,
+)
+fleet_hub = FleetHub()
+fleet_subscriber = FleetSubscriber(
+    socket.gethostname(), timeout=UPSTREAM_TIMEOUT, health_monitor=health_monitor
+)
+REGISTRY.gauge(
+    "dashboard_stats_snapshot_age_seconds",
+    "Age of the stats snapshot served to displays",
+    callback=stats_cache.age,
+)
+REGISTRY.gauge(
+    "dashboard_history_backfill_progress",
+    "Share of the history backfill range completed (0-1)",
+    callback=lambda: history_backfill.get_status().get("progress"),
+)
+REGISTRY.gauge(
+    "dashboard_display_idle",
+    "1 while nobody is watching the display (hidden, blanked or gone)",
+    callback=lambda: int(display_activity.is_idle()),
+)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+    # Opt-in sampling profiler, only while debug mode is on
+    advanced = config_manager.get_section("advanced")
+    if advanced.get("debug_mode") and not request.path.startswith(
+        "/api/admin/profiles"
+    ):
+        request_profiler.configure(
+            advanced.get("profile_sample_rate", 0.05),
+            advanced.get("profile_top_n", 20),
+            advanced.get("profile_interval_ms", 5),
+        )
+        if request_profiler.should_sample():
+            request_profiler.start()
+            g.profiling = True
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started, route=route, method=request.method
+        )
+        HTTP_REQUESTS.inc(
+            route=route, method=request.method, status=str(response.status_code)
+        )
+    return response
 
-        # Get events for last 24 hours
-        events_url = f"{POSTHOG_HOST}/api/projects/{POSTHOG_PROJECT_ID}/events"
-        params = {
-            "after": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
-            "limit": "100",
-        }
 
-        response = requests.get(events_url, headers=headers, params=params)
+@app.after_request
+def advise_refresh_interval(response):
+    """Tell the display when to poll /api/stats next"""
+    if request.endpoint == "get_stats":
+        interval = display_refresh_interval()
+        display_activity.set_interval(interval)
+        response.headers["X-Refresh-Interval"] = f"{interval:g}"
+    return response
 
-        if response.status_code != 200:
-            return jsonify({"error": f"PostHog API error: {response.status_code}"})
 
-        events = response.json().get("results", [])
+@app.teardown_request
+def finish_request_profile(exc):
+    if g.pop("profiling", False):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_profiler.stop(
+            route, request.method, time.perf_counter() - g.request_started
+        )
 
-        # Calculate various metrics
-        total_events = len(events)
-        unique_users = len(set(event.get("distinct_id") for event in events))
-        page_views = len([e for e in events if e.get("event") == "$pageview"])
-        custom_events = total_events - page_views
-        sessions = len(
-            set(
-                event.get("$session_id") for event in events if event.get("$session_id")
+
+def current_projects() -> List[Dict[str, str]]:
+    """The configured project list, read from config and env only"""
+    return load_projects(
+        config_manager.get_section("posthog"),
+        POSTHOG_HOST,
+        POSTHOG_API_KEY,
+        POSTHOG_PROJECT_ID,
+    )
+
+
+def configure_projects() -> List[str]:
+    """Apply the current project list and return the project names"""
+    project_fetcher.configure(current_projects(), UPSTREAM_TIMEOUT, POSTHOG_PAGE_SIZE)
+    return project_fetcher.project_names
+
+
+def upstream_configured(build_clients: bool = True) -> bool:
+    """Whether this device has somewhere to get stats from"""
+    fleet = get_fleet_settings(config_manager.get_section("fleet"))
+    if fleet["mode"] == "leaf":
+        return bool(fleet["hub_url"])
+    if not build_clients:
+        # Probes only check the settings; clients are built by stats requests
+        return bool(current_projects())
+    return bool(configure_projects())
+
+
+def project_cache(name: str) -> StatsCache:
+    """Get the snapshot cache for a single project"""
+    if name not in project_caches:
+        project_caches[name] = StatsCache(
+            os.path.join(
+                config_manager.get_data_dir(),
+                f"stats_snapshot_{snapshot_name(name)}.json",
             )
         )
+    return project_caches[name]
 
-        # Get recent events (last 10)
-        recent_events = events[:10] if events else []
-
-        # Calculate metrics for different time periods
-        now = datetime.now(timezone.utc)
-        last_hour = now - timedelta(hours=1)
-        events_last_hour = len(
-            [
-                e
-                for e in events
-                if datetime.fromisoformat(e.get("timestamp", "").replace("Z", "+00:00"))
-                > last_hour
-            ]
-        )
 
-        all_metrics = {
-            "events_24h": total_events,
-            "unique_users_24h": unique_users,
-            "page_views_24h": page_views,
-            "custom_events_24h": custom_events,
-            "sessions_24h": sessions,
-            "events_1h": events_last_hour,
-            "avg_events_per_user": round(total_events / unique_users, 1)
-            if unique_users > 0
-            else 0,
-            "recent_events": recent_events,
-            "last_updated": datetime.now(timezone.utc).isoformat(),
-        }
+def display_client() -> str:
+    """The display making this request: its address and the id it sends, if any"""
+    address = request.remote_addr or "unknown"
+    display_id = request.headers.get("X-Display-Id")
+    return f"{address}/{display_id}" if display_id else address
+
+
+def display_idle() -> bool:
+    """Nobody is watching this screen and no fleet leaves rely on its snapshot"""
+    fleet = get_fleet_settings(config_manager.get_section("fleet"))
+    return fleet["mode"] != "hub" and display_activity.is_idle()
+
+
+def idle_ttl(ttl: float) -> float:
+    """Stretch a snapshot's reuse time to display.idle_refresh_interval while idle"""
+    if not display_idle():
+        return ttl
+    display = config_manager.get_section("display")
+    return max(ttl, float(display.get("idle_refresh_interval", 300)))
+
+
+def stats_ttl() -> float:
+    """Snapshot reuse time, stretched while PostHog is rate limiting us"""
+    return idle_ttl(STATS_CACHE_TTL * upstream_budget.slowdown())
+
+
+def display_refresh_interval() -> float:
+    """Seconds until the display should poll again, following event velocity"""
+    display = config_manager.get_section("display")
+    base = float(display.get("refresh_interval", 30))
+    if display_activity.is_idle() or not display.get("adaptive_refresh", True):
+        return base
+    return adaptive_interval(base, stats_cache.get_fresh(float("inf")), stats_ttl())
+
+
+def describe_fetch_error(error: Exception) -> str:
+    if isinstance(error, PostHogError):
+        return str(error)
+    return f"Failed to fetch PostHog data: {str(error)}"
+
+
+def refresh_stats() -> Dict[str, Any]:
+    """Fetch every project in parallel and store per-project and combined stats"""
+    after = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    results = project_fetcher.fetch_all(after)
+
+    project_stats = {}
+    errors = {}
+    for name, result in results.items():
+        cache = project_cache(name)
+        if isinstance(result, Exception):
+            errors[name] = describe_fetch_error(result)
+            stale = cache.get_stale(errors[name])
+            if stale is not None:
+                project_stats[name] = stale
+        else:
+            cache.put(result)
+            project_stats[name] = result
+
+    # Only fall back to the combined snapshot when nothing fresh came back
+    if len(errors) == len(results):
+        raise RuntimeError(next(iter(errors.values())))
+
+    if len(results) == 1:
+        combined = dict(next(iter(project_stats.values())))
+    else:
+        combined = merge_stats(project_stats)
+        if errors:
+            combined["project_errors"] = errors
+    # Calendar rollups are maintained as events arrive; reading them is O(1)
+    combined.update(rollups.snapshot())
+
+    stats_cache.put(combined)
+    stats_history.record(combined)
+    # No-op once the past week has been filled in
+    history_backfill.start()
+    return combined
+
+
+def warm_stats() -> None:
+    """Refresh the snapshot as soon as the display wakes, ahead of its next poll"""
+    # Nothing to do if a stats request is already refreshing it
+    if not stats_refresh.acquire(blocking=False):
+        return
+    try:
+        fleet = get_fleet_settings(config_manager.get_section("fleet"))
+        if fleet["mode"] == "leaf":
+            if fleet["hub_url"]:
+                fleet_subscriber.configure(fleet["hub_url"], fleet["token"])
+                stats = fleet_subscriber.fetch(None)
+                stats_cache.put(stats)
+                stats_history.record(stats)
+        elif configure_projects():
+            refresh_stats()
+    except Exception as e:
+        print(f"Error warming stats after the display woke: {e}")
+    finally:
+        stats_refresh.release()
+
 
-        return jsonify(all_metrics)
+def stale_stats_or_error(error: str):
+    """Serve the last good snapshot when PostHog can't be reached"""
+    stale = stats_cache.get_stale(error)
+    STATS_CACHE_REQUESTS.inc(result="stale" if stale else "miss")
+    if stale is None:
+        return jsonify({"error": error})
 
+    boot_orchestrator.mark("first_stats_served")
+    return jsonify(stale)
+
+
+def project_stats_or_error(name: str, error: str = "Latest fetch failed"):
+    """Serve one project's snapshot, refreshed alongside the combined view"""
+    cache = project_cache(name)
+    stats = cache.get_fresh(stats_ttl()) or cache.get_stale(error)
+    return jsonify(stats or {"error": error})
+
+
+def get_leaf_stats(project: Optional[str]):
+    """Serve stats published by the fleet hub instead of querying PostHog"""
+    if project is None:
+        cached = stats_cache.get_fresh(idle_ttl(STATS_CACHE_TTL))
+        if cached is not None:
+            STATS_CACHE_REQUESTS.inc(result="hit")
+            boot_orchestrator.mark("first_stats_served")
+            return jsonify(cached)
+
+    try:
+        stats = fleet_subscriber.fetch(project)
     except Exception as e:
-        return jsonify({"error": f"Failed to fetch PostHog data: {str(e)}"})
+        if project is not None:
+            return jsonify({"error": str(e)})
+        return stale_stats_or_error(str(e))
+
+    if project is None:
+        # Keep a local snapshot so the screen survives a hub outage
+        stats_cache.put(stats)
+        stats_history.record(stats)
+        STATS_CACHE_REQUESTS.inc(result="miss")
+        boot_orchestrator.mark("first_stats_served")
+    return jsonify(stats)
+
+
+@app.route("/api/stats")
+def get_stats():
+    """Get PostHog statistics combined across projects, or one ?project="""
+    if request.endpoint == "get_stats":
+        # A display coming back after going away is active again, so this
+        # request refreshes rather than getting the idle snapshot
+        display_activity.poll(display_client())
+    fleet = get_fleet_settings(config_manager.get_section("fleet"))
+    if fleet["mode"] == "leaf":
+        fleet_subscriber.configure(fleet["hub_url"], fleet["token"])
+        return get_leaf_stats(request.args.get("project"))
+
+    project_names = configure_projects()
+    if not project_names:
+        return jsonify({"error": "PostHog credentials not configured"})
+
+    project = request.args.get("project")
+    if project is not None and project not in project_names:
+        return jsonify({"error": f"Unknown project: {project}"}), 404
+
+    cached = stats_cache.get_fresh(stats_ttl())
+    if cached is None:
+        if not stats_refresh.acquire(blocking=False):
+            # Another request or the warm-up after a wake is refreshing it;
+            # serve the last snapshot marked stale rather than queue behind it
+            if stats_cache.age() is not None:
+                if project is not None:
+                    return project_stats_or_error(project, "Refresh in progress")
+                return stale_stats_or_error("Refresh in progress")
+            # Nothing to serve yet, so wait for that refresh instead
+            stats_refresh.acquire()
+        try:
+            # The other refresh may have finished meanwhile
+            cached = stats_cache.get_fresh(stats_ttl())
+            if cached is None:
+                return refresh_and_serve_stats(project)
+        finally:
+            stats_refresh.release()
+
+    STATS_CACHE_REQUESTS.inc(result="hit")
+    if project is not None:
+        return project_stats_or_error(project)
+    boot_orchestrator.mark("first_stats_served")
+    return jsonify(cached)
+
+
+def refresh_and_serve_stats(project: Optional[str]):
+    """Query PostHog for a stats request the snapshot could not answer"""
+    try:
+        all_metrics = refresh_stats()
+    except Exception as e:
+        if project is not None:
+            return project_stats_or_error(project, str(e))
+        return stale_stats_or_error(str(e))
+
+    STATS_CACHE_REQUESTS.inc(result="miss")
+    if project is not None:
+        return project_stats_or_error(project)
+    boot_orchestrator.mark("first_stats_served")
+    return jsonify(all_metrics)
+
+
+@app.route("/api/display/activity", methods=["GET", "POST"])
+def display_activity_state():
+    """Get or report whether anyone is watching the display"""
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        visible = data.get("visible")
+        if not isinstance(visible, bool):
+            return (
+                jsonify({"success": False, "error": "visible must be true or false"}),
+                400,
+            )
+        reason = data.get("reason")
+        if display_activity.report(
+            visible, str(reason) if reason else None, display_client()
+        ):
+            threading.Thread(
+                target=warm_stats, name="stats-warm-up", daemon=True
+            ).start()
+
+    status = display_activity.get_status()
+    status["refresh_interval"] = display_refresh_interval()
+    status["stats_ttl"] = round(stats_ttl(), 1)
+    return jsonify(status)
+
+
+@app.route("/api/fleet/snapshot")
+def get_fleet_snapshot():
+    """Publish this hub's stats snapshot to leaf devices"""
+    fleet = get_fleet_settings(config_manager.get_section("fleet"))
+    if fleet["mode"] != "hub":
+        return jsonify({"error": "Fleet hub mode is not enabled"}), 404
+    if fleet["token"] and request.headers.get("Authorization") != (
+        f"Bearer {fleet['token']}"
+    ):
+        return jsonify({"error": "Invalid fleet token"}), 401
+
+    fleet_hub.record_subscriber(
+        request.headers.get("X-Dashboard-Device") or request.remote_addr or "unknown",
+        request.remote_addr,
+    )
+    response = app.make_response(get_stats())
+    if response.status_code == 200:
+        # Leaves revalidate with If-None-Match and get a 304 until it changes
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+@app.route("/api/fleet/status")
+def get_fleet_status():
+    """Get fleet mode plus hub subscribers or leaf sync state"""
+    fleet = get_fleet_settings(config_manager.get_section("fleet"))
+    status: Dict[str, Any] = {"mode": fleet["mode"], "device": socket.gethostname()}
+    if fleet["mode"] == "hub":
+        status["subscribers"] = fleet_hub.get_subscribers()
+    elif fleet["mode"] == "leaf":
+        status.update(fleet_subscriber.get_status())
+        status["hub_url"] = fleet["hub_url"]
+    return jsonify(status)
+
+
+@app.route("/api/stats/history")
+def get_stats_history():
+    """Get downsampled metric history recorded from previous refreshes"""
+    try:
+        span = parse_range(request.args.get("range", "24h"))
+        points = int(request.args.get("points", "60"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not 1 <= points <= 1440:
+        return jsonify({"error": "points must be between 1 and 1440"}), 400
+
+    metrics = [m for m in request.args.get("metrics", "").split(",") if m]
+    if not metrics:
+        # Default to whatever the display is configured to show
+        display_metrics = config_manager.get_section("display").get("metrics", {})
+        metrics = [m["type"] for m in display_metrics.values() if m.get("enabled")]
+
+    series = {}
+    for metric in metrics:
+        series[metric] = stats_history.query(metric, span, points) or {
+            "metric": metric,
+            "resolution": None,
+            "points": [],
+        }
+    return jsonify({"range": request.args.get("range", "24h"), "series": series})
+
+
+# Metric definitions offered by the kiosk configuration page
+AVAILABLE_METRICS: Dict[str, Dict[str, str]] = {
+    "events_24h": {
+        "label": "Events (24h)",
+        "description": "Total events in last 24 hours",
+    },
+    "unique_users_24h": {
+        "label": "Users (24h)",
+        "description": "Unique users in last 24 hours",
+    },
+    "page_views_24h": {
+        "label": "Page Views (24h)",
+        "description": "Page view events in last 24 hours",
+    },
+    "custom_events_24h": {
+        "label": "Custom Events (24h)",
+        "description": "Non-pageview events in last 24 hours",
+    },
+    "sessions_24h": {
+        "label": "Sessions (24h)",
+        "description": "Unique sessions in last 24 hours",
+    },
+    "events_1h": {"label": "Events (1h)", "description": "Events in last hour"},
+    "avg_events_per_user": {
+        "label": "Avg Events/User",
+        "description": "Average events per user (24h)",
+    },
+    "events_this_hour": {
+        "label": "Events (This Hour)",
+        "description": "Events in the current local hour",
+    },
+    "unique_users_this_hour": {
+        "label": "Users (This Hour)",
+        "description": "Unique users in the current local hour",
+    },
+    "page_views_this_hour": {
+        "label": "Page Views (This Hour)",
+        "description": "Page view events in the current local hour",
+    },
+    "events_today": {
+        "label": "Events (Today)",
+        "description": "Events in today (device timezone)",
+    },
+    "unique_users_today": {
+        "label": "Users (Today)",
+        "description": "Unique users in today (device timezone)",
+    },
+    "page_views_today": {
+        "label": "Page Views (Today)",
+        "description": "Page view events in today (device timezone)",
+    },
+    "events_this_week": {
+        "label": "Events (This Week)",
+        "description": "Events in this week, Monday to now (device timezone)",
+    },
+    "unique_users_this_week": {
+        "label": "Users (This Week)",
+        "description": "Unique users in this week, Monday to now (device timezone)",
+    },
+    "page_views_this_week": {
+        "label": "Page Views (This Week)",
+        "description": "Page view events in this week, Monday to now (device timezone)",
+    },
+    "top_event_24h": {
+        "label": "Top Event (24h)",
+        "description": "Most frequent event name in last 24 hours",
+    },
+    "top_page_24h": {
+        "label": "Top Page (24h)",
+        "description": "Most visited $current_url (without query string)",
+    },
+    "top_referrer_24h": {
+        "label": "Top Referrer (24h)",
+        "description": "Most common $referrer in last 24 hours",
+    },
+}
+
+
+@app.route("/api/admin/history/backfill")
+def get_history_backfill():
+    """Get progress of the background history backfill"""
+    return jsonify(history_backfill.get_status())
 
 
 @app.route("/api/metrics/available")
 def get_available_metrics():
     """Get list of available metrics for configuration"""
-    available_metrics = {
-        "events_24h": {
-            "label": "Events (24h)",
-            "description": "Total events in last 24 hours",
-        },
-        "unique_users_24h": {
-            "label": "Users (24h)",
-            "description": "Unique users in last 24 hours",
-        },
-        "page_views_24h": {
-            "label": "Page Views (24h)",
-            "description": "Page view events in last 24 hours",
-        },
-        "custom_events_24h": {
-            "label": "Custom Events (24h)",
-            "description": "Non-pageview events in last 24 hours",
-        },
-        "sessions_24h": {
-            "label": "Sessions (24h)",
-            "description": "Unique sessions in last 24 hours",
-        },
-        "events_1h": {"label": "Events (1h)", "description": "Events in last hour"},
-        "avg_events_per_user": {
-            "label": "Avg Events/User",
-            "description": "Average events per user (24h)",
-        },
-    }
-    return jsonify(available_metrics)
+    return jsonify(AVAILABLE_METRICS)
 
 
 @app.route("/api/health")
 def health_check():
-    """Health check endpoint"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()})
+    """Liveness check: the process is up and serving requests"""
+    return jsonify(
+        {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    )
+
+
+@app.route("/api/health/ready")
+def readiness_check():
+    """Readiness check built from cached upstream, snapshot, disk and OTA state"""
+    refresh_interval = config_manager.get_section("display").get("refresh_interval", 30)
+    max_snapshot_age = max(3 * refresh_interval, 3 * STATS_CACHE_TTL)
+    if display_idle():
+        # The snapshot is left to age while nobody is watching
+        max_snapshot_age = float("inf")
+    report = health_monitor.readiness(
+        credentials_configured=upstream_configured(build_clients=False),
+        snapshot_age=stats_cache.age(),
+        max_snapshot_age=max_snapshot_age,
+        ota_operation=ota_manager.get_active_operation(),
+    )
+    # Tokens left and any 429 backoff, per PostHog host
+    report["upstream"]["rate_budget"] = upstream_budget.get_status()
+    status_code = 503 if report["status"] == "unavailable" else 200
+    return jsonify(report), status_code
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Expose backend internals in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/admin/profiles", methods=["GET", "DELETE"])
+def get_request_profiles():
+    """Get the slowest sampled request profiles (or clear them)"""
+    if request.method == "DELETE":
+        request_profiler.clear()
+        return jsonify({"success": True})
+
+    advanced = config_manager.get_section("advanced")
+    if request.args.get("format") == "collapsed":
+        profile_id = request.args.get("id", type=int)
+        if profile_id is None:
+            collapsed = request_profiler.collapsed()
+        else:
+            profile = request_profiler.get_profile(profile_id)
+            if profile is None:
+                return jsonify({"error": "Profile not found"}), 404
+            collapsed = request_profiler.collapsed([profile])
+        return Response(collapsed + "\n", mimetype="text/plain")
+
+    return jsonify(
+        {
+            "enabled": bool(advanced.get("debug_mode")),
+            "sample_rate": request_profiler.sample_rate,
+            "profiles": request_profiler.get_profiles(),
+        }
+    )
+
+
+@app.route("/api/admin/boot")
+def get_boot_report():
+    """Get boot phase timings and the background OTA check result"""
+    return jsonify(boot_orchestrator.get_report())
 
 
 # OTA Management API Routes
@@ -193,8 +811,15 @@ def ota_config():
 
 @app.route("/api/admin/ota/backups")
 def get_backups():
-    """Get list of available backup tags"""
-    return jsonify({"backups": ota_manager.get_backups()})
+    """Get available backup tags, newest first, with their commits"""
+    backups = ota_manager.get_backup_index()
+    return jsonify({"backups": [b["tag"] for b in backups], "details": backups})
+
+
+@app.route("/api/admin/ota/backups/prune", methods=["POST"])
+def prune_backups():
+    """Apply the backup retention policy now"""
+    return jsonify(ota_manager.prune_backups())
 
 
 @app.route("/api/admin/ota/backup", methods=["POST"])
@@ -215,6 +840,38 @@ def rollback_to_backup():
     return jsonify(ota_manager.rollback_to_backup(backup_tag))
 
 
+@app.route("/api/admin/ota/releases")
+def get_releases():
+    """Get the side-by-side releases and which one is serving"""
+    return jsonify(release_manager.get_status())
+
+
+@app.route("/api/admin/ota/releases/rollback", methods=["POST"])
+def rollback_release():
+    """Hand traffic back to the release that served before the last update"""
+    return jsonify(ota_manager.rollback_release())
+
+
+@app.route("/api/admin/ota/maintenance", methods=["GET", "POST"])
+def ota_maintenance():
+    """Get repository maintenance status, or run it now"""
+    if request.method == "GET":
+        return jsonify(repo_maintenance.get_status())
+    return jsonify(repo_maintenance.run(force=True))
+
+
+@app.route("/api/bootstrap")
+def get_bootstrap():
+    """Config, OTA status and metric definitions for the config page in one call"""
+    return jsonify(
+        {
+            "config": config_manager.get_config(),
+            "ota_status": ota_manager.get_status(),
+            "available_metrics": AVAILABLE_METRICS,
+        }
+    )
+
+
 # Configuration API Routes
 @app.route("/api/admin/config")
 def get_config():
@@ -236,6 +893,7 @@ def update_config():
 @app.route("/")
 def serve_react_app():
     """Serve the React application"""
+    boot_orchestrator.mark("dashboard_served")
     return send_from_directory(app.static_folder, "index.html")
 
 
@@ -249,15 +907,26 @@ def serve_static_files(path):
         return send_from_directory(app.static_folder, "index.html")
 
 
-if __name__ == "__main__":
-    # Perform boot update check if enabled
+def warm_up() -> None:
+    """Load what the first stats request needs while the server starts listening"""
     try:
-        boot_result = ota_manager.perform_boot_update()
-        if boot_result.get("error"):
-            print(f"Boot update warning: {boot_result['error']}")
-        elif boot_result.get("success"):
-            print("Boot update completed successfully")
+        with boot_orchestrator.phase("warm_up"):
+            stats_history.load()
+            # Builds the PostHog clients, importing requests off the startup path
+            upstream_configured()
     except Exception as e:
-        print(f"Boot update check failed: {e}")
+        print(f"Warm-up failed: {e}")
 
-    app.run(host="0.0.0.0", port=5000, debug=False)
+
+if __name__ == "__main__":
+    # Fork the aggregation workers while this is still the only thread
+    aggregation_pool.start()
+    # Serve the dashboard straight away; the OTA boot check waits for the
+    # network in the background and is skipped if boot-update.py already ran it
+    boot_orchestrator.start_background_update()
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    repo_maintenance.start()
+    boot_orchestrator.mark("server_start")
+
+    # Like app.run(), but able to hand its socket to the next release
+    server.serve_forever()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Backfill aggregation benchmark for the worker process pool
+Folds a week of raw event pages into calendar rollups in-process and with
+1..N worker processes, and reports events/s and speedup per worker count
+
+Usage (from backend/):
+    python -m benchmarks.bench_aggregation                  # 200k events
+    python -m benchmarks.bench_aggregation --workers 1,2,4 --min-speedup 2.5
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from aggregation_pool import AggregationPool
+from benchmarks.posthog_stub import EventStream
+from rollups import CalendarRollups, rollup_partial
+
+TIMEZONE = "Europe/London"
+
+
+def page_bodies(events: int, page_size: int) -> List[bytes]:
+    stream = EventStream(total_events=events, users=events // 20, window_hours=168)
+    return [
+        json.dumps({"next": None, "results": stream.events(start, page_size)}).encode()
+        for start in range(0, events, page_size)
+    ]
+
+
+def aggregate(pool: AggregationPool, bodies: List[bytes]) -> CalendarRollups:
+    rollups = CalendarRollups(TIMEZONE)
+    for buckets in pool.map(rollup_partial, bodies, TIMEZONE, "bench"):
+        rollups.merge_buckets(buckets)
+    return rollups
+
+
+def measure(workers: int, bodies: List[bytes], events: int) -> Dict[str, Any]:
+    pool = AggregationPool(workers)
+    try:
+        # Start the worker processes outside the timed run
+        aggregate(pool, bodies[:workers])
+        started = time.perf_counter()
+        rollups = aggregate(pool, bodies)
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+    return {
+        "seconds": round(elapsed, 3),
+        "events_per_s": round(events / elapsed),
+        "snapshot": rollups.snapshot(),
+    }
+
+
+def run(events: int, page_size: int, workers: List[int]) -> Dict[str, Any]:
+    bodies = page_bodies(events, page_size)
+    inline = measure(0, bodies, events)
+    results = {"0": inline}
+    for count in workers:
+        result = measure(count, bodies, events)
+        if result["snapshot"] != inline["snapshot"]:
+            raise RuntimeError(f"{count} workers disagree with the inline result")
+        result["speedup"] = round(inline["seconds"] / result["seconds"], 2)
+        results[str(count)] = result
+    for result in results.values():
+        del result["snapshot"]
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "events": events,
+        "page_size": page_size,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled aggregation")
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument(
+        "--workers",
+        type=lambda v: [int(w) for w in v.split(",")],
+        default=[1, 2, 4],
+        help="comma separated worker counts",
+    )
+    parser.add_argument(
+        "--min-speedup",
+        type=float,
+        help="fail if the largest worker count (capped at the core count) "
+        "is not at least this much faster than in-process",
+    )
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args.events, args.page_size, args.workers)
+    for count, result in report["results"].items():
+        label = "in-process" if count == "0" else f"{count} workers"
+        speedup = f", {result['speedup']}x" if "speedup" in result else ""
+        print(f"{label:>11}: {result['events_per_s']:,} events/s{speedup}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.min_speedup:
+        usable = [w for w in args.workers if w <= (os.cpu_count() or 1)]
+        if not usable or usable == [1]:
+            print("Not enough cores to check scaling", file=sys.stderr)
+            return
+        speedup = report["results"][str(max(usable))]["speedup"]
+        if speedup < args.min_speedup:
+            print(f"Speedup {speedup}x is below {args.min_speedup}x", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
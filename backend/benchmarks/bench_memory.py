@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the in-memory event representation
+Compares bytes per event held after a refresh: the parsed JSON pages kept as a
+list of dicts versus the same pages folded into an EventBatch. Also compares
+peak memory while parsing one page, whole versus streamed, across page sizes
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory                   # 100k events
+    python -m benchmarks.bench_memory --events 1000000 --output out.json
+"""
+
+import argparse
+import json
+import platform
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List
+
+from benchmarks.posthog_stub import EventStream
+from event_batch import EventBatch
+from page_stream import EventPageParser
+from posthog_client import STREAM_CHUNK_SIZE
+
+PAGE_SIZE = 1000
+PARSE_PAGE_SIZES = [1000, 10000]
+
+
+def json_pages(stream: EventStream) -> Iterator[bytes]:
+    """Pages as the upstream sends them, parsed afresh like a real fetch"""
+    for start in range(0, stream.total_events, PAGE_SIZE):
+        yield json.dumps({"results": stream.events(start, PAGE_SIZE)}).encode()
+
+
+def as_dicts(pages: List[bytes]) -> List[Dict[str, Any]]:
+    events: List[Dict[str, Any]] = []
+    for page in pages:
+        events.extend(json.loads(page)["results"])
+    return events
+
+
+def as_batch(pages: List[bytes]) -> EventBatch:
+    batch = EventBatch()
+    for page in pages:
+        batch.extend(json.loads(page)["results"])
+    return batch
+
+
+def measure(build: Callable[[List[bytes]], Any], pages: List[bytes]) -> int:
+    """Bytes still allocated by build's result once it returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(pages)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return held
+
+
+def parse_whole(body: bytes) -> None:
+    EventBatch.from_events(json.loads(body)["results"])
+
+
+def parse_streamed(body: bytes) -> None:
+    parser, batch = EventPageParser(), EventBatch()
+    for start in range(0, len(body), STREAM_CHUNK_SIZE):
+        batch.extend(parser.feed(body[start : start + STREAM_CHUNK_SIZE]))
+    batch.extend(parser.finish())
+
+
+def parse_peak(parse: Callable[[bytes], None], body: bytes) -> int:
+    """Peak bytes allocated while parsing a page into a batch"""
+    tracemalloc.start()
+    parse(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def parse_peaks(users: int) -> Dict[str, Dict[str, int]]:
+    peaks: Dict[str, Dict[str, int]] = {"whole": {}, "streamed": {}}
+    for size in PARSE_PAGE_SIZES:
+        stream = EventStream(total_events=size, users=users)
+        body = json.dumps({"next": None, "results": stream.events(0, size)}).encode()
+        peaks["whole"][str(size)] = parse_peak(parse_whole, body)
+        peaks["streamed"][str(size)] = parse_peak(parse_streamed, body)
+    return peaks
+
+
+def run(events: int, users: int) -> Dict[str, Any]:
+    stream = EventStream(total_events=events, users=users)
+    pages = list(json_pages(stream))
+    dict_bytes = measure(as_dicts, pages)
+    batch_bytes = measure(as_batch, pages)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "events": events,
+        "users": users,
+        "bytes_per_event": {
+            "dicts": round(dict_bytes / events, 1),
+            "batch": round(batch_bytes / events, 1),
+        },
+        "reduction": round(dict_bytes / max(1, batch_bytes), 1),
+        "parse_peak_bytes": parse_peaks(users),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event memory use")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args.events, args.users)
+    per_event = report["bytes_per_event"]
+    print(f"{report['events']} events, {report['users']} users")
+    print(f"list of dicts: {per_event['dicts']} bytes/event")
+    print(f"EventBatch:    {per_event['batch']} bytes/event")
+    print(f"reduction:     {report['reduction']}x")
+    for mode, peaks in report["parse_peak_bytes"].items():
+        sizes = ", ".join(
+            f"{size}/page {peak / 1e6:.1f}MB" for size, peak in peaks.items()
+        )
+        print(f"parse peak, {mode}: {sizes}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the backend
+Measures how long `import app` takes and how long `python app.py` takes until
+its port accepts connections, each in fresh processes
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup                 # 5 runs, 3s listen budget
+    python -m benchmarks.bench_startup --runs 10 --budget 1.5 --output out.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from benchmarks.load_test import FAKE_GIT, free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the startup path should leave to first use
+DEFERRED_MODULES = ["requests", "urllib3"]
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def startup_env(work_dir: str) -> Dict[str, str]:
+    """Isolated data dir, fake git on PATH and no background PostHog work"""
+    bin_dir = os.path.join(work_dir, "bin")
+    os.makedirs(bin_dir)
+    os.symlink(FAKE_GIT, os.path.join(bin_dir, "git"))
+    return dict(
+        os.environ,
+        DASHBOARD_DATA_DIR=os.path.join(work_dir, "data"),
+        PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        PYTHONPATH=BACKEND_DIR,
+        HISTORY_BACKFILL_DAYS="0",
+    )
+
+
+def measure_import(env: Dict[str, str], work_dir: str) -> Dict[str, Any]:
+    """Time `import app` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE % (DEFERRED_MODULES,)],
+        cwd=work_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    probe: Dict[str, Any] = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe
+
+
+def measure_listen(env: Dict[str, str], work_dir: str, timeout: float = 30) -> float:
+    """Seconds from spawning `python app.py` until its port accepts connections"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "app.py")],
+        cwd=work_dir,
+        env=dict(env, DASHBOARD_PORT=str(port)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    return time.perf_counter() - started
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError("app.py exited before listening")
+                time.sleep(0.01)
+        raise RuntimeError(f"app.py was not listening after {timeout}s")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def run(runs: int) -> Dict[str, Any]:
+    imports: List[float] = []
+    listens: List[float] = []
+    loaded: List[str] = []
+    # Run from a scratch directory: device_config.json is resolved from the cwd
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as work_dir:
+        env = startup_env(work_dir)
+        for _ in range(runs):
+            probe = measure_import(env, work_dir)
+            imports.append(probe["seconds"])
+            loaded = sorted(set(loaded) | set(probe["loaded"]))
+            listens.append(measure_listen(env, work_dir))
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "runs": runs,
+        },
+        "import_ms": {
+            "median": round(statistics.median(imports) * 1000, 1),
+            "max": round(max(imports) * 1000, 1),
+        },
+        "listen_ms": {
+            "median": round(statistics.median(listens) * 1000, 1),
+            "max": round(max(listens) * 1000, 1),
+        },
+        "eagerly_loaded": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=3.0,
+        help="fail if the median time to listen exceeds this many seconds",
+    )
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    print(
+        f"import app: {report['import_ms']['median']}ms median "
+        f"({report['import_ms']['max']}ms max)"
+    )
+    print(
+        f"listening:  {report['listen_ms']['median']}ms median "
+        f"({report['listen_ms']['max']}ms max), budget {args.budget * 1000:.0f}ms"
+    )
+    if report["eagerly_loaded"]:
+        print(f"loaded at import: {', '.join(report['eagerly_loaded'])}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    over_budget = report["listen_ms"]["median"] > args.budget * 1000
+    if over_budget or report["eagerly_loaded"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
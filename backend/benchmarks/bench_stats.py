@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Throughput, latency and memory benchmark for /api/stats
+Runs the real Flask app against the local PostHog stub, one process per size
+
+Usage (from backend/):
+    python -m benchmarks.bench_stats                         # 1k, 100k, 1M
+    python -m benchmarks.bench_stats --sizes 1000,100000 --output out.json
+    python -m benchmarks.bench_stats --compare benchmarks/baseline.json
+    python -m benchmarks.bench_stats --latency 0.1 --prefetch-depth 0  # no overlap
+
+Each size is measured twice: "results" with the rate budget and page cap lifted,
+so they measure the pipeline, and "budgeted" with the app's own defaults, as a
+device would see it. Regenerate the baseline with --update-baseline in any
+change that moves the numbers on purpose.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+def start_stub(args: argparse.Namespace, size: int) -> Tuple[subprocess.Popen, str]:
+    """Run the PostHog stub in its own process so it doesn't share our GIL"""
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.posthog_stub",
+            "--events",
+            str(size),
+            "--users",
+            str(max(10, size // args.events_per_user)),
+            "--max-page-size",
+            str(args.page_size),
+            "--latency",
+            str(args.latency),
+            "--port",
+            "0",
+        ],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stdout is not None
+    url = json.loads(process.stdout.readline())["url"]
+    return process, url
+
+
+def run_size(args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark one event volume in this process (invoked via --child)"""
+    os.environ["DASHBOARD_DATA_DIR"] = tempfile.mkdtemp(prefix="bench-stats-")
+    # The week of history rebuilt in the background would compete with the
+    # refreshes being timed, more so while the rate budget stretches it out
+    os.environ["HISTORY_BACKFILL_DAYS"] = "0"
+    if not args.budgeted:
+        # Measure the pipeline, not the upstream rate budget
+        os.environ["POSTHOG_RATE_LIMIT"] = "1000000"
+        os.environ["POSTHOG_RATE_BURST"] = "1000000"
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app as app_module
+    from health import percentile
+
+    app_module.POSTHOG_HOST = args.stub_url
+    app_module.POSTHOG_API_KEY = "bench"
+    app_module.POSTHOG_PROJECT_ID = "1"
+    app_module.UPSTREAM_TIMEOUT = 120
+    app_module.POSTHOG_PAGE_SIZE = args.page_size
+    app_module.STATS_CACHE_TTL = -1
+    app_module.project_fetcher.prefetch_depth = args.prefetch_depth
+    if not args.budgeted:
+        # Every page, so the sizes measure the pipeline rather than the page cap
+        app_module.project_fetcher.max_pages = None
+    client = app_module.app.test_client()
+
+    def fetch() -> Dict[str, Any]:
+        data: Dict[str, Any] = client.get("/api/stats").get_json()
+        if "error" in data or data.get("stale"):
+            raise RuntimeError(f"/api/stats failed: {data}")
+        return data
+
+    # Warm-up also fills the stub's page cache
+    data = fetch()
+
+    latencies: List[float] = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        fetch()
+        latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fetch()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(latencies, 50) or 0.0
+    p95 = percentile(latencies, 95) or 0.0
+    return {
+        "events": data["events_24h"],
+        "unique_users": data["unique_users_24h"],
+        "iterations": args.iterations,
+        "latency_ms": {
+            "min": round(min(latencies) * 1000, 1),
+            "p50": round(p50 * 1000, 1),
+            "p95": round(p95 * 1000, 1),
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+        },
+        "throughput_events_per_s": round(data["events_24h"] / p50),
+        "peak_traced_mb": round(traced_peak / 1024 / 1024, 1),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def run_child(args: argparse.Namespace, url: str, budgeted: bool) -> Dict[str, Any]:
+    """Benchmark one size in a fresh process against a running stub"""
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_stats",
+        "--child",
+        "--stub-url",
+        url,
+        "--iterations",
+        str(args.iterations),
+        "--page-size",
+        str(args.page_size),
+        "--prefetch-depth",
+        str(args.prefetch_depth),
+    ]
+    if budgeted:
+        command.append("--budgeted")
+    child = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if child.returncode != 0:
+        return {"error": child.stderr.strip().splitlines()[-1:]}
+    result: Dict[str, Any] = json.loads(child.stdout.strip().splitlines()[-1])
+    return result
+
+
+def run_all(args: argparse.Namespace) -> Dict[str, Any]:
+    results = {}
+    budgeted = {}
+    for size in args.sizes:
+        print(f"Benchmarking /api/stats with {size:,} events...", file=sys.stderr)
+        stub, url = start_stub(args, size)
+        try:
+            results[str(size)] = run_child(args, url, budgeted=False)
+            print(f"  {json.dumps(results[str(size)])}", file=sys.stderr)
+            budgeted[str(size)] = run_child(args, url, budgeted=True)
+            print(f"  budgeted: {json.dumps(budgeted[str(size)])}", file=sys.stderr)
+        finally:
+            stub.terminate()
+            stub.wait()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "iterations": args.iterations,
+            "page_size": args.page_size,
+            "events_per_user": args.events_per_user,
+            "latency": args.latency,
+            "prefetch_depth": args.prefetch_depth,
+        },
+        "results": results,
+        "budgeted": budgeted,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float):
+    """Return a list of regressions beyond tolerance against a baseline"""
+    regressions = []
+    for section, prefix in (("results", ""), ("budgeted", "budgeted ")):
+        for size, result in report.get(section, {}).items():
+            base = baseline.get(section, {}).get(size)
+            if not base or "error" in base or "error" in result:
+                continue
+            checks = [
+                ("p50 latency", result["latency_ms"]["p50"], base["latency_ms"]["p50"]),
+                ("traced memory", result["peak_traced_mb"], base["peak_traced_mb"]),
+            ]
+            for label, current, previous in checks:
+                if previous and current > previous * (1 + tolerance):
+                    regressions.append(
+                        f"{prefix}{size} events: {label} {current} vs baseline "
+                        f"{previous} (+{(current / previous - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/stats")
+    parser.add_argument(
+        "--sizes",
+        type=lambda v: [int(s) for s in v.split(",")],
+        default=DEFAULT_SIZES,
+        help="comma separated event volumes",
+    )
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--events-per-user", type=int, default=20)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="stub delay per page, seconds"
+    )
+    parser.add_argument("--prefetch-depth", type=int, default=8)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help=f"write the report to {os.path.relpath(DEFAULT_BASELINE, BACKEND_DIR)}",
+    )
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    parser.add_argument("--budgeted", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_size(args)))
+        return 0
+
+    report = run_all(args)
+    output = json.dumps(report, indent=2)
+    if args.update_baseline:
+        args.output = DEFAULT_BASELINE
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
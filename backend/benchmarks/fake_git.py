@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Stand-in git executable for load tests
+Answers the read-only commands OTAManager issues with canned output, so OTA
+status requests never touch the network or the real repository
+
+FAKE_GIT_LATENCY (seconds) adds a delay per call, e.g. to mimic a slow SD card
+"""
+
+import os
+import sys
+import time
+
+RESPONSES = {
+    ("branch", "--show-current"): "main\n",
+    ("rev-parse", "HEAD"): "0123456789abcdef0123456789abcdef01234567\n",
+    ("branch", "-r"): "  origin/HEAD -> origin/main\n  origin/canary\n"
+    "  origin/dev\n  origin/main\n",
+    ("rev-list", "--count"): "0\n",
+}
+
+
+def main(args):
+    time.sleep(float(os.environ.get("FAKE_GIT_LATENCY", "0")))
+    for prefix, output in RESPONSES.items():
+        if tuple(args[: len(prefix)]) == prefix:
+            sys.stdout.write(output)
+            return 0
+    # fetch, tag and friends succeed silently
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Load test for the Flask backend under concurrent kiosk and admin clients
+Spawns the PostHog stub and the app (with a fake git) as separate processes,
+replays a weighted route mix and reports throughput, tail latency and error
+rate per route
+
+Usage (from backend/):
+    python -m benchmarks.load_test                        # 4 kiosks, 1 admin, 30s
+    python -m benchmarks.load_test --kiosks 16 --admins 4 --output run.json
+    python -m benchmarks.load_test --compare run.json     # diff against a run
+    python -m benchmarks.load_test --target http://pi.local:5000  # real device
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_GIT = os.path.join(BACKEND_DIR, "benchmarks", "fake_git.py")
+
+# (route, weight) per client type; a kiosk polls stats and reloads assets,
+# an admin browses the config page
+ROUTE_MIXES: Dict[str, List[Tuple[str, int]]] = {
+    "kiosk": [
+        ("/api/stats", 8),
+        ("/", 1),
+        ("/static/js/main.js", 1),
+        ("/static/css/main.css", 1),
+    ],
+    "admin": [
+        ("/api/admin/config", 4),
+        ("/api/admin/ota/status", 3),
+        ("/api/stats", 2),
+        ("/static/js/main.js", 1),
+    ],
+}
+
+# Roughly the size of a production CRA bundle
+STATIC_FILES = {
+    "index.html": "<!doctype html><html><body><div id=root></div></body></html>",
+    "static/js/main.js": "console.log('dashboard');\n" * 8000,
+    "static/css/main.css": "body { margin: 0; }\n" * 1000,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def build_static_dir() -> str:
+    """Write a stand-in React build so static routes hit real files"""
+    root = tempfile.mkdtemp(prefix="load-test-build-")
+    for path, content in STATIC_FILES.items():
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+    return root
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Run the app against the stubs in this process (invoked via --serve)"""
+    os.environ["DASHBOARD_DATA_DIR"] = tempfile.mkdtemp(prefix="load-test-data-")
+    # Measure the live path only; the history backfill would share the stub
+    os.environ.setdefault("HISTORY_BACKFILL_DAYS", "0")
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app as app_module
+
+    app_module.POSTHOG_HOST = args.stub_url
+    app_module.POSTHOG_API_KEY = "load-test"
+    app_module.POSTHOG_PROJECT_ID = "1"
+    app_module.POSTHOG_PAGE_SIZE = args.page_size
+    app_module.ota_manager.git_command = FAKE_GIT
+    app_module.app.static_folder = build_static_dir()
+    app_module.app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+def start_process(command: List[str], env: Optional[Dict[str, str]] = None):
+    return subprocess.Popen(
+        [sys.executable, "-m"] + command,
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, **(env or {})),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+
+
+def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App at {base_url} did not become healthy")
+
+
+def run_client(
+    base_url: str,
+    kind: str,
+    deadline: float,
+    think_time: float,
+    seed: int,
+    samples: Dict[str, List[Tuple[float, bool]]],
+) -> None:
+    """Replay one client's route mix until the deadline"""
+    rng = random.Random(seed)
+    routes = [route for route, _ in ROUTE_MIXES[kind]]
+    weights = [weight for _, weight in ROUTE_MIXES[kind]]
+    # Each screen or browser tab keeps its own connection pool
+    session = requests.Session()
+
+    while time.monotonic() < deadline:
+        route = rng.choices(routes, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{route}", timeout=30)
+            ok = response.status_code < 400 and "error" not in _json_or_empty(response)
+        except requests.RequestException:
+            ok = False
+        samples.setdefault(route, []).append((time.perf_counter() - started, ok))
+        if think_time:
+            time.sleep(rng.uniform(0, 2 * think_time))
+
+
+def _json_or_empty(response: requests.Response) -> Dict[str, Any]:
+    """/api/stats reports upstream failures as 200 with an error key"""
+    if not response.headers.get("Content-Type", "").startswith("application/json"):
+        return {}
+    data = response.json()
+    return data if isinstance(data, dict) else {}
+
+
+def summarize(samples: List[Tuple[float, bool]], elapsed: float) -> Dict[str, Any]:
+    from health import percentile
+
+    latencies = [latency for latency, _ in samples]
+    errors = sum(1 for _, ok in samples if not ok)
+
+    def ms(pct: float) -> float:
+        return round((percentile(latencies, pct) or 0.0) * 1000, 1)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "latency_ms": {
+            "p50": ms(50),
+            "p95": ms(95),
+            "p99": ms(99),
+            "max": round(max(latencies, default=0.0) * 1000, 1),
+        },
+    }
+
+
+def run_load(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    """Run all clients concurrently and aggregate per-route results"""
+    # One request first so the measured window starts with a warm cache
+    requests.get(f"{base_url}/api/stats", timeout=60)
+
+    clients = ["kiosk"] * args.kiosks + ["admin"] * args.admins
+    per_client: List[Dict[str, List[Tuple[float, bool]]]] = [{} for _ in clients]
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(base_url, kind, deadline, args.think_time, args.seed + i, samples),
+            daemon=True,
+        )
+        for i, (kind, samples) in enumerate(zip(clients, per_client))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    merged: Dict[str, List[Tuple[float, bool]]] = {}
+    for samples in per_client:
+        for route, route_samples in samples.items():
+            merged.setdefault(route, []).extend(route_samples)
+
+    routes = {route: summarize(merged[route], elapsed) for route in sorted(merged)}
+    everything = [
+        sample for route_samples in merged.values() for sample in route_samples
+    ]
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "target": args.target or "local",
+            "kiosks": args.kiosks,
+            "admins": args.admins,
+            "duration": args.duration,
+            "think_time": args.think_time,
+            "events": args.events,
+            "upstream_latency": args.upstream_latency,
+            "git_latency": args.git_latency,
+            "stats_cache_ttl": os.environ.get("STATS_CACHE_TTL", "default"),
+        },
+        "routes": routes,
+        "total": summarize(everything, elapsed),
+    }
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{'route':<24}{'reqs':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'max':>9}{'err%':>7}"
+    ]
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, result in rows:
+        latency = result["latency_ms"]
+        lines.append(
+            f"{route:<24}{result['requests']:>8}{result['throughput_rps']:>9}"
+            f"{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}"
+            f"{latency['max']:>9}{result['error_rate'] * 100:>7.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(report: Dict[str, Any], previous: Dict[str, Any]) -> str:
+    """Per-route throughput, p95 and error rate against a previous run"""
+
+    def change(current: float, before: float) -> str:
+        if not before:
+            return f"{before} -> {current}"
+        return f"{before} -> {current} ({(current / before - 1) * 100:+.0f}%)"
+
+    lines = []
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, result in rows:
+        before = (
+            previous["total"] if route == "TOTAL" else previous["routes"].get(route)
+        )
+        if not before:
+            continue
+        lines.append(
+            f"{route}: rps {change(result['throughput_rps'], before['throughput_rps'])}"
+            f", p95 {change(result['latency_ms']['p95'], before['latency_ms']['p95'])}"
+            f", errors {before['error_rate']} -> {result['error_rate']}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard backend")
+    parser.add_argument("--kiosks", type=int, default=4)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="mean pause between requests"
+    )
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument(
+        "--upstream-latency", type=float, default=0.05, help="PostHog stub delay"
+    )
+    parser.add_argument("--git-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", help="load an already running app instead")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return 0
+
+    sys.path.insert(0, BACKEND_DIR)
+    processes = []
+    try:
+        base_url = args.target
+        if not base_url:
+            stub = start_process(
+                [
+                    "benchmarks.posthog_stub",
+                    "--events",
+                    str(args.events),
+                    "--users",
+                    str(max(10, args.events // 20)),
+                    "--max-page-size",
+                    str(args.page_size),
+                    "--latency",
+                    str(args.upstream_latency),
+                    "--port",
+                    "0",
+                ]
+            )
+            processes.append(stub)
+            assert stub.stdout is not None
+            stub_url = json.loads(stub.stdout.readline())["url"]
+
+            port = free_port()
+            processes.append(
+                start_process(
+                    [
+                        "benchmarks.load_test",
+                        "--serve",
+                        "--stub-url",
+                        stub_url,
+                        "--port",
+                        str(port),
+                        "--page-size",
+                        str(args.page_size),
+                    ],
+                    env={"FAKE_GIT_LATENCY": str(args.git_latency)},
+                )
+            )
+            base_url = f"http://127.0.0.1:{port}"
+        wait_until_ready(base_url)
+
+        print(
+            f"Loading {base_url} with {args.kiosks} kiosks and {args.admins} admins "
+            f"for {args.duration:g}s...",
+            file=sys.stderr,
+        )
+        report = run_load(args, base_url)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print(format_table(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
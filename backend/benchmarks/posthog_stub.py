@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Local PostHog stub for benchmarks and load tests
+Serves a deterministic, paginated /api/projects/<id>/events stream
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+CUSTOM_EVENTS = [
+    ("$autocapture", 30),
+    ("$pageleave", 20),
+    ("clicked_button", 15),
+    ("$identify", 5),
+    ("signed_up", 3),
+    ("purchase", 2),
+    ("$exception", 1),
+]
+PAGES = ["/", "/pricing", "/docs", "/blog", "/signup", "/login", "/app/dashboard"]
+REFERRERS = ["$direct", "https://google.com/", "https://news.ycombinator.com/"]
+BROWSERS = ["Chrome", "Safari", "Firefox", "Edge"]
+
+EVENTS_PATH = re.compile(r"^/api/projects/(?P<project>[^/]+)/events/?$")
+
+
+class EventStream:
+    def __init__(
+        self,
+        total_events: int = 1000,
+        users: int = 200,
+        sessions_per_user: int = 3,
+        pageview_ratio: float = 0.6,
+        window_hours: float = 23.5,
+        seed: int = 42,
+        now: Optional[datetime] = None,
+    ):
+        self.total_events = total_events
+        self.users = max(1, users)
+        self.sessions_per_user = max(1, sessions_per_user)
+        self.pageview_ratio = pageview_ratio
+        self.seed = seed
+        self.now = now or datetime.now(timezone.utc)
+        # Events sit inside a slightly shorter window than the 24h the backend
+        # asks for, so the whole stream matches however long a benchmark runs
+        self.window = timedelta(hours=window_hours)
+        self.spacing = self.window / max(1, total_events)
+        self._names = [name for name, _ in CUSTOM_EVENTS]
+        self._weights = [weight for _, weight in CUSTOM_EVENTS]
+
+    def index_range(
+        self, after: Optional[str], before: Optional[str]
+    ) -> Tuple[int, int]:
+        """Translate after/before timestamps into [start, stop) event indexes"""
+        start, stop = 0, self.total_events
+        if before:
+            start = min(stop, self._position(_parse(before)))
+        if after:
+            stop = min(stop, self._position(_parse(after)))
+        return start, max(start, stop)
+
+    def _position(self, timestamp: datetime) -> int:
+        """Number of events newer than timestamp"""
+        age = (self.now - timestamp).total_seconds()
+        return max(0, math.ceil(age / self.spacing.total_seconds() - 0.5))
+
+    def events(self, start: int, count: int) -> List[Dict[str, Any]]:
+        """Generate events start..start+count (index 0 is the newest)"""
+        rng = random.Random(self.seed * 1_000_003 + start)
+        events = []
+        for index in range(start, min(start + count, self.total_events)):
+            # Skewed so a few power users produce most of the traffic
+            user = int(self.users * rng.random() ** 2)
+            session = rng.randrange(self.sessions_per_user)
+            if rng.random() < self.pageview_ratio:
+                name = "$pageview"
+            else:
+                name = rng.choices(self._names, self._weights)[0]
+
+            timestamp = self.now - self.spacing * (index + 0.5)
+            events.append(
+                {
+                    "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                    "distinct_id": f"user-{user}",
+                    "event": name,
+                    "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+                    "properties": {
+                        "$session_id": f"session-{user}-{session}",
+                        "$current_url": f"https://example.com{rng.choice(PAGES)}",
+                        "$referrer": rng.choice(REFERRERS),
+                        "$browser": rng.choice(BROWSERS),
+                        "$os": "Linux",
+                        "$lib": "web",
+                        "$lib_version": "1.96.0",
+                        "$screen_width": 1920,
+                        "$screen_height": 1080,
+                    },
+                    "elements": [],
+                    "elements_chain": "",
+                }
+            )
+        return events
+
+
+def _parse(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class PostHogStub:
+    def __init__(
+        self,
+        stream: EventStream,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_page_size: int = 1000,
+        latency: float = 0.0,
+        cache_pages: bool = True,
+        rate_limit: Optional[int] = None,
+    ):
+        self.stream = stream
+        self.max_page_size = max_page_size
+        self.latency = latency
+        self.cache_pages = cache_pages
+        # Requests answered before the stub starts replying 429, like a quota
+        self.rate_limit = rate_limit
+        self.requests_served = 0
+        # Query strings of every events request, for tests
+        self.queries: List[Dict[str, List[str]]] = []
+        self._cache: Dict[Tuple[int, int, int], bytes] = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def page_body(self, base_url: str, query: Dict[str, List[str]]) -> bytes:
+        """Build the JSON body for one page of the events endpoint"""
+        start, stop = self.stream.index_range(
+            query.get("after", [""])[0] or None, query.get("before", [""])[0] or None
+        )
+        limit = min(int(query.get("limit", ["100"])[0]), self.max_page_size)
+        offset = int(query.get("offset", ["0"])[0])
+        first = start + offset
+
+        key = (first, stop, limit)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        count = max(0, min(limit, stop - first))
+        next_url = None
+        if first + count < stop:
+            next_query = {k: v[0] for k, v in query.items()}
+            next_query["offset"] = str(offset + count)
+            next_url = f"{base_url}?{urlencode(next_query)}"
+
+        body = json.dumps(
+            {"next": next_url, "results": self.stream.events(first, count)}
+        ).encode()
+        if self.cache_pages:
+            with self._lock:
+                self._cache[key] = body
+        return body
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+        parsed = urlparse(request.path)
+        if not EVENTS_PATH.match(parsed.path):
+            request.send_error(404)
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.rate_limit is not None:
+            with self._lock:
+                remaining = self.rate_limit - self.requests_served
+            if remaining <= 0:
+                request.send_response(429)
+                request.send_header("Retry-After", "60")
+                request.send_header("Content-Length", "0")
+                request.end_headers()
+                return
+
+        host = request.headers.get("Host", "127.0.0.1")
+        query = parse_qs(parsed.query)
+        body = self.page_body(f"http://{host}{parsed.path}", query)
+        with self._lock:
+            self.requests_served += 1
+            self.queries.append(query)
+
+        request.send_response(200)
+        if self.rate_limit is not None:
+            request.send_header("X-RateLimit-Limit", str(self.rate_limit))
+            request.send_header("X-RateLimit-Remaining", str(remaining - 1))
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self) -> "PostHogStub":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="posthog-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PostHog events API stub")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sessions-per-user", type=int, default=3)
+    parser.add_argument("--pageview-ratio", type=float, default=0.6)
+    parser.add_argument("--max-page-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    args = parser.parse_args()
+
+    stream = EventStream(
+        total_events=args.events,
+        users=args.users,
+        sessions_per_user=args.sessions_per_user,
+        pageview_ratio=args.pageview_ratio,
+        seed=args.seed,
+    )
+    stub = PostHogStub(
+        stream,
+        host=args.host,
+        port=args.port,
+        max_page_size=args.max_page_size,
+        latency=args.latency,
+    )
+    # The parent benchmark reads this line to find the port
+    print(json.dumps({"url": stub.url}), flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import psutil
+
+from ota_manager import OTAManager
+
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+
+
+def get_boot_id() -> str:
+    """Get an identifier that is unique to the current system boot"""
+    try:
+        with open(BOOT_ID_FILE, "r") as f:
+            return f.read().strip()
+    except Exception:
+        return str(int(psutil.boot_time()))
+
+
+def check_network() -> bool:
+    """Check if we have internet connectivity"""
+    try:
+        # Same target network-boot.py pings, but a TCP connect needs no root
+        with socket.create_connection(("8.8.8.8", 53), timeout=3):
+            return True
+    except OSError:
+        return False
+
+
+class BootOrchestrator:
+    def __init__(
+        self,
+        ota_manager: OTAManager,
+        state_file: str,
+        network_check: Callable[[], bool] = check_network,
+        network_timeout: float = 300,
+        network_poll_interval: float = 5,
+    ):
+        self.ota_manager = ota_manager
+        self.state_file = state_file
+        self.network_check = network_check
+        self.network_timeout = network_timeout
+        self.network_poll_interval = network_poll_interval
+        self.boot_id = get_boot_id()
+        self.process_started = float(psutil.Process().create_time())
+        self.boot_update_result: Optional[Dict[str, Any]] = None
+        self._phases: Dict[str, Dict[str, Any]] = {}
+        self._milestones: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._update_thread: Optional[threading.Thread] = None
+
+    def _offset(self, timestamp: Optional[float] = None) -> float:
+        """Seconds between process start and timestamp (default: now)"""
+        return round((timestamp or time.time()) - self.process_started, 3)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Time a boot phase and record it in the report"""
+        record: Dict[str, Any] = {"start": self._offset(), "status": "running"}
+        with self._lock:
+            self._phases[name] = record
+
+        started = time.monotonic()
+        try:
+            yield record
+            if record["status"] == "running":
+                record["status"] = "ok"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+            raise
+        finally:
+            record["duration"] = round(time.monotonic() - started, 3)
+
+    def mark(self, name: str) -> None:
+        """Record the first time a boot milestone is reached"""
+        with self._lock:
+            if name not in self._milestones:
+                self._milestones[name] = self._offset()
+
+    def wait_for_network(self) -> bool:
+        """Poll connectivity until the network is up or the timeout expires"""
+        deadline = time.monotonic() + self.network_timeout
+        while True:
+            if self.network_check():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.network_poll_interval)
+
+    @contextmanager
+    def _state_lock(self) -> Iterator[None]:
+        """Serialise boot checks between app.py and boot-update.py"""
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        with open(f"{self.state_file}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_file, "r") as f:
+                state: Dict[str, Any] = json.load(f)
+                return state
+        except Exception:
+            return {}
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"Error saving boot state: {e}")
+
+    def run_boot_update(self) -> Dict[str, Any]:
+        """Run the OTA boot check at most once per system boot"""
+        with self._state_lock():
+            state = self._load_state()
+            if state.get("boot_id") == self.boot_id and state.get("boot_update"):
+                result = {
+                    "skipped": True,
+                    "reason": "Boot update already performed for this boot",
+                    "previous": state["boot_update"],
+                }
+                self.boot_update_result = result
+                return result
+
+            with self.phase("boot_update") as record:
+                result = self.ota_manager.perform_boot_update()
+                if result.get("error"):
+                    record["status"] = "error"
+                    record["error"] = result["error"]
+
+            # A failed fetch should be retried by the next caller this boot
+            if not result.get("error"):
+                state = {
+                    "boot_id": self.boot_id,
+                    "boot_update": {
+                        "finished_at": datetime.now(timezone.utc).isoformat(),
+                        "pid": os.getpid(),
+                        "duration": record["duration"],
+                        "result": result,
+                    },
+                }
+                self._save_state(state)
+
+        self.boot_update_result = result
+        return result
+
+    def _background_update(self) -> None:
+        try:
+            with self.phase("network_wait") as record:
+                if not self.wait_for_network():
+                    record["status"] = "timeout"
+
+            if record["status"] != "ok":
+                self.boot_update_result = {"error": "Network not available"}
+                return
+
+            result = self.run_boot_update()
+            if result.get("error"):
+                print(f"Boot update warning: {result['error']}")
+            elif result.get("success"):
+                print("Boot update completed successfully; restart to run it")
+        except Exception as e:
+            self.boot_update_result = {"error": str(e)}
+            print(f"Boot update check failed: {e}")
+        finally:
+            print(f"Boot timing report: {json.dumps(self.get_report())}")
+
+    def start_background_update(self) -> threading.Thread:
+        """Run the OTA boot check off the critical path once the network is up"""
+        if self._update_thread is None:
+            self._update_thread = threading.Thread(
+                target=self._background_update, name="boot-update", daemon=True
+            )
+            self._update_thread.start()
+        return self._update_thread
+
+    def get_report(self) -> Dict[str, Any]:
+        """Get per-phase boot timings relative to process start"""
+        with self._lock:
+            phases = {name: dict(record) for name, record in self._phases.items()}
+            milestones = dict(self._milestones)
+
+        result = self.boot_update_result
+        return {
+            "boot_id": self.boot_id,
+            "process_started_at": datetime.fromtimestamp(
+                self.process_started, timezone.utc
+            ).isoformat(),
+            "system_boot_to_process": round(
+                self.process_started - psutil.boot_time(), 3
+            ),
+            "uptime": self._offset(),
+            "phases": phases,
+            "milestones": milestones,
+            "time_to_first_paint": milestones.get("first_stats_served"),
+            "boot_update": result,
+            "restart_required": bool(result and result.get("success")),
+        }
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import time
+from typing import List, Optional, Sequence
+
+# Shared by every checkout and release worktree on the device; stdlib only,
+# since run.py imports it before the virtualenv exists
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "posthog-pi")
+# Written into a restored or freshly built artifact
+KEY_FILE = ".build-key"
+# Written into a cached virtualenv once its requirements are installed
+COMPLETE_FILE = ".complete"
+
+
+def frontend_key(repo: str) -> Optional[str]:
+    """Git tree hash of frontend/ at HEAD; None if it has uncommitted changes"""
+    try:
+        tree = subprocess.run(
+            ["git", "rev-parse", "HEAD:frontend"],
+            cwd=repo,
+            capture_output=True,
+            text=True,
+        )
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--", "frontend"],
+            cwd=repo,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    if tree.returncode != 0 or status.returncode != 0 or status.stdout.strip():
+        return None
+    return tree.stdout.strip()
+
+
+def requirements_key(requirements: str) -> str:
+    """Hash of the requirements file and the interpreter it is installed for"""
+    digest = hashlib.sha256()
+    with open(requirements, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{platform.python_version()} {platform.machine()}".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_key(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, KEY_FILE)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def write_key(path: str, key: str) -> None:
+    with open(os.path.join(path, KEY_FILE), "w") as f:
+        f.write(key)
+
+
+class BuildCache:
+    """Frontend builds and virtualenvs stored by the hash of what produced them"""
+
+    def __init__(self, root: Optional[str] = None, keep: Optional[int] = None):
+        self.root = root or os.getenv("BUILD_CACHE_DIR") or DEFAULT_CACHE_DIR
+        # Entries kept per kind; the least recently used go first
+        self.keep = (
+            keep if keep is not None else int(os.getenv("BUILD_CACHE_KEEP", "3"))
+        )
+
+    def path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, key)
+
+    def _touch(self, path: str) -> None:
+        """Mark an entry as just used, for least recently used pruning"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def restore(self, kind: str, key: str, target: str) -> bool:
+        """Put the cached artifact for key at target; False on a miss"""
+        if read_key(target) == key:
+            self._touch(self.path(kind, key))
+            return True
+        cached = self.path(kind, key)
+        if read_key(cached) != key:
+            return False
+
+        # Copy beside the target, then swap, so a crash never leaves half of it
+        staging = f"{target}.restore"
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(cached, staging, symlinks=True)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        self._touch(cached)
+        return True
+
+    def save(self, kind: str, key: str, source: str) -> str:
+        """Store a freshly built artifact under key"""
+        write_key(source, key)
+        entry = self.path(kind, key)
+        staging = f"{entry}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(source, staging, symlinks=True)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+        self.prune(kind, [entry])
+        return entry
+
+    def is_complete(self, path: str) -> bool:
+        return os.path.exists(os.path.join(path, COMPLETE_FILE))
+
+    def mark_complete(
+        self, kind: str, path: str, protected: Sequence[str] = ()
+    ) -> None:
+        """Record that an entry built in place (e.g. a virtualenv) is usable"""
+        with open(os.path.join(path, COMPLETE_FILE), "w") as f:
+            f.write(str(time.time()))
+        self.prune(kind, [path, *protected])
+
+    def prune(self, kind: str, protected: List[str]) -> List[str]:
+        """Remove entries beyond the newest `keep`, never the protected ones"""
+        directory = os.path.join(self.root, kind)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        # Staging copies (*.tmp) belong to a save still in progress
+        entries = sorted(
+            (os.path.join(directory, n) for n in names if not n.endswith(".tmp")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        keep = {os.path.realpath(path) for path in protected}
+        removed = []
+        for entry in entries[max(self.keep, 1) :]:
+            if os.path.realpath(entry) not in keep:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed.append(os.path.basename(entry))
+        return removed
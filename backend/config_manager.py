@@ -3,6 +3,10 @@ import os
 from datetime import datetime
 from typing import Dict, Any
 
+# Runtime state (stats snapshots, boot reports) lives next to the backend
+# unless DASHBOARD_DATA_DIR points somewhere else
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
 
 class ConfigManager:
     def __init__(self, config_file: str = "device_config.json"):
@@ -24,7 +28,14 @@ class ConfigManager:
                 "theme": "dark",
                 "brightness": 100,
                 "rotation": 0,
+                # Seconds without a touch before the dashboard blanks (0 never)
                 "screensaver_timeout": 0,
+                # While the screen is hidden or blanked, PostHog is queried at
+                # most this often (seconds)
+                "idle_refresh_interval": 300,
+                # Poll sooner while the last hour is busier than the day's
+                # average and later while it is quieter
+                "adaptive_refresh": True,
                 "metrics": {
                     "top": {"type": "events_24h", "label": "Events", "enabled": True},
                     "left": {
@@ -47,10 +58,20 @@ class ConfigManager:
             },
             "advanced": {
                 "debug_mode": False,
+                # Request profiling, only active while debug_mode is on
+                "profile_sample_rate": 0.05,
+                "profile_top_n": 20,
+                "profile_interval_ms": 5,
                 "log_level": "INFO",
                 "auto_update": True,
                 "backup_enabled": True,
             },
+            "fleet": {
+                # standalone, hub (fetches and publishes) or leaf (follows a hub)
+                "mode": "standalone",
+                "hub_url": "",
+                "token": "",
+            },
             "ota": {
                 "enabled": True,
                 "branch": "main",
@@ -58,6 +79,31 @@ class ConfigManager:
                 "auto_pull": True,
                 "last_update": None,
                 "last_check": None,
+                # Fetches of the same branch within this many seconds are reused
+                "fetch_max_age": 60,
+                # Optional --depth / --filter (e.g. "blob:none") for OTA fetches
+                "fetch_depth": 0,
+                "fetch_filter": None,
+                # in_place updates this checkout; worktree builds each update in
+                # releases/ and hands traffic over to it without downtime
+                "apply_mode": "in_place",
+                "releases_dir": None,
+                "keep_releases": 3,
+                # Backup tags beyond the newest backup_keep or older than
+                # backup_max_age_days are deleted (0 turns either limit off)
+                "backup_keep": 20,
+                "backup_max_age_days": 90,
+                # git housekeeping (pack-refs, repack, commit-graph, prune),
+                # run in the local window when the load average is below max
+                "maintenance_enabled": True,
+                "maintenance_window": "02:00-05:00",
+                "maintenance_interval_hours": 24,
+                "maintenance_budget_seconds": 300,
+                "maintenance_max_load": 1.0,
+                "maintenance_max_loose": 100,
+                "maintenance_max_packs": 10,
+                "maintenance_prune_expire": "2.weeks.ago",
+                "last_maintenance": None,
             },
         }
         self.load_config()
@@ -140,6 +186,12 @@ class ConfigManager:
             print(f"Error importing config: {e}")
             return False
 
+    def get_data_dir(self) -> str:
+        """Get directory for runtime state files"""
+        data_dir = os.getenv("DASHBOARD_DATA_DIR") or DEFAULT_DATA_DIR
+        os.makedirs(data_dir, exist_ok=True)
+        return data_dir
+
     def validate_posthog_config(self) -> Dict[str, Any]:
         """Validate PostHog configuration"""
         posthog_config = self.get_section("posthog")
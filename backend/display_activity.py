@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from telemetry import DISPLAY_WAKES
+
+# How far event velocity may move the configured refresh interval
+FASTEST_FACTOR = 0.25
+SLOWEST_FACTOR = 4.0
+# A display that misses this many polls in a row has gone away (browser
+# closed or crashed) and counts as idle until it polls again
+ABSENT_POLLS = 3
+MIN_ABSENT_SECONDS = 90.0
+# Displays unseen for this long are forgotten
+FORGET_SECONDS = 86400.0
+
+
+def adaptive_interval(
+    base: float, stats: Optional[Dict[str, Any]], minimum: float = 5.0
+) -> float:
+    """Refresh interval scaled by the last hour's events against the 24h average"""
+    if not stats or stats.get("error"):
+        return max(base, minimum)
+    try:
+        hourly = float(stats.get("events_24h") or 0) / 24
+        recent = float(stats.get("events_1h") or 0)
+    except (TypeError, ValueError):
+        return max(base, minimum)
+
+    # Busier than usual refreshes sooner, quieter than usual later
+    if hourly <= 0 or recent <= 0:
+        factor = SLOWEST_FACTOR
+    else:
+        factor = min(max(hourly / recent, FASTEST_FACTOR), SLOWEST_FACTOR)
+    return round(max(base * factor, minimum), 1)
+
+
+class DisplayState:
+    """One display's last visibility report and poll"""
+
+    def __init__(self, now: float):
+        self.visible = True
+        self.reason: Optional[str] = None
+        self.last_seen = now
+
+
+class DisplayActivity:
+    """Whether anyone is watching a screen, from each display's reports and polls"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        # By "address/id", or the address alone for clients that send no id
+        self._displays: Dict[str, DisplayState] = {}
+        self._interval = 30.0
+        self._wakes = 0
+
+    def _absent(self, display: DisplayState, now: float) -> bool:
+        timeout = max(ABSENT_POLLS * self._interval, MIN_ABSENT_SECONDS)
+        return now - display.last_seen > timeout
+
+    def _watching(self, display: DisplayState, now: float) -> bool:
+        return display.visible and not self._absent(display, now)
+
+    def _idle(self, now: float) -> bool:
+        # Until a display has been seen, assume one is about to be
+        if not self._displays:
+            return False
+        return not any(self._watching(d, now) for d in self._displays.values())
+
+    def _seen(self, client: str, now: float) -> DisplayState:
+        display = self._displays.get(client)
+        if display is None:
+            display = self._displays[client] = DisplayState(now)
+            # Forget displays long gone, e.g. a laptop that once opened it
+            cutoff = now - FORGET_SECONDS
+            for key, other in list(self._displays.items()):
+                if other.last_seen < cutoff:
+                    del self._displays[key]
+        display.last_seen = now
+        return display
+
+    def _woke(self) -> None:
+        self._wakes += 1
+        DISPLAY_WAKES.inc()
+
+    def report(
+        self, visible: bool, reason: Optional[str] = None, client: str = "local"
+    ) -> bool:
+        """Record a display's visibility report; True if it woke an idle screen"""
+        now = self._clock()
+        with self._lock:
+            was_idle = self._idle(now)
+            # A report from an address alone, such as a DPMS hook on the kiosk,
+            # covers every display at that address
+            covered = [
+                display
+                for key, display in self._displays.items()
+                if key.startswith(f"{client}/")
+            ]
+            for display in covered or [self._seen(client, now)]:
+                display.last_seen = now
+                display.visible = visible
+                display.reason = None if visible else reason or "hidden"
+            if was_idle and visible:
+                self._woke()
+                return True
+            return False
+
+    def poll(self, client: str = "local") -> bool:
+        """Record a display's stats poll; True if it ended an idle spell"""
+        now = self._clock()
+        with self._lock:
+            was_idle = self._idle(now)
+            display = self._seen(client, now)
+            returned = was_idle and display.visible
+            if returned:
+                self._woke()
+            return returned
+
+    def set_interval(self, seconds: float) -> None:
+        """Record the interval the displays were told to poll at"""
+        with self._lock:
+            self._interval = seconds
+
+    def is_idle(self) -> bool:
+        with self._lock:
+            return self._idle(self._clock())
+
+    def get_status(self) -> Dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            idle = self._idle(now)
+            latest = max(
+                self._displays.values(), key=lambda d: d.last_seen, default=None
+            )
+            if not idle or latest is None:
+                reason = None
+            elif not latest.visible:
+                reason = latest.reason
+            else:
+                reason = "absent"
+            return {
+                "state": "idle" if idle else "active",
+                "visible": latest is None or latest.visible,
+                "reason": reason,
+                "seconds_since_seen": (
+                    None if latest is None else round(now - latest.last_seen, 1)
+                ),
+                "displays": len(self._displays),
+                "watching": sum(
+                    self._watching(d, now) for d in self._displays.values()
+                ),
+                "wakes": self._wakes,
+            }
@@ -0,0 +1,129 @@
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a PostHog ISO timestamp (with a trailing Z) into an aware datetime"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def get_session_id(event: Dict[str, Any]) -> Optional[str]:
+    """PostHog puts $session_id in properties; older payloads had it top-level"""
+    return event.get("$session_id") or (event.get("properties") or {}).get(
+        "$session_id"
+    )
+
+
+def page_path(event: Dict[str, Any]) -> Optional[str]:
+    """$current_url without the query string or fragment"""
+    url = (event.get("properties") or {}).get("$current_url")
+    return url.split("#", 1)[0].split("?", 1)[0] if url else None
+
+
+def referrer(event: Dict[str, Any]) -> Optional[str]:
+    return (event.get("properties") or {}).get("$referrer")
+
+
+# Upstream fields the metrics read; everything else in an event is discarded
+EVENT_FIELDS = ("id", "event", "distinct_id", "timestamp", "$session_id")
+EVENT_PROPERTIES = ("$session_id", "$current_url", "$referrer")
+
+
+def slim_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of an upstream event holding only EVENT_FIELDS and EVENT_PROPERTIES"""
+    slim = {key: event[key] for key in EVENT_FIELDS if key in event}
+    properties = event.get("properties") or {}
+    slim["properties"] = {
+        key: properties[key] for key in EVENT_PROPERTIES if key in properties
+    }
+    return slim
+
+
+class StringTable:
+    """Dictionary encoding: each distinct string is stored once, rows hold codes"""
+
+    def __init__(self):
+        # Code 0 is reserved for a missing value
+        self.values: List[Optional[str]] = [None]
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code_of(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+
+# Columns kept per event; everything else in the payload is dropped on arrival
+COLUMNS = ("event", "distinct_id", "session_id", "page", "referrer")
+
+
+class EventBatch:
+    """Columnar events: epoch-second timestamps and dictionary-encoded strings"""
+
+    def __init__(self, recent_size: int = 10):
+        self.recent_size = recent_size
+        self.timestamps = array("d")
+        # hash() of each event id, enough to spot re-fetched events in-process
+        self.id_hashes = array("q")
+        self.codes: Dict[str, "array[int]"] = {name: array("I") for name in COLUMNS}
+        self.tables: Dict[str, StringTable] = {name: StringTable() for name in COLUMNS}
+        # The newest raw events, shown as-is in the recent events list
+        self.recent: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]]) -> "EventBatch":
+        batch = cls()
+        batch.extend(events)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def extend(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Convert a page of parsed events; pages must arrive newest first"""
+        timestamps, id_hashes = self.timestamps, self.id_hashes
+        encoders = [self.tables[name].encode for name in COLUMNS]
+        columns = [self.codes[name] for name in COLUMNS]
+        for event in events:
+            if len(self.recent) < self.recent_size:
+                self.recent.append(event)
+            timestamps.append(parse_timestamp(event.get("timestamp", "")).timestamp())
+            id_hashes.append(hash(event.get("id")))
+            values = (
+                event.get("event"),
+                event.get("distinct_id"),
+                get_session_id(event),
+                page_path(event),
+                referrer(event),
+            )
+            for column, encode, value in zip(columns, encoders, values):
+                column.append(encode(value))
+
+    def count(self, column: str, value: str) -> int:
+        """Rows whose column equals value"""
+        code = self.tables[column].code_of(value)
+        return 0 if code is None else self.codes[column].count(code)
+
+    def distinct(self, column: str, skip_empty: bool = False) -> int:
+        """Distinct values in a column; skip_empty ignores missing and ''"""
+        codes = set(self.codes[column])
+        if skip_empty:
+            values = self.tables[column].values
+            return sum(1 for code in codes if values[code])
+        return len(codes)
+
+    def rows(self, *columns: str) -> Iterator[Tuple[Any, ...]]:
+        """(timestamp, id hash, *column values) per row, newest first"""
+        decoded = [(self.codes[name], self.tables[name].values) for name in columns]
+        for index, timestamp in enumerate(self.timestamps):
+            yield (timestamp, self.id_hashes[index]) + tuple(
+                values[codes[index]] for codes, values in decoded
+            )
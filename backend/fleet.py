@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from health import HealthMonitor
+from posthog_client import PostHogClient
+
+if TYPE_CHECKING:
+    import requests
+
+FLEET_MODES = ("standalone", "hub", "leaf")
+
+# Leaves that haven't polled for this long drop off the hub's subscriber list
+SUBSCRIBER_EXPIRY = 600
+
+
+def get_fleet_settings(fleet_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve fleet mode, hub URL and token; env vars override the config"""
+    mode = os.getenv("DASHBOARD_FLEET_MODE") or fleet_config.get("mode")
+    return {
+        "mode": mode if mode in FLEET_MODES else "standalone",
+        "hub_url": (
+            os.getenv("DASHBOARD_HUB_URL") or fleet_config.get("hub_url") or ""
+        ).rstrip("/"),
+        "token": os.getenv("DASHBOARD_FLEET_TOKEN") or fleet_config.get("token", ""),
+    }
+
+
+class FleetHub:
+    def __init__(self):
+        self._subscribers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record_subscriber(self, device: str, address: Optional[str]) -> None:
+        """Remember which leaves are polling this hub"""
+        with self._lock:
+            subscriber = self._subscribers.setdefault(device, {"polls": 0})
+            subscriber.update(
+                {"address": address, "last_seen": time.time()},
+                polls=subscriber["polls"] + 1,
+            )
+
+    def get_subscribers(self) -> List[Dict[str, Any]]:
+        cutoff = time.time() - SUBSCRIBER_EXPIRY
+        with self._lock:
+            for device in [
+                d for d, s in self._subscribers.items() if s["last_seen"] < cutoff
+            ]:
+                del self._subscribers[device]
+            return [
+                {
+                    "device": device,
+                    "address": s["address"],
+                    "polls": s["polls"],
+                    "last_seen": datetime.fromtimestamp(s["last_seen"]).isoformat(),
+                }
+                for device, s in sorted(self._subscribers.items())
+            ]
+
+
+class FleetSubscriber:
+    def __init__(
+        self,
+        device_name: str,
+        timeout: float = 5,
+        health_monitor: Optional[HealthMonitor] = None,
+    ):
+        self.device_name = device_name
+        self.timeout = timeout
+        self.health_monitor = health_monitor
+        self.hub_url = ""
+        self.token = ""
+        self._session: Optional["requests.Session"] = None
+        # Last payload and ETag per project ("" is the combined view)
+        self._snapshots: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.last_sync: Optional[float] = None
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> "requests.Session":
+        if self._session is None:
+            self._session = PostHogClient.create_session(pool_maxsize=2)
+        return self._session
+
+    def configure(self, hub_url: str, token: str = "") -> None:
+        with self._lock:
+            if hub_url != self.hub_url:
+                self._snapshots.clear()
+            self.hub_url = hub_url
+            self.token = token
+
+    def fetch(self, project: Optional[str] = None) -> Dict[str, Any]:
+        """Get the hub's current snapshot, revalidating with If-None-Match"""
+        if not self.hub_url:
+            raise RuntimeError("Fleet hub URL not configured")
+
+        key = project or ""
+        headers = {"X-Dashboard-Device": self.device_name}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        with self._lock:
+            cached = self._snapshots.get(key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        import requests
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(
+                f"{self.hub_url}/api/fleet/snapshot",
+                params={"project": project} if project else None,
+                headers=headers,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            self._record(started, False, f"Fleet hub unreachable: {e}")
+            raise RuntimeError(f"Fleet hub unreachable: {e}") from e
+
+        if response.status_code == 304 and cached:
+            self._record(started, True, "")
+            self.not_modified += 1
+            return cached[1]
+        if response.status_code != 200:
+            error = f"Fleet hub error: {response.status_code}"
+            self._record(started, False, error)
+            raise RuntimeError(error)
+
+        stats: Dict[str, Any] = response.json()
+        self._record(started, "error" not in stats, stats.get("error", ""))
+        if "error" in stats:
+            raise RuntimeError(f"Fleet hub: {stats['error']}")
+        with self._lock:
+            self._snapshots[key] = (response.headers.get("ETag", ""), stats)
+        return stats
+
+    def _record(self, started: float, success: bool, error: str) -> None:
+        if success:
+            self.last_sync = time.time()
+        if self.health_monitor is not None:
+            self.health_monitor.record_upstream(
+                time.perf_counter() - started, success, error
+            )
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "hub_url": self.hub_url,
+            "last_sync": (
+                datetime.fromtimestamp(self.last_sync).isoformat()
+                if self.last_sync
+                else None
+            ),
+            "not_modified": self.not_modified,
+        }
@@ -0,0 +1,183 @@
+import os
+import select
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from werkzeug.serving import BaseWSGIServer
+
+# Listening socket inherited from the process handing over to this one
+SERVER_FD_ENV = "DASHBOARD_SERVER_FD"
+# Pipe this process writes to once it is about to accept connections
+READY_FD_ENV = "DASHBOARD_READY_FD"
+
+
+def notify_systemd(message: str) -> bool:
+    """Send an sd_notify message if running under a systemd unit that allows it"""
+    address = os.getenv("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(message.encode())
+        return True
+    except OSError as e:
+        print(f"Error notifying systemd: {e}")
+        return False
+
+
+class HandoffServer:
+    """WSGI server that can pass its listening socket to a successor process"""
+
+    def __init__(
+        self,
+        app: Any,
+        host: str,
+        port: int,
+        ready_timeout: float = 120,
+        drain_timeout: float = 30,
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.ready_timeout = ready_timeout
+        self.drain_timeout = drain_timeout
+        self._server: Optional["BaseWSGIServer"] = None
+        self._connections: Set[Any] = set()
+        self._idle = threading.Condition()
+        self._handover_lock = threading.Lock()
+        self._successor: Optional[int] = None
+
+    def _track_connections(self, server: "BaseWSGIServer") -> None:
+        """Track connections from accept until closed, for the drain to wait on"""
+        # Counting requests in the app would miss a connection accepted just
+        # before the handover whose request line hasn't been read yet
+        process_request = server.process_request
+        shutdown_request = server.shutdown_request
+
+        def accepted(request: Any, client_address: Any) -> None:
+            with self._idle:
+                self._connections.add(request)
+            process_request(request, client_address)
+
+        def closed(request: Any) -> None:
+            try:
+                shutdown_request(request)
+            finally:
+                with self._idle:
+                    self._connections.discard(request)
+                    self._idle.notify_all()
+
+        server.process_request = accepted  # type: ignore[method-assign]
+        server.shutdown_request = closed  # type: ignore[method-assign]
+
+    def serve_forever(self) -> None:
+        """Serve until stopped, or until a successor has taken over the socket"""
+        from werkzeug.serving import make_server
+
+        inherited = os.environ.pop(SERVER_FD_ENV, None)
+        fd = int(inherited) if inherited else None
+        self._server = make_server(self.host, self.port, self.app, threaded=True, fd=fd)
+        self._track_connections(self._server)
+        if fd is not None:
+            # make_server works on a duplicate of the inherited descriptor
+            os.close(fd)
+        else:
+            self._server.log_startup()
+
+        ready = os.environ.pop(READY_FD_ENV, None)
+        if ready:
+            os.write(int(ready), b"1")
+            os.close(int(ready))
+
+        self._server.serve_forever()
+        if self._successor is not None:
+            self._drain()
+
+    def _drain(self) -> None:
+        """Wait for connections accepted before the handover to be served"""
+        deadline = time.monotonic() + self.drain_timeout
+        with self._idle:
+            while self._connections:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"Handover: {len(self._connections)} connections still open")
+                    break
+                self._idle.wait(remaining)
+        print(f"Handed over to process {self._successor}")
+
+    def hand_over(
+        self,
+        backend_dir: str,
+        env: Optional[Dict[str, str]] = None,
+        python: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Start app.py from backend_dir on this socket, then stop accepting"""
+        if not self._handover_lock.acquire(blocking=False):
+            return {"success": False, "error": "A handover is already running"}
+        try:
+            if self._server is None or self._successor is not None:
+                return {"success": False, "error": "Server is not accepting requests"}
+
+            listen_fd = self._server.socket.fileno()
+            read_fd, write_fd = os.pipe()
+            child_env = dict(os.environ, **(env or {}))
+            child_env[SERVER_FD_ENV] = str(listen_fd)
+            child_env[READY_FD_ENV] = str(write_fd)
+            started = time.monotonic()
+            try:
+                process = subprocess.Popen(
+                    [python or sys.executable, "app.py"],
+                    cwd=backend_dir,
+                    env=child_env,
+                    pass_fds=(listen_fd, write_fd),
+                    # Outlives this process once the handover is complete
+                    start_new_session=True,
+                )
+            finally:
+                os.close(write_fd)
+            try:
+                ready = self._wait_ready(read_fd)
+            finally:
+                os.close(read_fd)
+
+            if not ready:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                return {
+                    "success": False,
+                    "error": "New server did not become ready; still serving the "
+                    "current release",
+                    "exit_code": process.poll(),
+                }
+
+            # Both processes now accept from the same socket; once this one
+            # stops, connections still queued on it go to the successor
+            notify_systemd(f"MAINPID={process.pid}")
+            self._successor = process.pid
+            threading.Thread(
+                target=self._server.shutdown, name="handover", daemon=True
+            ).start()
+            return {
+                "success": True,
+                "pid": process.pid,
+                "seconds": round(time.monotonic() - started, 3),
+            }
+        finally:
+            self._handover_lock.release()
+
+    def _wait_ready(self, read_fd: int) -> bool:
+        """Whether the successor wrote to the ready pipe before ready_timeout"""
+        readable, _, _ = select.select([read_fd], [], [], self.ready_timeout)
+        # An empty read means it exited before it was ready
+        return bool(readable) and os.read(read_fd, 1) == b"1"
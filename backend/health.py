@@ -0,0 +1,144 @@
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values, or None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        disk_paths: Dict[str, str],
+        latency_window: int = 256,
+        disk_cache_ttl: float = 60,
+        min_disk_free: int = 50 * 1024 * 1024,
+    ):
+        self.disk_paths = disk_paths
+        self.disk_cache_ttl = disk_cache_ttl
+        self.min_disk_free = min_disk_free
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self._disk: Dict[str, Dict[str, Any]] = {}
+        self._disk_checked_at = 0.0
+
+    def record_upstream(
+        self, latency: float, success: bool, error: Optional[str] = None
+    ) -> None:
+        """Record the outcome of a PostHog call"""
+        with self._lock:
+            self._latencies.append(latency)
+            if success:
+                self.last_success_at = time.time()
+                self.consecutive_failures = 0
+            else:
+                self.last_failure_at = time.time()
+                self.last_error = error
+                self.consecutive_failures += 1
+
+    def upstream_latency(self) -> Dict[str, Any]:
+        """Get p50/p99 PostHog latency in milliseconds over the recent window"""
+        with self._lock:
+            latencies = list(self._latencies)
+
+        p50 = percentile(latencies, 50)
+        p99 = percentile(latencies, 99)
+        return {
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "samples": len(latencies),
+        }
+
+    def disk_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Get free space for each watched path, refreshed at most once a minute"""
+        if time.time() - self._disk_checked_at >= self.disk_cache_ttl:
+            disk = {}
+            for name, path in self.disk_paths.items():
+                try:
+                    usage = shutil.disk_usage(path)
+                    disk[name] = {
+                        "path": path,
+                        "free_bytes": usage.free,
+                        "total_bytes": usage.total,
+                    }
+                except OSError as e:
+                    disk[name] = {"path": path, "error": str(e)}
+            self._disk = disk
+            self._disk_checked_at = time.time()
+        return self._disk
+
+    def readiness(
+        self,
+        credentials_configured: bool,
+        snapshot_age: Optional[float],
+        max_snapshot_age: float,
+        ota_operation: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Build the readiness report from already-collected state"""
+        reasons = []
+        status = "ready"
+
+        if not credentials_configured:
+            status = "unavailable"
+            reasons.append("PostHog credentials not configured")
+        elif snapshot_age is None:
+            if self.last_failure_at is not None:
+                status = "unavailable"
+                reasons.append("No data available and PostHog is failing")
+            else:
+                reasons.append("No data fetched yet")
+        else:
+            if snapshot_age > max_snapshot_age:
+                status = "degraded"
+                reasons.append(f"Serving stale data ({int(snapshot_age)}s old)")
+            if self.consecutive_failures:
+                status = "degraded"
+                reasons.append(f"PostHog failing: {self.last_error}")
+
+        disk = self.disk_usage()
+        for name, usage in disk.items():
+            if usage.get("error") or usage.get("free_bytes", 0) < self.min_disk_free:
+                if status == "ready":
+                    status = "degraded"
+                reasons.append(f"Low disk space for {name}")
+
+        return {
+            "status": status,
+            "reasons": reasons,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "upstream": {
+                "credentials_configured": credentials_configured,
+                "last_success_at": _isoformat(self.last_success_at),
+                "last_failure_at": _isoformat(self.last_failure_at),
+                "last_error": self.last_error,
+                "consecutive_failures": self.consecutive_failures,
+                "latency": self.upstream_latency(),
+            },
+            "snapshot_age": round(snapshot_age, 1)
+            if snapshot_age is not None
+            else None,
+            "disk": disk,
+            "ota": {
+                "running": ota_operation is not None,
+                "operation": ota_operation,
+            },
+        }
@@ -0,0 +1,155 @@
+import hashlib
+import operator
+from array import array
+from typing import Callable, Dict, List
+
+
+class CountMinSketch:
+    """Fixed-size frequency sketch; estimates never undercount"""
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = array("L", [0]) * (width * depth)
+
+    def _indexes(self, item: str) -> List[int]:
+        # Stable across processes (unlike hash()), so sketches can be merged
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [
+            row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)
+        ]
+
+    def add(self, item: str, count: int = 1) -> None:
+        for index in self._indexes(item):
+            self.table[index] += count
+
+    def estimate(self, item: str) -> int:
+        return min(self.table[index] for index in self._indexes(item))
+
+    def _combine(self, other: "CountMinSketch", op: Callable[[int, int], int]):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge sketches of different sizes")
+        self.table = array("L", map(op, self.table, other.table))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        self._combine(other, operator.add)
+
+    def subtract(self, other: "CountMinSketch") -> None:
+        """Remove a sketch previously merged into this one"""
+        self._combine(other, operator.sub)
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: at most `capacity` counters, overestimating"""
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def min_count(self) -> int:
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the smallest counter; the newcomer inherits its count
+            victim = min(self.counts, key=self.counts.__getitem__)
+            floor = self.counts.pop(victim)
+            del self.errors[victim]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Combine two summaries, keeping the largest `capacity` counters"""
+        own_floor, other_floor = self.min_count(), other.min_count()
+        counts: Dict[str, int] = {}
+        errors: Dict[str, int] = {}
+        for item in set(self.counts) | set(other.counts):
+            # An item missing from a full summary may have had up to its floor
+            counts[item] = self.counts.get(item, own_floor) + other.counts.get(
+                item, other_floor
+            )
+            errors[item] = self.errors.get(item, own_floor) + other.errors.get(
+                item, other_floor
+            )
+
+        kept = sorted(counts, key=counts.__getitem__, reverse=True)[: self.capacity]
+        self.counts = {item: counts[item] for item in kept}
+        self.errors = {item: errors[item] for item in kept}
+
+
+class TopK:
+    """Space-Saving candidates with counts tightened by a Count-Min sketch"""
+
+    def __init__(self, capacity: int = 64, width: int = 1024, depth: int = 4):
+        self.summary = SpaceSaving(capacity)
+        self.sketch = CountMinSketch(width, depth)
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.summary.add(item, count)
+        self.sketch.add(item, count)
+
+    def update(self, counts: Dict[str, int]) -> None:
+        for item, count in counts.items():
+            self.add(item, count)
+
+    def merge(self, other: "TopK") -> None:
+        self.summary.merge(other.summary)
+        self.sketch.merge(other.sketch)
+
+    def top(self, n: int = 10) -> List[Dict[str, object]]:
+        """Most frequent items with their best count estimate"""
+        return rank(self.summary, self.sketch, n)
+
+
+def rank(
+    summary: SpaceSaving, sketch: CountMinSketch, n: int
+) -> List[Dict[str, object]]:
+    """Top-n candidates of a summary, each count tightened by the sketch"""
+    estimates = {
+        item: min(count, sketch.estimate(item))
+        for item, count in summary.counts.items()
+    }
+    ranked = sorted(estimates.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+    return [{"value": item, "count": count} for item, count in ranked]
+
+
+class SlidingTopK:
+    """Hourly buckets plus a running window sketch, so reads never re-merge them"""
+
+    def __init__(self, capacity: int = 64, width: int = 1024, depth: int = 4):
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.buckets: Dict[str, TopK] = {}
+        self.window = CountMinSketch(width, depth)
+
+    def update(self, key: str, counts: Dict[str, int]) -> None:
+        """Count items in the bucket for key"""
+        top_k = self.buckets.get(key)
+        if top_k is None:
+            top_k = self.buckets[key] = TopK(self.capacity, self.width, self.depth)
+        for item, count in counts.items():
+            top_k.add(item, count)
+            self.window.add(item, count)
+
+    def prune(self, oldest_key: str) -> None:
+        """Drop buckets older than oldest_key and take them out of the window"""
+        for key in [k for k in self.buckets if k < oldest_key]:
+            self.window.subtract(self.buckets.pop(key).sketch)
+
+    def top(self, n: int = 10) -> List[Dict[str, object]]:
+        # Candidate summaries are small; only the sketch is costly to merge
+        summary = SpaceSaving(self.capacity)
+        for top_k in self.buckets.values():
+            summary.merge(top_k.summary)
+        return rank(summary, self.window, n)
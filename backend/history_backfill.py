@@ -0,0 +1,288 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from aggregation_pool import AggregationPool
+from event_batch import get_session_id
+from page_stream import parse_page
+from posthog_client import PostHogClient
+from rate_budget import BACKGROUND
+from stats_history import StatsHistory
+
+HOUR = 3600
+WINDOW_HOURS = 24
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class HourAggregate:
+    """Counts and id sets for one hour of events, across projects"""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.events = 0
+        self.page_views = 0
+        # Prefixed with the project, matching how merge_stats sums users
+        self.users: set = set()
+        self.sessions: set = set()
+
+    def add(self, project: str, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            self.events += 1
+            if event.get("event") == "$pageview":
+                self.page_views += 1
+            self.users.add(f"{project}:{event.get('distinct_id')}")
+            session_id = get_session_id(event)
+            if session_id:
+                self.sessions.add(f"{project}:{session_id}")
+
+    def merge(self, other: "HourAggregate") -> None:
+        self.events += other.events
+        self.page_views += other.page_views
+        self.users |= other.users
+        self.sessions |= other.sessions
+
+
+def hour_partial(project: str, start: float, body: bytes) -> HourAggregate:
+    """Aggregate one raw events page; runs in an AggregationPool worker"""
+    hour = HourAggregate(start)
+    hour.add(project, parse_page(body))
+    return hour
+
+
+def window_stats(window: List[HourAggregate]) -> Dict[str, Any]:
+    """The 24h/1h metrics the live refresh would have shown at the window's end"""
+    events = sum(hour.events for hour in window)
+    page_views = sum(hour.page_views for hour in window)
+    users: set = set().union(*(hour.users for hour in window))
+    return {
+        "events_24h": events,
+        "unique_users_24h": len(users),
+        "page_views_24h": page_views,
+        "custom_events_24h": events - page_views,
+        "sessions_24h": len(set().union(*(hour.sessions for hour in window))),
+        "events_1h": window[-1].events if window else 0,
+        "avg_events_per_user": round(events / len(users), 1) if users else 0,
+    }
+
+
+class HistoryBackfill:
+    """Rebuilds past hourly history from PostHog in the background, resumably"""
+
+    def __init__(
+        self,
+        checkpoint_file: str,
+        history: StatsHistory,
+        clients: Callable[[], Dict[str, PostHogClient]],
+        days: float = 7,
+        duty_cycle: float = 0.2,
+        min_pause: float = 1.0,
+        retry_delay: float = 60.0,
+        pool: Optional[AggregationPool] = None,
+        checkpoint_hours: int = 24,
+        checkpoint_seconds: float = 300.0,
+    ):
+        self.checkpoint_file = checkpoint_file
+        self.history = history
+        self.clients = clients
+        self.days = days
+        # Share of wall time spent fetching/aggregating; the rest is left idle
+        self.duty_cycle = min(1.0, max(0.01, duty_cycle))
+        self.min_pause = min_pause
+        self.retry_delay = retry_delay
+        self.pool = pool
+        # The checkpoint is written every so many hours or seconds, not per hour
+        self.checkpoint_hours = max(1, checkpoint_hours)
+        self.checkpoint_seconds = checkpoint_seconds
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._state: Optional[Dict[str, Any]] = None
+        self._window: List[HourAggregate] = []
+        self.last_error: Optional[str] = None
+        self.load_checkpoint()
+
+    def load_checkpoint(self) -> None:
+        """Resume from the saved watermark, refetching the hours of its window"""
+        try:
+            if os.path.exists(self.checkpoint_file):
+                with open(self.checkpoint_file, "r") as f:
+                    data = json.load(f)
+                # Older checkpoints also carried the window's id sets
+                data.pop("window", None)
+                watermark = data["cursor"]
+                if watermark < data["until"]:
+                    # Only the watermark is saved, so the window is rebuilt
+                    # before points are written again
+                    data["cursor"] = max(
+                        watermark - WINDOW_HOURS * HOUR,
+                        data["start"] - WINDOW_HOURS * HOUR,
+                    )
+                data["recorded"] = watermark
+                self._state = data
+        except Exception as e:
+            print(f"Error loading history backfill checkpoint: {e}")
+
+    def save_checkpoint(self) -> bool:
+        with self._lock:
+            if self._state is None:
+                return False
+            data = {
+                "start": self._state["start"],
+                "until": self._state["until"],
+                "cursor": max(self._state["cursor"], self._state["recorded"]),
+                "hours_done": self._state["hours_done"],
+            }
+
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_file) or ".", exist_ok=True)
+            tmp_file = f"{self.checkpoint_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_file, self.checkpoint_file)
+            self._unsaved = 0
+            self._saved_at = time.monotonic()
+            return True
+        except Exception as e:
+            print(f"Error saving history backfill checkpoint: {e}")
+            return False
+
+    def plan(self, now: Optional[float] = None) -> None:
+        """Fix the range on first run: `days` back up to the hour live history began"""
+        with self._lock:
+            if self._state is not None:
+                return
+            until = (time.time() if now is None else now) // HOUR * HOUR
+            start = until - self.days * 86400
+            self._state = {
+                "start": start,
+                "until": until,
+                # The first day only fills the window, so no point is written
+                "cursor": start - WINDOW_HOURS * HOUR,
+                # Hours before this were already covered by an earlier run
+                "recorded": start - WINDOW_HOURS * HOUR,
+                "hours_done": 0,
+            }
+
+    @property
+    def complete(self) -> bool:
+        with self._lock:
+            return self._state is not None and (
+                self._state["cursor"] >= self._state["until"]
+            )
+
+    def step(self) -> bool:
+        """Backfill the next hour; False once the whole range is done"""
+        with self._lock:
+            if self._state is None:
+                return False
+            cursor, until = self._state["cursor"], self._state["until"]
+        if cursor >= until:
+            return False
+
+        hour = HourAggregate(cursor)
+        for name, client in self.clients().items():
+            after, before = _iso(cursor), _iso(cursor + HOUR)
+            if self.pool is not None and self.pool.enabled:
+                bodies = client.iter_page_bodies(after, before, BACKGROUND)
+                for partial in self.pool.map(hour_partial, bodies, name, cursor):
+                    hour.merge(partial)
+            else:
+                for page in client.iter_event_chunks(after, before, BACKGROUND):
+                    hour.add(name, page)
+
+        with self._lock:
+            self._window = [
+                h for h in self._window if h.start > cursor - WINDOW_HOURS * HOUR
+            ]
+            self._window.append(hour)
+            window = list(self._window)
+            self._state["cursor"] = cursor + HOUR
+            new = cursor >= self._state["recorded"]
+            if new:
+                self._state["recorded"] = cursor + HOUR
+                self._state["hours_done"] += 1
+            record = new and cursor >= self._state["start"]
+            done = cursor + HOUR >= until
+
+        if record:
+            # Sampled at the end of the hour, as a refresh then would have been
+            self.history.record(window_stats(window), cursor + HOUR)
+        self._unsaved += 1
+        if (
+            done
+            or self._unsaved >= self.checkpoint_hours
+            or time.monotonic() - self._saved_at >= self.checkpoint_seconds
+        ):
+            self.save_checkpoint()
+        return True
+
+    def run(self) -> None:
+        """Work through the range, pausing so the live refresh keeps priority"""
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                if not self.step():
+                    break
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"History backfill paused: {e}")
+                self._stop.wait(self.retry_delay)
+                continue
+            worked = time.perf_counter() - started
+            pause = worked * (1 - self.duty_cycle) / self.duty_cycle
+            self._stop.wait(max(self.min_pause, pause))
+        if self._unsaved:
+            self.save_checkpoint()
+        self.history.save()
+
+    def start(self) -> bool:
+        """Start the worker thread unless it is running or already finished"""
+        if self.days <= 0:
+            return False
+        self.plan()
+        if self.complete or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="history-backfill", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            state = dict(self._state) if self._state is not None else None
+        if state is None:
+            return {"state": "idle"}
+
+        # Rebuilding the window after a restart doesn't move progress back
+        cursor = max(state["cursor"], state["recorded"])
+        total = state["until"] - state["start"] + WINDOW_HOURS * HOUR
+        done = cursor - state["start"] + WINDOW_HOURS * HOUR
+        running = self._thread is not None and self._thread.is_alive()
+        if done >= total:
+            status = "complete"
+        elif running:
+            status = "running"
+        else:
+            status = "paused"
+        return {
+            "state": status,
+            "start": _iso(state["start"]),
+            "until": _iso(state["until"]),
+            "cursor": _iso(cursor),
+            "progress": round(min(1.0, done / total), 3) if total else 1.0,
+            "last_error": self.last_error,
+        }
@@ -1,8 +1,70 @@
+import functools
 import os
+import re
 import subprocess
-from datetime import datetime
-from typing import Dict, Any, List
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Optional, TypeVar, cast
 from config_manager import ConfigManager
+from telemetry import GIT_COMMAND_DURATION, OTA_FETCH_BYTES
+
+if TYPE_CHECKING:
+    from release_manager import ReleaseManager
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Branch names passed to git; anything else (e.g. a leading '-') is refused
+BRANCH_NAME = re.compile(r"^[A-Za-z0-9._][A-Za-z0-9._/-]*$")
+# Seconds the remote branch list is reused before asking the remote again
+BRANCH_LIST_MAX_AGE = 300
+RECENT_FETCHES = 10
+BACKUP_PREFIX = "backup-"
+BACKUP_TIME_FORMAT = "%Y%m%d-%H%M%S"
+# Tag, commit, commit date and subject of each backup, NUL separated
+BACKUP_REF_FORMAT = (
+    "%(refname:short)%00%(objectname)%00%(committerdate:iso-strict)%00%(subject)"
+)
+
+
+def backup_created_at(tag: str) -> Optional[str]:
+    """When a backup was taken, from its backup-YYYYmmdd-HHMMSS name"""
+    try:
+        created = datetime.strptime(tag[len(BACKUP_PREFIX) :], BACKUP_TIME_FORMAT)
+    except ValueError:
+        return None
+    return created.isoformat()
+
+
+def tracked_operation(func: F) -> F:
+    """Mark the wrapped OTA method as a running job while it executes"""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        thread_id = threading.get_ident()
+        with self._operations_lock:
+            # Nested calls (pull_updates -> create_backup) report the outer job
+            outer = thread_id not in self._operations
+            if outer:
+                self._operations[thread_id] = {
+                    "name": func.__name__,
+                    "started_at": datetime.now().isoformat(),
+                }
+                self._waiting += 1
+        if outer:
+            # One job at a time; repository maintenance stops for waiting jobs
+            self._exclusive.acquire()
+            with self._operations_lock:
+                self._waiting -= 1
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            if outer:
+                self._exclusive.release()
+                with self._operations_lock:
+                    self._operations.pop(thread_id, None)
+
+    return cast(F, wrapper)
 
 
 class OTAManager:
@@ -10,16 +72,67 @@ class OTAManager:
         self.config_manager = config_manager
         self.repo_path = os.path.dirname(os.path.abspath(__file__ + "/../"))
         self.git_command = "git"
+        self._operations: Dict[int, Dict[str, Any]] = {}
+        self._operations_lock = threading.Lock()
+        # Held by the running job or repository maintenance
+        self._exclusive = threading.Lock()
+        self._waiting = 0
+        # Per branch: monotonic time of the last successful fetch
+        self._fetched_at: Dict[str, float] = {}
+        self._fetches: List[Dict[str, Any]] = []
+        self._remote_branches: Optional[List[str]] = None
+        self._remote_branches_at = 0.0
+        self._fetch_lock = threading.Lock()
+        # Backup tags with commit metadata, newest first; loaded on first use
+        self._backups: Optional[List[Dict[str, Any]]] = None
+        self._backups_lock = threading.Lock()
+        # Set by the app; used when the ota apply_mode is "worktree"
+        self.release_manager: Optional["ReleaseManager"] = None
+
+    def _releases(self) -> Optional["ReleaseManager"]:
+        """The release manager, if updates are applied in side-by-side worktrees"""
+        config = self.config_manager.get_section("ota")
+        if config.get("apply_mode", "in_place") == "worktree":
+            return self.release_manager
+        return None
+
+    def get_active_operation(self) -> Optional[Dict[str, Any]]:
+        """Get the OTA job currently running, if any"""
+        with self._operations_lock:
+            operations = sorted(
+                self._operations.values(), key=lambda op: op["started_at"]
+            )
+        return dict(operations[0]) if operations else None
 
-    def get_current_branch(self) -> str:
-        """Get the current git branch"""
+    def try_exclusive(self) -> bool:
+        """Take the job lock if no OTA job holds it (release with end_exclusive)"""
+        return self._exclusive.acquire(blocking=False)
+
+    def end_exclusive(self) -> None:
+        self._exclusive.release()
+
+    def job_waiting(self) -> bool:
+        """Whether an OTA job is waiting for the job lock"""
+        with self._operations_lock:
+            return self._waiting > 0
+
+    def _run_git(self, args: List[str]) -> "subprocess.CompletedProcess[str]":
+        """Run a git command in the repository and record its duration"""
+        started = time.monotonic()
         try:
-            result = subprocess.run(
-                [self.git_command, "branch", "--show-current"],
+            return subprocess.run(
+                [self.git_command] + args,
                 cwd=self.repo_path,
                 capture_output=True,
                 text=True,
             )
+        finally:
+            GIT_COMMAND_DURATION.observe(time.monotonic() - started, command=args[0])
+
+    def get_current_branch(self) -> str:
+        """Get the current git branch"""
+        try:
+            result = self._run_git(["branch", "--show-current"])
             return result.stdout.strip() if result.returncode == 0 else "unknown"
         except Exception:
             return "unknown"
@@ -27,32 +140,99 @@ class OTAManager:
     def get_current_commit(self) -> str:
         """Get the current git commit hash"""
         try:
-            result = subprocess.run(
-                [self.git_command, "rev-parse", "HEAD"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            result = self._run_git(["rev-parse", "HEAD"])
             return result.stdout.strip()[:8] if result.returncode == 0 else "unknown"
         except Exception:
             return "unknown"
 
+    def _object_store_bytes(self) -> Optional[int]:
+        """Size of loose and packed objects, from git count-objects"""
+        result = self._run_git(["count-objects", "-v"])
+        if result.returncode != 0:
+            return None
+        sizes = dict(
+            line.split(": ", 1) for line in result.stdout.splitlines() if ": " in line
+        )
+        try:
+            return (int(sizes.get("size", 0)) + int(sizes.get("size-pack", 0))) * 1024
+        except ValueError:
+            return None
+
+    def fetch_branch(self, branch: str, force: bool = False) -> Dict[str, Any]:
+        """Fetch only the given branch, unless it was fetched moments ago"""
+        if not BRANCH_NAME.match(branch):
+            return {"success": False, "error": f"Invalid branch name: {branch}"}
+
+        config = self.config_manager.get_section("ota")
+        max_age = float(config.get("fetch_max_age", 60))
+        with self._fetch_lock:
+            fetched_at = self._fetched_at.get(branch)
+            if (
+                not force
+                and fetched_at is not None
+                and time.monotonic() - fetched_at < max_age
+            ):
+                return {"success": True, "skipped": True, "branch": branch}
+
+            args = ["fetch", "--no-tags"]
+            if int(config.get("fetch_depth") or 0) > 0:
+                args.append(f"--depth={int(config['fetch_depth'])}")
+            if config.get("fetch_filter"):
+                args.append(f"--filter={config['fetch_filter']}")
+            args += ["origin", f"+refs/heads/{branch}:refs/remotes/origin/{branch}"]
+
+            size_before = self._object_store_bytes()
+            started = time.monotonic()
+            result = self._run_git(args)
+            seconds = time.monotonic() - started
+            size_after = self._object_store_bytes()
+
+            # Growth of the object store; git gc could in theory shrink it
+            received = None
+            if size_before is not None and size_after is not None:
+                received = max(0, size_after - size_before)
+                OTA_FETCH_BYTES.inc(received)
+            record = {
+                "branch": branch,
+                "at": datetime.now().isoformat(),
+                "seconds": round(seconds, 3),
+                "bytes": received,
+                "success": result.returncode == 0,
+            }
+            self._fetches = ([record] + self._fetches)[:RECENT_FETCHES]
+            if result.returncode == 0:
+                self._fetched_at[branch] = time.monotonic()
+
+        if result.returncode != 0:
+            return dict(record, error=f"Failed to fetch updates: {result.stderr}")
+        return dict(record, skipped=False)
+
+    def get_recent_fetches(self) -> List[Dict[str, Any]]:
+        with self._fetch_lock:
+            return [dict(record) for record in self._fetches]
+
     def get_remote_branches(self) -> List[str]:
         """Get list of remote branches"""
+        if (
+            self._remote_branches is not None
+            and time.monotonic() - self._remote_branches_at < BRANCH_LIST_MAX_AGE
+        ):
+            return list(self._remote_branches)
         try:
-            # Fetch remote branches
-            subprocess.run(
-                [self.git_command, "fetch", "--all"],
-                cwd=self.repo_path,
-                capture_output=True,
-            )
-
-            result = subprocess.run(
-                [self.git_command, "branch", "-r"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            # Only the ref advertisement crosses the network, no objects
+            result = self._run_git(["ls-remote", "--heads", "origin"])
+            branches = [
+                line.split("refs/heads/", 1)[1]
+                for line in result.stdout.splitlines()
+                if "refs/heads/" in line
+            ]
+            if result.returncode == 0 and branches:
+                self._remote_branches = sorted(set(branches))
+                self._remote_branches_at = time.monotonic()
+                return list(self._remote_branches)
+
+            # Offline: fall back to the branches fetched so far
+            result = self._run_git(["branch", "-r"])
 
             if result.returncode == 0:
                 branches = []
@@ -70,6 +250,7 @@ class OTAManager:
     def get_status(self) -> Dict[str, Any]:
         """Get OTA status information"""
         config = self.config_manager.get_section("ota")
+        releases = self._releases()
 
         return {
             "enabled": config.get("enabled", True),
@@ -82,8 +263,13 @@ class OTAManager:
             "last_update": config.get("last_update"),
             "last_check": config.get("last_check"),
             "repo_path": self.repo_path,
+            "active_operation": self.get_active_operation(),
+            "recent_fetches": self.get_recent_fetches(),
+            "apply_mode": config.get("apply_mode", "in_place"),
+            "releases": releases.get_status() if releases else None,
         }
 
+    @tracked_operation
     def check_for_updates(self) -> Dict[str, Any]:
         """Check if updates are available"""
         try:
@@ -92,34 +278,19 @@ class OTAManager:
                 "ota", {"last_check": datetime.now().isoformat()}
             )
 
+            config = self.config_manager.get_section("ota")
+            target_branch = config.get("branch", "main")
+
             # Fetch latest changes
-            result = subprocess.run(
-                [self.git_command, "fetch", "origin"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            fetch = self.fetch_branch(target_branch)
 
-            if result.returncode != 0:
-                return {
-                    "updates_available": False,
-                    "error": f"Failed to fetch updates: {result.stderr}",
-                }
+            if not fetch["success"]:
+                return {"updates_available": False, "error": fetch["error"]}
 
             # Check if remote branch is ahead
-            config = self.config_manager.get_section("ota")
-            target_branch = config.get("branch", "main")
 
-            result = subprocess.run(
-                [
-                    self.git_command,
-                    "rev-list",
-                    "--count",
-                    f"HEAD..origin/{target_branch}",
-                ],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
+            result = self._run_git(
+                ["rev-list", "--count", f"HEAD..origin/{target_branch}"]
             )
 
             if result.returncode == 0:
@@ -141,23 +312,20 @@ class OTAManager:
                 "error": f"Exception checking for updates: {str(e)}",
             }
 
+    @tracked_operation
     def switch_branch(self, branch: str) -> Dict[str, Any]:
         """Switch to a different branch"""
+        releases = self._releases()
+        if releases is not None:
+            return self._apply_release(releases, branch)
         try:
             # Fetch latest changes
-            subprocess.run(
-                [self.git_command, "fetch", "origin"],
-                cwd=self.repo_path,
-                capture_output=True,
-            )
+            fetch = self.fetch_branch(branch)
+            if not fetch["success"]:
+                return {"success": False, "error": fetch["error"]}
 
             # Switch to branch
-            result = subprocess.run(
-                [self.git_command, "checkout", f"origin/{branch}"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            result = self._run_git(["checkout", f"origin/{branch}"])
 
             if result.returncode != 0:
                 return {
@@ -180,18 +348,14 @@ class OTAManager:
         except Exception as e:
             return {"success": False, "error": f"Exception switching branch: {str(e)}"}
 
+    @tracked_operation
     def create_backup(self) -> Dict[str, Any]:
         """Create a backup of the current state"""
         try:
             backup_tag = f"backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
 
             # Create a local tag as backup
-            result = subprocess.run(
-                [self.git_command, "tag", backup_tag],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            result = self._run_git(["tag", backup_tag])
 
             if result.returncode != 0:
                 return {
@@ -199,25 +363,32 @@ class OTAManager:
                     "error": f"Failed to create backup tag: {result.stderr}",
                 }
 
+            created = self._read_backups(f"refs/tags/{backup_tag}")
+            with self._backups_lock:
+                if self._backups is not None and created:
+                    self._backups = sorted(
+                        self._backups + created, key=lambda b: b["tag"], reverse=True
+                    )
+                elif self._backups is not None:
+                    self._backups = None
+
+            prune = self.prune_backups()
             return {
                 "success": True,
                 "backup_tag": backup_tag,
                 "message": f"Created backup tag: {backup_tag}",
+                "pruned": prune.get("deleted", []),
             }
 
         except Exception as e:
             return {"success": False, "error": f"Exception creating backup: {str(e)}"}
 
+    @tracked_operation
     def rollback_to_backup(self, backup_tag: str) -> Dict[str, Any]:
         """Rollback to a specific backup tag"""
         try:
             # Reset to backup tag
-            result = subprocess.run(
-                [self.git_command, "reset", "--hard", backup_tag],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            result = self._run_git(["reset", "--hard", backup_tag])
 
             if result.returncode != 0:
                 return {
@@ -239,29 +410,112 @@ class OTAManager:
         except Exception as e:
             return {"success": False, "error": f"Exception during rollback: {str(e)}"}
 
-    def get_backups(self) -> List[str]:
-        """Get list of available backup tags"""
-        try:
-            result = subprocess.run(
-                [self.git_command, "tag", "-l", "backup-*"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
+    def _read_backups(
+        self, pattern: str = f"refs/tags/{BACKUP_PREFIX}*"
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Backup tags matching pattern with their commit metadata, from one git call"""
+        result = self._run_git(
+            ["for-each-ref", f"--format={BACKUP_REF_FORMAT}", pattern]
+        )
+        if result.returncode != 0:
+            return None
+        backups = []
+        for line in result.stdout.splitlines():
+            tag, commit, committed_at, subject = (line.split("\0") + ["", "", ""])[:4]
+            backups.append(
+                {
+                    "tag": tag,
+                    "created_at": backup_created_at(tag),
+                    "commit": commit[:8],
+                    "committed_at": committed_at,
+                    "subject": subject,
+                }
             )
+        return sorted(backups, key=lambda b: b["tag"], reverse=True)
 
-            if result.returncode == 0:
-                return sorted(result.stdout.strip().split("\n"), reverse=True)
-            return []
-
+    def get_backup_index(self) -> List[Dict[str, Any]]:
+        """Backups newest first with commit metadata, kept in memory after one read"""
+        try:
+            with self._backups_lock:
+                if self._backups is None:
+                    self._backups = self._read_backups()
+                return [dict(backup) for backup in self._backups or []]
         except Exception:
             return []
 
+    def get_backups(self) -> List[str]:
+        """Get list of available backup tags"""
+        return [backup["tag"] for backup in self.get_backup_index()]
+
+    @tracked_operation
+    def prune_backups(self) -> Dict[str, Any]:
+        """Delete backups outside backup_keep / backup_max_age_days and pack refs"""
+        try:
+            config = self.config_manager.get_section("ota")
+            keep = int(config.get("backup_keep", 20))
+            max_age_days = float(config.get("backup_max_age_days", 90))
+            cutoff = None
+            if max_age_days > 0:
+                cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+
+            backups = self.get_backup_index()
+            expired = []
+            # The newest backup is always kept, whatever its age
+            for position, backup in enumerate(backups[1:], start=1):
+                too_many = keep > 0 and position >= keep
+                # Tags without a parseable time never expire by age
+                too_old = bool(cutoff and backup["created_at"]) and (
+                    backup["created_at"] < cutoff
+                )
+                if too_many or too_old:
+                    expired.append(backup["tag"])
+
+            errors = []
+            for start in range(0, len(expired), 200):
+                result = self._run_git(["tag", "-d"] + expired[start : start + 200])
+                if result.returncode != 0:
+                    errors.append(result.stderr.strip())
+            # Each loose ref is a file that every ref lookup may have to stat;
+            # packed they are a single sorted file
+            result = self._run_git(["pack-refs", "--all"])
+            if result.returncode != 0:
+                errors.append(result.stderr.strip())
+
+            with self._backups_lock:
+                if errors or self._backups is None:
+                    self._backups = None
+                else:
+                    deleted = set(expired)
+                    self._backups = [
+                        b for b in self._backups if b["tag"] not in deleted
+                    ]
+
+            if errors:
+                return {
+                    "success": False,
+                    "error": f"Failed to prune backups: {'; '.join(errors)}",
+                }
+            return {
+                "success": True,
+                "deleted": expired,
+                "kept": len(backups) - len(expired),
+            }
+
+        except Exception as e:
+            return {"success": False, "error": f"Exception pruning backups: {str(e)}"}
+
+    @tracked_operation
     def pull_updates(self) -> Dict[str, Any]:
         """Pull latest updates from current branch with backup"""
         try:
             config = self.config_manager.get_section("ota")
             target_branch = config.get("branch", "main")
 
+            releases = self._releases()
+            if releases is not None:
+                # The previous release stays on disk as the rollback point
+                return self._apply_release(releases, target_branch)
+
             # Create backup before update
             backup_result = self.create_backup()
             if not backup_result.get("success"):
@@ -272,19 +526,13 @@ class OTAManager:
 
             backup_tag = backup_result["backup_tag"]
 
-            # Fetch and pull
-            subprocess.run(
-                [self.git_command, "fetch", "origin"],
-                cwd=self.repo_path,
-                capture_output=True,
-            )
+            # Usually a no-op: check_for_updates fetched this branch just now
+            fetch = self.fetch_branch(target_branch)
+            if not fetch["success"]:
+                return {"success": False, "error": fetch["error"]}
 
-            result = subprocess.run(
-                [self.git_command, "pull", "origin", target_branch],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            # Fast-forward to what was fetched, without a second fetch
+            result = self._run_git(["merge", "--ff-only", f"origin/{target_branch}"])
 
             if result.returncode != 0:
                 # Rollback on failure
@@ -311,23 +559,21 @@ class OTAManager:
         except Exception as e:
             return {"success": False, "error": f"Exception pulling updates: {str(e)}"}
 
+    @tracked_operation
     def reset_to_remote(self, branch: str) -> Dict[str, Any]:
         """Reset local branch to match remote (hard reset)"""
+        releases = self._releases()
+        if releases is not None:
+            # A fresh worktree of origin/<branch> is already a hard reset
+            return self._apply_release(releases, branch)
         try:
             # Fetch latest changes
-            subprocess.run(
-                [self.git_command, "fetch", "origin"],
-                cwd=self.repo_path,
-                capture_output=True,
-            )
+            fetch = self.fetch_branch(branch)
+            if not fetch["success"]:
+                return {"success": False, "error": fetch["error"]}
 
             # Hard reset to remote branch
-            result = subprocess.run(
-                [self.git_command, "reset", "--hard", f"origin/{branch}"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-            )
+            result = self._run_git(["reset", "--hard", f"origin/{branch}"])
 
             if result.returncode != 0:
                 return {
@@ -352,6 +598,30 @@ class OTAManager:
                 "error": f"Exception resetting to remote: {str(e)}",
             }
 
+    def _apply_release(self, releases: "ReleaseManager", branch: str) -> Dict[str, Any]:
+        """Build origin/<branch> beside the running release, then switch to it"""
+        try:
+            result = releases.apply(branch)
+            if result["success"]:
+                self.config_manager.update_section(
+                    "ota", {"branch": branch, "last_update": datetime.now().isoformat()}
+                )
+                result["current_commit"] = result.get("commit", "unknown")
+            return result
+        except Exception as e:
+            return {"success": False, "error": f"Exception applying release: {str(e)}"}
+
+    @tracked_operation
+    def rollback_release(self) -> Dict[str, Any]:
+        """Switch back to the release that served before the last update"""
+        if self.release_manager is None:
+            return {"success": False, "error": "Worktree releases are not available"}
+        try:
+            return self.release_manager.rollback()
+        except Exception as e:
+            return {"success": False, "error": f"Exception during rollback: {str(e)}"}
+
+    @tracked_operation
     def perform_boot_update(self) -> Dict[str, Any]:
         """Perform OTA update on boot if enabled"""
         config = self.config_manager.get_section("ota")
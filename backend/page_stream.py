@@ -0,0 +1,139 @@
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from event_batch import slim_event
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NEXT_KEY = re.compile(rb'"next"\s*:\s*')
+RESULTS_KEY = re.compile(rb'"results"\s*:')
+
+# Parser states
+EXPECT_OBJECT = "object"
+EXPECT_KEY = "key"
+EXPECT_COLON = "colon"
+EXPECT_VALUE = "value"
+AFTER_VALUE = "after_value"
+IN_RESULTS = "results"
+AFTER_RESULT = "after_result"
+DONE = "done"
+
+
+class EventPageParser:
+    """Incremental parser for a PostHog events page fed in byte chunks"""
+
+    def __init__(self, project: Callable[[Dict[str, Any]], Any] = slim_event):
+        # Each result is reduced by project() as soon as its bytes are complete,
+        # so memory is bounded by the chunk and event size, not the page
+        self.project = project
+        # Other top-level keys, e.g. "next"
+        self.fields: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = EXPECT_OBJECT
+        self._key = ""
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Consume a chunk; returns the events completed by it"""
+        self._buffer += self._utf8.decode(chunk)
+        return self._parse(final=False)
+
+    def finish(self) -> List[Any]:
+        """Consume what is left; raises ValueError if the page is incomplete"""
+        self._buffer += self._utf8.decode(b"", final=True)
+        events = self._parse(final=True)
+        if self._state != DONE:
+            raise ValueError("Truncated PostHog events page")
+        return events
+
+    def _parse(self, final: bool) -> List[Any]:
+        events: List[Any] = []
+        buffer, pos = self._buffer, 0
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()  # type: ignore[union-attr]
+            if pos >= len(buffer) or self._state == DONE:
+                break
+            char = buffer[pos]
+
+            if self._state == EXPECT_OBJECT:
+                if char != "{":
+                    raise ValueError("PostHog events page is not a JSON object")
+                self._state, pos = EXPECT_KEY, pos + 1
+            elif self._state == AFTER_VALUE:
+                if char not in ",}":
+                    raise ValueError(f"Unexpected {char!r} in PostHog events page")
+                self._state = EXPECT_KEY if char == "," else DONE
+                pos += 1
+            elif self._state == EXPECT_KEY and char == "}":
+                self._state, pos = DONE, pos + 1
+            elif self._state == EXPECT_COLON:
+                if char != ":":
+                    raise ValueError(f"Unexpected {char!r} in PostHog events page")
+                self._state, pos = EXPECT_VALUE, pos + 1
+            elif self._state == EXPECT_VALUE and self._key == "results":
+                if char != "[":
+                    raise ValueError("PostHog events page has no results list")
+                self._state, pos = IN_RESULTS, pos + 1
+            elif self._state == AFTER_RESULT:
+                if char not in ",]":
+                    raise ValueError(f"Unexpected {char!r} in PostHog results")
+                self._state = IN_RESULTS if char == "," else AFTER_VALUE
+                pos += 1
+            elif self._state == IN_RESULTS and char == "]":
+                self._state, pos = AFTER_VALUE, pos + 1
+            else:
+                value, end = self._decode(buffer, pos, final)
+                if end < 0:
+                    break
+                if self._state == EXPECT_KEY:
+                    self._key = value
+                    self._state = EXPECT_COLON
+                elif self._state == IN_RESULTS:
+                    events.append(self.project(value))
+                    self._state = AFTER_RESULT
+                else:
+                    self.fields[self._key] = value
+                    self._state = AFTER_VALUE
+                pos = end
+
+        self._buffer = buffer[pos:]
+        return events
+
+    def _decode(self, buffer: str, pos: int, final: bool) -> Tuple[Any, int]:
+        """Decode one value at pos; end is -1 if it may continue in a later chunk"""
+        try:
+            value, end = self._decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None, -1
+        # A number running to the end of the buffer may have more digits coming
+        if end >= len(buffer) and not final:
+            return None, -1
+        return value, end
+
+
+def page_link(body: bytes) -> Optional[str]:
+    """The top-level "next" link of an events page, found without parsing it"""
+    # Before "results" only top-level keys can match; after it, the last match
+    # is top-level, since nothing but top-level keys follows the results list
+    results = RESULTS_KEY.search(body)
+    split = results.start() if results else len(body)
+    match = NEXT_KEY.search(body, 0, split)
+    if match is None:
+        matches = list(NEXT_KEY.finditer(body, split))
+        if not matches:
+            return None
+        match = matches[-1]
+    # Links are short; a bounded slice avoids decoding the rest of the page
+    value = body[match.end() : match.end() + 16384].decode("utf-8", "ignore")
+    link, _ = json.JSONDecoder().raw_decode(value)
+    return link if isinstance(link, str) else None
+
+
+def parse_page(body: bytes) -> List[Dict[str, Any]]:
+    """The events of a whole page body, reduced to the fields the metrics read"""
+    parser = EventPageParser()
+    return parser.feed(body) + parser.finish()
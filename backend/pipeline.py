@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+from typing import Generator, Iterable, TypeVar, cast
+
+from telemetry import FETCH_PIPELINE_WAIT
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(source: Iterable[T], depth: int = 4) -> Generator[T, None, None]:
+    """Iterate source in a background thread, keeping up to depth items ready"""
+    # The producer blocks once depth items are waiting, so a slow consumer
+    # holds back the fetch instead of the whole window piling up in memory
+    if depth <= 0:
+        yield from source
+        return
+
+    items: "queue.Queue[object]" = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item: object) -> bool:
+        started = time.perf_counter()
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        # Time the producer spent waiting on the consumer: CPU bound
+        FETCH_PIPELINE_WAIT.inc(time.perf_counter() - started, side="cpu")
+        return not stopped.is_set()
+
+    def produce() -> None:
+        try:
+            for item in source:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failed(e))
+            return
+        finally:
+            # Release what the source holds (e.g. an open response) right away
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        put(_END)
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            started = time.perf_counter()
+            item = items.get()
+            # Time the consumer spent waiting on the producer: network bound
+            FETCH_PIPELINE_WAIT.inc(time.perf_counter() - started, side="network")
+            if item is _END:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield cast(T, item)
+    finally:
+        # Unblock and retire the producer if the consumer stops early
+        stopped.set()
@@ -0,0 +1,229 @@
+import queue
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from health import HealthMonitor
+from page_stream import EventPageParser, page_link
+from pipeline import prefetch
+from rate_budget import BACKGROUND, DISPLAY, RateBudgeter
+from telemetry import POSTHOG_REQUEST_DURATION, POSTHOG_RESPONSES
+
+if TYPE_CHECKING:
+    # requests takes a noticeable share of startup; it is imported on first use
+    import requests
+
+# Bytes read from an events response at a time while it is parsed
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PostHogError(Exception):
+    def __init__(self, status_code: int, message: Optional[str] = None):
+        super().__init__(message or f"PostHog API error: {status_code}")
+        self.status_code = status_code
+
+
+class PostHogClient:
+    def __init__(
+        self,
+        host: str,
+        api_key: str,
+        project_id: str,
+        timeout: float = 10,
+        page_size: int = 1000,
+        max_pages: Optional[int] = None,
+        health_monitor: Optional[HealthMonitor] = None,
+        session: Optional["requests.Session"] = None,
+        budget: Optional[RateBudgeter] = None,
+        prefetch_depth: int = 0,
+    ):
+        self.host = host.rstrip("/")
+        self.api_key = api_key
+        self.project_id = project_id
+        self.timeout = timeout
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.health_monitor = health_monitor
+        self.session = session or self.create_session()
+        self.budget = budget
+        # Body chunks read ahead of parsing (0 reads and parses in turn)
+        self.prefetch_depth = prefetch_depth
+
+    @staticmethod
+    def create_session(pool_maxsize: int = 8) -> "requests.Session":
+        """Create a keep-alive session so pages reuse one TLS connection"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def get(
+        self, endpoint: str, url: str, priority: str = DISPLAY, **kwargs: Any
+    ) -> "requests.Response":
+        """Call the PostHog API within the rate budget, recording latency and outcome"""
+        if self.budget is not None:
+            # Display fetches give up after one timeout and serve the snapshot;
+            # background work just waits its turn
+            wait = None if priority == BACKGROUND else self.timeout
+            if not self.budget.acquire(self.host, priority, wait):
+                raise PostHogError(429, "PostHog rate budget exhausted")
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(
+                url, headers=self.headers, timeout=self.timeout, **kwargs
+            )
+        except Exception as e:
+            latency = time.perf_counter() - started
+            POSTHOG_REQUEST_DURATION.observe(latency, endpoint=endpoint)
+            POSTHOG_RESPONSES.inc(endpoint=endpoint, status="error")
+            if self.health_monitor is not None:
+                self.health_monitor.record_upstream(latency, False, str(e))
+            raise
+
+        latency = time.perf_counter() - started
+        POSTHOG_REQUEST_DURATION.observe(latency, endpoint=endpoint)
+        POSTHOG_RESPONSES.inc(endpoint=endpoint, status=str(response.status_code))
+        if self.budget is not None:
+            self.budget.record_response(
+                self.host, response.status_code, response.headers
+            )
+        if self.health_monitor is not None:
+            self.health_monitor.record_upstream(
+                latency,
+                response.status_code == 200,
+                f"PostHog API error: {response.status_code}",
+            )
+        return response
+
+    @property
+    def events_url(self) -> str:
+        return f"{self.host}/api/projects/{self.project_id}/events"
+
+    def first_page_params(self, after: str, before: Optional[str]) -> Dict[str, str]:
+        params = {"after": after, "limit": str(self.page_size)}
+        if before:
+            params["before"] = before
+        return params
+
+    def _read_pages(
+        self,
+        after: str,
+        before: Optional[str],
+        priority: str,
+        links: "queue.Queue[Optional[str]]",
+        max_pages: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """Raw body chunks of each page, then b"" once the page has been read"""
+        url: Optional[str] = self.events_url
+        params: Optional[Dict[str, str]] = self.first_page_params(after, before)
+        if max_pages is None:
+            max_pages = self.max_pages
+
+        pages = 0
+        while url:
+            response = self.get("events", url, priority, params=params, stream=True)
+            try:
+                if response.status_code != 200:
+                    raise PostHogError(response.status_code)
+                yield from response.iter_content(STREAM_CHUNK_SIZE)
+            finally:
+                response.close()
+            yield b""
+
+            pages += 1
+            if max_pages is not None and pages >= max_pages:
+                break
+
+            # The parser hands back 'next' (which already carries the query
+            # string) as soon as it has been read, usually from the first chunk
+            url = links.get()
+            params = None
+
+    def stream_events(
+        self,
+        after: str,
+        before: Optional[str] = None,
+        priority: str = DISPLAY,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[Tuple[List[Dict[str, Any]], bool]]:
+        """Yield (events, end of page) as each response body is parsed"""
+        links: "queue.Queue[Optional[str]]" = queue.Queue()
+        # With prefetching, the network reads run in a background thread while
+        # this one parses, so page N+1 downloads as page N is being processed
+        chunks = prefetch(
+            self._read_pages(after, before, priority, links, max_pages),
+            self.prefetch_depth,
+        )
+        parser, linked = EventPageParser(), False
+        try:
+            for chunk in chunks:
+                if chunk:
+                    events = parser.feed(chunk)
+                    if events:
+                        yield events, False
+                else:
+                    events = parser.finish()
+                    if not linked:
+                        links.put(parser.fields.get("next"))
+                    parser, linked = EventPageParser(), False
+                    yield events, True
+                    continue
+                if not linked and "next" in parser.fields:
+                    links.put(parser.fields["next"])
+                    linked = True
+        finally:
+            # Never leave the reader waiting on a link that will not come
+            links.put(None)
+            chunks.close()
+
+    def iter_page_bodies(
+        self, after: str, before: Optional[str] = None, priority: str = DISPLAY
+    ) -> Iterator[bytes]:
+        """Yield each page's raw body, for parsing elsewhere (e.g. a process pool)"""
+        url: Optional[str] = self.events_url
+        params: Optional[Dict[str, str]] = self.first_page_params(after, before)
+
+        pages = 0
+        while url:
+            response = self.get("events", url, priority, params=params)
+            if response.status_code != 200:
+                raise PostHogError(response.status_code)
+            body = response.content
+            yield body
+
+            pages += 1
+            if self.max_pages is not None and pages >= self.max_pages:
+                break
+
+            url = page_link(body)
+            params = None
+
+    def iter_event_chunks(
+        self, after: str, before: Optional[str] = None, priority: str = DISPLAY
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield events newest first in the runs completed by each chunk read"""
+        for events, _ in self.stream_events(after, before, priority):
+            if events:
+                yield events
+
+    def iter_event_pages(
+        self, after: str, before: Optional[str] = None, priority: str = DISPLAY
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield pages of events newest first, following the 'next' links"""
+        page: List[Dict[str, Any]] = []
+        for events, end_of_page in self.stream_events(after, before, priority):
+            page.extend(events)
+            if end_of_page:
+                yield page
+                page = []
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_STACK_DEPTH = 64
+
+
+def collapse_stack(frame: Optional[FrameType]) -> str:
+    """Render a frame's call stack root-first as 'module:func;module:func'"""
+    names: List[str] = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfiler:
+    def __init__(
+        self, sample_rate: float = 0.05, top_n: int = 20, interval_ms: float = 5
+    ):
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._active: Dict[int, "Counter[str]"] = {}
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._ids = itertools.count(1)
+        self._wake = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def configure(
+        self, sample_rate: float, top_n: int, interval_ms: float
+    ) -> "RequestProfiler":
+        """Apply profiling settings from the advanced config section"""
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.interval = max(0.001, float(interval_ms) / 1000)
+        top_n = max(1, int(top_n))
+        if top_n != self.top_n:
+            with self._lock:
+                self.top_n = top_n
+                while len(self._slowest) > top_n:
+                    heapq.heappop(self._slowest)
+        return self
+
+    def should_sample(self) -> bool:
+        """Decide whether the current request gets profiled"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> None:
+        """Start sampling the calling thread's stack"""
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._sample_loop, name="request-profiler", daemon=True
+                )
+                self._sampler.start()
+            self._wake.set()
+
+    def stop(self, route: str, method: str, duration: float) -> None:
+        """Stop sampling the calling thread and keep the profile if it is slow"""
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+            if stacks is None:
+                return
+
+            profile_id = next(self._ids)
+            profile = {
+                "id": profile_id,
+                "route": route,
+                "method": method,
+                "duration_ms": round(duration * 1000, 2),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "samples": sum(stacks.values()),
+                "interval_ms": round(self.interval * 1000, 3),
+                "stacks": dict(stacks),
+            }
+            entry = (duration, profile_id, profile)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _sample_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                thread_ids = list(self._active)
+
+            frames = sys._current_frames()
+            samples = [
+                (thread_id, collapse_stack(frames[thread_id]))
+                for thread_id in thread_ids
+                if thread_id in frames
+            ]
+            del frames
+
+            with self._lock:
+                for thread_id, stack in samples:
+                    stacks = self._active.get(thread_id)
+                    if stacks is not None:
+                        stacks[stack] += 1
+            time.sleep(self.interval)
+
+    def get_profiles(self) -> List[Dict[str, Any]]:
+        """Get kept profiles, slowest first, with collapsed stacks"""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+
+        profiles = []
+        for _, _, profile in entries:
+            summary = {k: v for k, v in profile.items() if k != "stacks"}
+            summary["collapsed"] = self.collapsed([profile])
+            profiles.append(summary)
+        return profiles
+
+    def collapsed(self, profiles: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Merge profiles into collapsed-stack text for flame graph tools"""
+        if profiles is None:
+            with self._lock:
+                profiles = [entry[2] for entry in self._slowest]
+
+        merged: "Counter[str]" = Counter()
+        for profile in profiles:
+            merged.update(profile["stacks"])
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(merged.items()))
+
+    def get_profile(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        """Get a kept profile by id"""
+        with self._lock:
+            for _, _, profile in self._slowest:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        """Drop all kept profiles"""
+        with self._lock:
+            self._slowest = []
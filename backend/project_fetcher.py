@@ -0,0 +1,185 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+from event_batch import EventBatch
+from health import HealthMonitor
+from posthog_client import PostHogClient
+from rate_budget import RateBudgeter
+from stats_engine import ProjectTopK, compute_stats
+from telemetry import EVENTS_PER_REFRESH
+
+if TYPE_CHECKING:
+    import requests
+
+ProjectResult = Union[Dict[str, Any], Exception]
+# Called with (project name, events newest first, window start) per fetch
+EventSink = Callable[[str, EventBatch, str], None]
+
+
+def load_projects(
+    posthog_config: Dict[str, Any],
+    default_host: str,
+    default_api_key: Optional[str],
+    default_project_id: Optional[str],
+) -> List[Dict[str, str]]:
+    """Build the project list from config, falling back to the env project(s)"""
+    projects = []
+    for project in posthog_config.get("projects") or []:
+        project_id = str(project.get("project_id") or "")
+        api_key = project.get("api_key") or default_api_key
+        if not project_id or not api_key:
+            continue
+        projects.append(
+            {
+                "name": project.get("name") or project_id,
+                "project_id": project_id,
+                "host": project.get("host") or default_host,
+                "api_key": api_key,
+            }
+        )
+
+    if not projects and default_api_key and default_project_id:
+        # POSTHOG_PROJECT_ID may list several projects sharing one key
+        for project_id in default_project_id.split(","):
+            if project_id.strip():
+                projects.append(
+                    {
+                        "name": project_id.strip(),
+                        "project_id": project_id.strip(),
+                        "host": default_host,
+                        "api_key": default_api_key,
+                    }
+                )
+    return projects
+
+
+def snapshot_name(project_name: str) -> str:
+    """Make a project name safe to use in a snapshot file name"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", project_name)
+
+
+class ProjectFetcher:
+    def __init__(
+        self,
+        max_workers: int = 4,
+        health_monitor: Optional[HealthMonitor] = None,
+        event_sink: Optional[EventSink] = None,
+        budget: Optional[RateBudgeter] = None,
+        prefetch_depth: int = 8,
+        max_pages: Optional[int] = None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.health_monitor = health_monitor
+        self.event_sink = event_sink
+        self.budget = budget
+        # Response chunks read ahead of parsing per project (0 = no overlap)
+        self.prefetch_depth = prefetch_depth
+        # Pages read per display refresh, newest first (None follows them all)
+        self.max_pages = max_pages
+        self._session: Optional["requests.Session"] = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="posthog-fetch"
+        )
+        self.clients: Dict[str, PostHogClient] = {}
+        # Top lists per project, carried between refreshes
+        self.top_k: Dict[str, ProjectTopK] = {}
+        self._settings: Optional[Tuple[Any, ...]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> "requests.Session":
+        """One keep-alive pool shared by every project's client, made on first use"""
+        if self._session is None:
+            self._session = PostHogClient.create_session(pool_maxsize=self.max_workers)
+        return self._session
+
+    def configure(
+        self, projects: List[Dict[str, str]], timeout: float, page_size: int
+    ) -> None:
+        """Rebuild the per-project clients when the project list changes"""
+        settings = (
+            tuple(tuple(sorted(p.items())) for p in projects),
+            timeout,
+            page_size,
+        )
+        with self._lock:
+            if settings == self._settings:
+                return
+            self.clients = {
+                project["name"]: PostHogClient(
+                    project["host"],
+                    project["api_key"],
+                    project["project_id"],
+                    timeout=timeout,
+                    page_size=page_size,
+                    health_monitor=self.health_monitor,
+                    session=self.session,
+                    budget=self.budget,
+                    prefetch_depth=self.prefetch_depth,
+                )
+                for project in projects
+            }
+            self.top_k = {project["name"]: ProjectTopK() for project in projects}
+            self._settings = settings
+
+    @property
+    def project_names(self) -> List[str]:
+        return list(self.clients)
+
+    def fetch_project(
+        self, name: str, client: PostHogClient, after: str
+    ) -> Dict[str, Any]:
+        """Fetch up to max_pages of one project's events and compute its stats"""
+        # Each page is folded into columns and dropped before the next arrives
+        batch = EventBatch()
+        pages = 0
+        for events, end_of_page in client.stream_events(
+            after, max_pages=self.max_pages
+        ):
+            batch.extend(events)
+            pages += end_of_page
+
+        EVENTS_PER_REFRESH.observe(len(batch))
+        truncated = bool(
+            self.max_pages is not None and pages >= self.max_pages and len(batch)
+        )
+        if truncated:
+            # Stopped at the cap: the events only reach back to the oldest one
+            # fetched, and the rollups backfill the rest of the window
+            after = datetime.fromtimestamp(
+                batch.timestamps[-1], timezone.utc
+            ).isoformat()
+        if self.event_sink is not None:
+            try:
+                self.event_sink(name, batch, after)
+            except Exception as e:
+                print(f"Error passing events on for {name}: {e}")
+        top_k = self.top_k.get(name)
+        if top_k is None:
+            top_k = self.top_k.setdefault(name, ProjectTopK())
+        stats = compute_stats(batch, top_k=top_k)
+        # The 24h counts only cover the fetched events, so say from when
+        stats["truncated"] = truncated
+        if truncated:
+            stats["covered_from"] = after
+        return stats
+
+    def fetch_all(self, after: str) -> Dict[str, ProjectResult]:
+        """Fetch all projects concurrently; failures are returned, not raised"""
+        with self._lock:
+            clients = dict(self.clients)
+
+        futures = {
+            name: self.executor.submit(self.fetch_project, name, client, after)
+            for name, client in clients.items()
+        }
+        results: Dict[str, ProjectResult] = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+        return results
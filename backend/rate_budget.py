@@ -0,0 +1,199 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from telemetry import (
+    UPSTREAM_BUDGET_REQUESTS,
+    UPSTREAM_BUDGET_SLOWDOWN,
+    UPSTREAM_BUDGET_TOKENS,
+    UPSTREAM_THROTTLED,
+)
+
+DISPLAY = "display"
+BACKGROUND = "background"
+
+# Seconds to hold off after a 429 that carries no Retry-After
+DEFAULT_BACKOFF = 30.0
+MAX_SLOWDOWN = 8.0
+# Remaining/limit ratio below which quota headers start slowing us down
+QUOTA_PRESSURE = 0.2
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _header_number(headers: Mapping[str, str], *names: str) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class HostBudget:
+    __slots__ = ("tokens", "updated", "slowdown", "blocked_until", "display_waiting")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        # Divides the refill rate; raised by 429s and quota pressure
+        self.slowdown = 1.0
+        self.blocked_until = 0.0
+        self.display_waiting = 0
+
+
+class RateBudgeter:
+    """Token bucket per upstream host, shared by every PostHog client"""
+
+    def __init__(
+        self,
+        rate_per_minute: float = 240,
+        burst: float = 60,
+        background_reserve: float = 0.25,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, burst)
+        # Share of the bucket background work must leave for the display
+        self.background_reserve = background_reserve
+        self.clock = clock
+        self._hosts: Dict[str, HostBudget] = {}
+        self._cond = threading.Condition()
+
+    def _host(self, host: str, now: float) -> HostBudget:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostBudget(self.burst, now)
+        return state
+
+    def _refill(self, state: HostBudget, now: float) -> None:
+        elapsed = max(0.0, now - state.updated)
+        state.tokens = min(
+            self.burst, state.tokens + elapsed * self.rate / state.slowdown
+        )
+        state.updated = now
+
+    def _try_take(self, state: HostBudget, priority: str, now: float) -> float:
+        """Take a token and return 0, or return seconds until one may be free"""
+        if now < state.blocked_until:
+            return state.blocked_until - now
+        self._refill(state, now)
+
+        floor = 0.0
+        if priority != DISPLAY:
+            if state.display_waiting:
+                return 0.05
+            floor = self.burst * self.background_reserve
+        if state.tokens - 1 >= floor:
+            state.tokens -= 1
+            return 0.0
+        return (floor + 1 - state.tokens) * state.slowdown / self.rate
+
+    def acquire(
+        self, host: str, priority: str = DISPLAY, timeout: Optional[float] = None
+    ) -> bool:
+        """Wait for a token; False if none frees up within timeout"""
+        started = self.clock()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            state = self._host(host, started)
+            if priority == DISPLAY:
+                state.display_waiting += 1
+            result = "granted"
+            try:
+                while True:
+                    now = self.clock()
+                    wait = self._try_take(state, priority, now)
+                    if wait == 0:
+                        break
+                    if deadline is not None and now + wait > deadline:
+                        result = "rejected"
+                        break
+                    result = "delayed"
+                    self._cond.wait(wait)
+            finally:
+                if priority == DISPLAY:
+                    state.display_waiting -= 1
+                    self._cond.notify_all()
+            UPSTREAM_BUDGET_TOKENS.set(state.tokens, host=host)
+
+        UPSTREAM_BUDGET_REQUESTS.inc(host=host, priority=priority, result=result)
+        return result != "rejected"
+
+    def record_response(
+        self, host: str, status_code: int, headers: Mapping[str, str]
+    ) -> None:
+        """Adapt the host's budget to a 429 or to the quota headers it sent"""
+        with self._cond:
+            now = self.clock()
+            state = self._host(host, now)
+            self._refill(state, now)
+
+            if status_code == 429:
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                if retry_after is None:
+                    retry_after = DEFAULT_BACKOFF
+                state.blocked_until = max(state.blocked_until, now + retry_after)
+                state.slowdown = min(MAX_SLOWDOWN, state.slowdown * 2)
+                state.tokens = 0
+                UPSTREAM_THROTTLED.inc(host=host)
+            else:
+                remaining = _header_number(
+                    headers, "X-RateLimit-Remaining", "RateLimit-Remaining"
+                )
+                limit = _header_number(headers, "X-RateLimit-Limit", "RateLimit-Limit")
+                if remaining is not None:
+                    state.tokens = min(state.tokens, remaining)
+                if (
+                    remaining is not None
+                    and limit
+                    and remaining < limit * QUOTA_PRESSURE
+                ):
+                    state.slowdown = min(MAX_SLOWDOWN, state.slowdown * 1.5)
+                elif status_code < 400:
+                    # Recover gradually once the upstream stops pushing back
+                    state.slowdown = max(1.0, state.slowdown * 0.9)
+
+            UPSTREAM_BUDGET_TOKENS.set(state.tokens, host=host)
+            UPSTREAM_BUDGET_SLOWDOWN.set(state.slowdown, host=host)
+
+    def slowdown(self) -> float:
+        """Largest slowdown across hosts, used to stretch the refresh interval"""
+        with self._cond:
+            return max((s.slowdown for s in self._hosts.values()), default=1.0)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._cond:
+            now = self.clock()
+            hosts = {}
+            for host, state in self._hosts.items():
+                self._refill(state, now)
+                hosts[host] = {
+                    "tokens": round(state.tokens, 2),
+                    "slowdown": round(state.slowdown, 2),
+                    "blocked_for": round(max(0.0, state.blocked_until - now), 1),
+                }
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "hosts": hosts,
+        }
@@ -0,0 +1,352 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from build_cache import BuildCache, frontend_key, requirements_key
+
+if TYPE_CHECKING:
+    from ota_manager import OTAManager
+
+# Written into a release once it has been built and validated
+READY_MARKER = ".release-ready"
+# Imports the release's app and requests a few routes in-process
+VALIDATE_SCRIPT = """
+import sys
+import app
+client = app.app.test_client()
+for path in sys.argv[1:]:
+    status = client.get(path).status_code
+    if status != 200:
+        sys.exit(f"GET {path} returned {status}")
+"""
+
+# (backend dir, extra environment, interpreter) -> handover result
+HandOver = Callable[[str, Dict[str, str], str], Dict[str, Any]]
+
+
+class ReleaseManager:
+    """Side-by-side release worktrees, switched with a 'current' symlink"""
+
+    def __init__(
+        self,
+        ota_manager: "OTAManager",
+        hand_over: Optional[HandOver] = None,
+        build_timeout: float = 1800,
+        validate_timeout: float = 120,
+        build_cache: Optional[BuildCache] = None,
+    ):
+        self.ota_manager = ota_manager
+        self.config_manager = ota_manager.config_manager
+        # Starts the server from a release's backend/ with the release's
+        # interpreter and retires this one; without it a switch takes effect
+        # on the next service start
+        self.hand_over = hand_over
+        self.build_timeout = build_timeout
+        self.validate_timeout = validate_timeout
+        self.build_cache = build_cache or BuildCache()
+
+    @property
+    def root(self) -> str:
+        """The main checkout, whichever worktree this process runs from"""
+        result = self.ota_manager._run_git(["rev-parse", "--git-common-dir"])
+        common_dir = os.path.join(self.ota_manager.repo_path, result.stdout.strip())
+        return os.path.dirname(os.path.abspath(common_dir))
+
+    @property
+    def releases_dir(self) -> str:
+        configured = self.config_manager.get_section("ota").get("releases_dir")
+        return configured or os.path.join(self.root, "releases")
+
+    def _link_path(self, name: str) -> str:
+        return os.path.join(self.releases_dir, name)
+
+    def _target(self, name: str) -> Optional[str]:
+        link = self._link_path(name)
+        return os.path.realpath(link) if os.path.islink(link) else None
+
+    def _link(self, name: str, target: str) -> None:
+        """Point a symlink at target; rename over the old link is atomic"""
+        link = self._link_path(name)
+        staging = f"{link}.tmp"
+        if os.path.lexists(staging):
+            os.unlink(staging)
+        os.symlink(target, staging)
+        os.replace(staging, link)
+
+    def _run(
+        self, command: List[str], cwd: str, timeout: float, env: Any = None
+    ) -> Optional[str]:
+        """Run a build step; returns an error message if it failed"""
+        try:
+            result = subprocess.run(
+                command,
+                cwd=cwd,
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return f"{' '.join(command)}: {e}"
+        if result.returncode != 0:
+            output = (result.stderr or result.stdout).strip().splitlines()[-5:]
+            return f"{' '.join(command)} failed: " + "\n".join(output)
+        return None
+
+    def _unchanged(self, release: str, path: str) -> bool:
+        """Whether a file is identical in the release and the serving tree"""
+        try:
+            with open(os.path.join(self.ota_manager.repo_path, path), "rb") as f:
+                live = f.read()
+            with open(os.path.join(release, path), "rb") as f:
+                return f.read() == live
+        except OSError:
+            return False
+
+    def python(self, tree: str) -> str:
+        """Interpreter of a release's virtualenv, or this one if it has none"""
+        python = os.path.join(tree, "backend", "venv", "bin", "python3")
+        return python if os.path.exists(python) else sys.executable
+
+    def _venvs_in_use(self) -> List[str]:
+        """Cached virtualenvs of the serving, current and previous trees"""
+        trees = [
+            self.ota_manager.repo_path,
+            self._target("current"),
+            self._target("previous"),
+        ]
+        return [
+            os.path.realpath(os.path.join(tree, "backend", "venv"))
+            for tree in trees
+            if tree
+        ]
+
+    def _build_venv(self, release: str) -> Optional[str]:
+        """Link backend/venv to a virtualenv built for the release's requirements"""
+        backend = os.path.join(release, "backend")
+        if not os.path.exists(os.path.join(backend, "requirements.txt")):
+            return None
+        # The serving process's environment is never installed into; a
+        # release gets the cached one for its requirements, as run.py does
+        key = requirements_key(os.path.join(backend, "requirements.txt"))
+        cached = self.build_cache.path("venvs", key)
+        if not self.build_cache.is_complete(cached):
+            shutil.rmtree(cached, ignore_errors=True)
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            pip = [os.path.join(cached, "bin", "python3"), "-m", "pip", "install"]
+            error = self._run(
+                [sys.executable, "-m", "venv", cached], backend, self.build_timeout
+            ) or self._run(
+                pip + ["-q", "-r", "requirements.txt"], backend, self.build_timeout
+            )
+            if error:
+                shutil.rmtree(cached, ignore_errors=True)
+                return error
+            self.build_cache.mark_complete("venvs", cached, self._venvs_in_use())
+        os.utime(cached)
+        os.symlink(cached, os.path.join(backend, "venv"))
+        return None
+
+    def _build(self, release: str) -> Optional[str]:
+        """Install what the release needs and build its frontend"""
+        error = self._build_venv(release)
+        if error:
+            return error
+
+        frontend = os.path.join(release, "frontend")
+        if not os.path.exists(os.path.join(frontend, "package.json")):
+            return None
+        # Most updates leave frontend/ alone; its last build is reused as is
+        key = frontend_key(release)
+        build = os.path.join(frontend, "build")
+        if key and self.build_cache.restore("frontend", key, build):
+            return None
+
+        live_modules = os.path.join(self.ota_manager.repo_path, "frontend/node_modules")
+        if os.path.isdir(live_modules) and self._unchanged(
+            release, "frontend/package-lock.json"
+        ):
+            os.symlink(
+                os.path.realpath(live_modules), os.path.join(frontend, "node_modules")
+            )
+        else:
+            error = self._run(["npm", "ci"], frontend, self.build_timeout)
+            if error:
+                return error
+        error = self._run(["npm", "run", "build"], frontend, self.build_timeout)
+        if error is None and key:
+            self.build_cache.save("frontend", key, build)
+        return error
+
+    def _validate(self, release: str) -> Optional[str]:
+        """Compile the backend, import the app and request a few routes"""
+        backend = os.path.join(release, "backend")
+        python = self.python(release)
+        error = self._run(
+            [python, "-m", "compileall", "-q", "."],
+            backend,
+            self.validate_timeout,
+        )
+        if error:
+            return error
+
+        paths = ["/api/health"]
+        if os.path.exists(os.path.join(release, "frontend/build/index.html")):
+            paths.append("/")
+        with tempfile.TemporaryDirectory(prefix="release-check-") as scratch:
+            # Throwaway config and data, and no credentials, so nothing is fetched
+            env = dict(
+                os.environ,
+                DASHBOARD_DATA_DIR=scratch,
+                DASHBOARD_CONFIG_FILE=os.path.join(scratch, "device_config.json"),
+                POSTHOG_API_KEY="",
+                POSTHOG_PROJECT_ID="",
+            )
+            return self._run(
+                [python, "-c", VALIDATE_SCRIPT] + paths,
+                backend,
+                self.validate_timeout,
+                env,
+            )
+
+    def _remove(self, release: str) -> None:
+        self.ota_manager._run_git(["worktree", "remove", "--force", release])
+        shutil.rmtree(release, ignore_errors=True)
+        self.ota_manager._run_git(["worktree", "prune"])
+
+    def prepare(self, branch: str) -> Dict[str, Any]:
+        """Check out, build and validate origin/<branch> in its own worktree"""
+        fetch = self.ota_manager.fetch_branch(branch)
+        if not fetch["success"]:
+            return {"success": False, "error": fetch["error"]}
+
+        result = self.ota_manager._run_git(
+            ["rev-parse", "--verify", f"origin/{branch}^{{commit}}"]
+        )
+        if result.returncode != 0:
+            return {"success": False, "error": f"Unknown branch: {branch}"}
+        commit = result.stdout.strip()
+        release = os.path.join(self.releases_dir, commit[:12])
+        if os.path.exists(os.path.join(release, READY_MARKER)):
+            return {"success": True, "release": release, "commit": commit}
+
+        # A leftover from an interrupted attempt
+        if os.path.exists(release):
+            self._remove(release)
+        os.makedirs(self.releases_dir, exist_ok=True)
+        result = self.ota_manager._run_git(
+            ["worktree", "add", "--detach", release, commit]
+        )
+        if result.returncode != 0:
+            return {
+                "success": False,
+                "error": f"Failed to create release worktree: {result.stderr}",
+            }
+
+        error = self._build(release) or self._validate(release)
+        if error:
+            self._remove(release)
+            return {"success": False, "error": error, "commit": commit}
+        with open(os.path.join(release, READY_MARKER), "w") as f:
+            f.write(datetime.now().isoformat())
+        return {"success": True, "release": release, "commit": commit}
+
+    def activate(self, release: str) -> Dict[str, Any]:
+        """Switch 'current' to a prepared release and hand traffic over to it"""
+        serving = os.path.realpath(self.ota_manager.repo_path)
+        release = os.path.realpath(release)
+        if release == serving:
+            return {"success": True, "release": release, "message": "Already serving"}
+
+        current, previous = self._target("current"), self._target("previous")
+        self._link("current", release)
+        self._link("previous", serving)
+        if self.hand_over is None:
+            return {
+                "success": True,
+                "release": release,
+                "message": "Release switched; it is served from the next start",
+            }
+
+        result = self.hand_over(
+            os.path.join(release, "backend"),
+            {
+                "DASHBOARD_DATA_DIR": os.path.abspath(
+                    self.config_manager.get_data_dir()
+                ),
+                "DASHBOARD_CONFIG_FILE": os.path.abspath(
+                    self.config_manager.config_file
+                ),
+            },
+            self.python(release),
+        )
+        if not result["success"]:
+            # This process never stopped serving; put the links back to match
+            self._link("current", current or serving)
+            if previous:
+                self._link("previous", previous)
+            return {"success": False, "error": result["error"], "rollback": True}
+
+        self.prune()
+        return {
+            "success": True,
+            "release": release,
+            "message": f"Handed over to process {result['pid']}",
+            "handover_seconds": result["seconds"],
+        }
+
+    def apply(self, branch: str) -> Dict[str, Any]:
+        """Prepare origin/<branch> side by side, then switch to it"""
+        prepared = self.prepare(branch)
+        if not prepared["success"]:
+            return prepared
+        result = self.activate(prepared["release"])
+        return dict(result, commit=prepared["commit"][:8])
+
+    def rollback(self) -> Dict[str, Any]:
+        """Switch back to the release that served before the last switch"""
+        previous = self._target("previous")
+        if previous is None or not os.path.isdir(previous):
+            return {"success": False, "error": "No previous release to roll back to"}
+        return self.activate(previous)
+
+    def list_releases(self) -> List[str]:
+        """Prepared releases, newest first"""
+        try:
+            names = os.listdir(self.releases_dir)
+        except OSError:
+            return []
+        paths = [os.path.join(self.releases_dir, name) for name in names]
+        # Skips the current/previous links and unfinished releases
+        releases = [
+            path
+            for path in paths
+            if not os.path.islink(path)
+            and os.path.exists(os.path.join(path, READY_MARKER))
+        ]
+        return sorted(releases, key=os.path.getmtime, reverse=True)
+
+    def prune(self) -> List[str]:
+        """Remove old releases beyond keep_releases, never current or previous"""
+        keep = int(self.config_manager.get_section("ota").get("keep_releases", 3))
+        protected = {self._target("current"), self._target("previous")}
+        removed = []
+        for release in self.list_releases()[max(keep, 1) :]:
+            if os.path.realpath(release) not in protected:
+                self._remove(release)
+                removed.append(os.path.basename(release))
+        return removed
+
+    def get_status(self) -> Dict[str, Any]:
+        current, previous = self._target("current"), self._target("previous")
+        return {
+            "releases_dir": self.releases_dir,
+            "serving": os.path.realpath(self.ota_manager.repo_path),
+            "current": current,
+            "previous": previous,
+            "releases": [os.path.basename(r) for r in self.list_releases()],
+        }
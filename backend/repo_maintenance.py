@@ -0,0 +1,258 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from ota_manager import OTAManager
+from telemetry import GIT_COMMAND_DURATION, OTA_MAINTENANCE_RUNS, OTA_OBJECT_STORE
+
+# Read-only commands timed before and after maintenance: a history walk
+# (commit-graph), a ref scan (packed refs) and an object lookup (packs)
+PROBES = {
+    "rev-list": ["rev-list", "--count", "HEAD"],
+    "for-each-ref": ["for-each-ref", "--format=%(objectname)"],
+    "cat-file": ["cat-file", "-p", "HEAD^{tree}"],
+}
+# count-objects -v fields reported, by the name used here
+OBJECT_FIELDS = {
+    "count": "loose_objects",
+    "size": "loose_bytes",
+    "packs": "packs",
+    "size-pack": "pack_bytes",
+    "garbage": "garbage",
+}
+POLL_INTERVAL = 0.2
+# git runs under nice so it leaves the CPU to the dashboard; a prefix rather
+# than a preexec_fn, which isn't safe to run in a forked threaded server
+_nice = shutil.which("nice")
+NICE = [_nice, "-n", "10"] if _nice else []
+
+
+def in_window(window: str, now: datetime) -> bool:
+    """Whether now falls in a local "HH:MM-HH:MM" window (which may span midnight)"""
+    start, end = (
+        datetime.strptime(part.strip(), "%H:%M").time() for part in window.split("-")
+    )
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+class RepoMaintenance:
+    """Budgeted git housekeeping for the OTA checkout at quiet times"""
+
+    def __init__(self, ota_manager: OTAManager, check_interval: float = 600):
+        self.ota_manager = ota_manager
+        self.config_manager = ota_manager.config_manager
+        self.check_interval = check_interval
+        self._report: Optional[Dict[str, Any]] = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _config(self) -> Dict[str, Any]:
+        return self.config_manager.get_section("ota")
+
+    def _git(
+        self, args: List[str], deadline: Optional[float] = None
+    ) -> Tuple[str, float, str]:
+        """Run git at low priority; returns (status, seconds, output)"""
+        started = time.monotonic()
+        process = subprocess.Popen(
+            NICE + [self.ota_manager.git_command] + args,
+            cwd=self.ota_manager.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        status = "ok"
+        try:
+            while True:
+                try:
+                    output, _ = process.communicate(timeout=POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                # git writes new packs and graphs beside the old ones and renames
+                # them into place, so stopping part way loses nothing
+                if self.ota_manager.job_waiting():
+                    status = "aborted"
+                elif deadline is not None and time.monotonic() > deadline:
+                    status = "over_budget"
+                else:
+                    continue
+                process.terminate()
+                output, _ = process.communicate()
+                break
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            seconds = time.monotonic() - started
+            GIT_COMMAND_DURATION.observe(seconds, command=args[0])
+        if status == "ok" and process.returncode != 0:
+            status = "error"
+        return status, round(seconds, 3), output
+
+    def object_stats(self) -> Dict[str, int]:
+        """Loose objects, packs and their sizes, from git count-objects -v"""
+        _, _, output = self._git(["count-objects", "-v"])
+        stats: Dict[str, int] = {}
+        for line in output.splitlines():
+            field, _, value = line.partition(": ")
+            if field in OBJECT_FIELDS and value.strip().isdigit():
+                stats[OBJECT_FIELDS[field]] = int(value)
+        for field in ("loose_bytes", "pack_bytes"):
+            if field in stats:
+                stats[field] *= 1024
+        for kind, amount in stats.items():
+            OTA_OBJECT_STORE.set(amount, kind=kind)
+        return stats
+
+    def measure(self) -> Dict[str, Any]:
+        """Object store stats and how long the probe commands take"""
+        timings = {}
+        for name, args in PROBES.items():
+            status, seconds, _ = self._git(args)
+            timings[name] = seconds if status == "ok" else None
+        return {"objects": self.object_stats(), "timings": timings}
+
+    def _tasks(self, objects: Dict[str, int]) -> List[Tuple[str, List[str]]]:
+        config = self._config()
+        tasks = [("pack-refs", ["pack-refs", "--all"])]
+        # Consolidating every pack rewrites the whole store, so only when
+        # fetches have left many; otherwise just pack the loose objects
+        if objects.get("packs", 0) >= int(config.get("maintenance_max_packs", 10)):
+            tasks.append(("repack", ["repack", "-a", "-d", "-l", "-q"]))
+        elif objects.get("loose_objects", 0) >= int(
+            config.get("maintenance_max_loose", 100)
+        ):
+            tasks.append(("repack", ["repack", "-d", "-l", "-q"]))
+        tasks.append(("commit-graph", ["commit-graph", "write", "--reachable"]))
+        expire = config.get("maintenance_prune_expire", "2.weeks.ago")
+        tasks.append(("prune", ["prune", f"--expire={expire}"]))
+        return tasks
+
+    def not_due(self, now: Optional[datetime] = None) -> Optional[str]:
+        """Why maintenance should not run now, or None if it is due"""
+        config = self._config()
+        now = now or datetime.now()
+        if not config.get("maintenance_enabled", True):
+            return "Maintenance is disabled"
+        last = config.get("last_maintenance")
+        interval = timedelta(hours=float(config.get("maintenance_interval_hours", 24)))
+        if last and now - datetime.fromisoformat(last) < interval:
+            return "Ran recently"
+        window = config.get("maintenance_window") or "02:00-05:00"
+        if not in_window(window, now):
+            return f"Outside the maintenance window ({window})"
+        max_load = float(config.get("maintenance_max_load", 1.0))
+        if os.getloadavg()[0] > max_load:
+            return "System is busy"
+        return None
+
+    def run(self, force: bool = False) -> Dict[str, Any]:
+        """Run maintenance if due (or forced), never alongside an OTA job"""
+        if not force:
+            reason = self.not_due()
+            if reason:
+                return {"skipped": True, "reason": reason}
+        with self._lock:
+            if self._running:
+                return {"skipped": True, "reason": "Maintenance is already running"}
+            self._running = True
+        try:
+            if not self.ota_manager.try_exclusive():
+                return {"skipped": True, "reason": "An OTA operation is running"}
+            try:
+                report = self._maintain()
+            finally:
+                self.ota_manager.end_exclusive()
+        finally:
+            with self._lock:
+                self._running = False
+
+        OTA_MAINTENANCE_RUNS.inc(result=report["result"])
+        # An update cut this run short; try again at the next check
+        if report["result"] != "aborted":
+            self.config_manager.update_section(
+                "ota", {"last_maintenance": report["started_at"]}
+            )
+        with self._lock:
+            self._report = report
+        return report
+
+    def _maintain(self) -> Dict[str, Any]:
+        budget = float(self._config().get("maintenance_budget_seconds", 300))
+        started_at = datetime.now().isoformat()
+        started = time.monotonic()
+        deadline = started + budget
+
+        before = self.measure()
+        tasks: List[Dict[str, Any]] = []
+        stopped: Optional[str] = None
+        for name, args in self._tasks(before["objects"]):
+            if stopped is None and self.ota_manager.job_waiting():
+                stopped = "aborted"
+            elif stopped is None and time.monotonic() >= deadline:
+                stopped = "over_budget"
+            if stopped is not None:
+                tasks.append({"name": name, "status": "skipped"})
+                continue
+            status, seconds, output = self._git(args, deadline)
+            task = {"name": name, "status": status, "seconds": seconds}
+            if status == "error":
+                task["error"] = output.strip()[-500:]
+            elif status != "ok":
+                stopped = status
+            tasks.append(task)
+
+        result = stopped or "ok"
+        if result == "ok" and any(task["status"] == "error" for task in tasks):
+            result = "error"
+        return {
+            "started_at": started_at,
+            "seconds": round(time.monotonic() - started, 3),
+            "budget_seconds": budget,
+            "result": result,
+            "tasks": tasks,
+            "before": before,
+            "after": self.measure(),
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        config = self._config()
+        with self._lock:
+            running, report = self._running, self._report
+        return {
+            "enabled": config.get("maintenance_enabled", True),
+            "window": config.get("maintenance_window") or "02:00-05:00",
+            "running": running,
+            "last_run": config.get("last_maintenance"),
+            "not_due": None if running else self.not_due(),
+            "last_report": report,
+        }
+
+    def start(self) -> None:
+        """Check every check_interval seconds whether maintenance is due"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._loop, name="repo-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.check_interval):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Error running repository maintenance: {e}")
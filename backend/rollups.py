@@ -0,0 +1,323 @@
+import threading
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python 3.8
+    from backports.zoneinfo import (  # type: ignore[no-redef]
+        ZoneInfo,
+        ZoneInfoNotFoundError,
+    )
+
+from event_batch import EventBatch, parse_timestamp
+from page_stream import parse_page
+
+GRANULARITIES = ("this_hour", "today", "this_week")
+
+# Every UTC offset in use is a multiple of 15 minutes, so all events in the
+# same quarter hour share their local hour, day and week
+QUARTER_HOUR = 900
+
+Events = Union[EventBatch, List[Dict[str, Any]]]
+# (timestamp, id hash) -> whether a backfilled event should be folded
+EventFilter = Callable[[float, int], bool]
+
+
+def load_timezone(name: str) -> tzinfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"Unknown timezone {name!r}, using UTC for rollups")
+        return timezone.utc
+
+
+def period_start(local: datetime, granularity: str) -> datetime:
+    """Start of the calendar hour, day or (Monday-based) week containing local"""
+    start = local.replace(minute=0, second=0, microsecond=0)
+    if granularity == "this_hour":
+        return start
+    start = start.replace(hour=0)
+    if granularity == "today":
+        return start
+    return start - timedelta(days=start.weekday())
+
+
+class Bucket:
+    __slots__ = ("events", "page_views", "users")
+
+    def __init__(self):
+        self.events = 0
+        self.page_views = 0
+        # Prefixed with the project, matching HourAggregate
+        self.users: Set[str] = set()
+
+
+class Gap:
+    """Events between two refreshes that a page-capped fetch did not reach"""
+
+    __slots__ = ("after", "before", "skip")
+
+    def __init__(self, after: float, before: float, skip: Set[int]):
+        self.after = after
+        self.before = before
+        # Hashes of the ids already folded at either end
+        self.skip = skip
+
+    def covers(self, timestamp: float, id_hash: int) -> bool:
+        return self.after <= timestamp <= self.before and id_hash not in self.skip
+
+    def bounds(self) -> Tuple[str, str]:
+        """(after, before) as ISO timestamps for the events API"""
+        after, before = (
+            datetime.fromtimestamp(ts, timezone.utc).isoformat()
+            for ts in (self.after, self.before)
+        )
+        return after, before
+
+
+class CalendarRollups:
+    """Hour/day/week counts in the device timezone, folded in as events arrive"""
+
+    def __init__(self, timezone_name: str = "UTC"):
+        self.timezone_name = timezone_name
+        self.tz = load_timezone(timezone_name)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        # Backfills started before a reset must not land in the new buckets
+        self.generation += 1
+        self._buckets: Dict[Tuple[str, str], Bucket] = {}
+        self._period_keys: Dict[int, Tuple[str, str, str]] = {}
+        # Per project: newest timestamp folded in, ids seen at exactly that
+        # timestamp, and where the incremental feed started
+        self._projects: Dict[str, Dict[str, Any]] = {}
+
+    def set_timezone(self, timezone_name: str) -> bool:
+        """Switch timezone; buckets are dropped and rebuilt from the next refresh"""
+        with self._lock:
+            if timezone_name == self.timezone_name:
+                return False
+            self.timezone_name = timezone_name
+            self.tz = load_timezone(timezone_name)
+            self._reset()
+            return True
+
+    def _keys_for(self, timestamp: float) -> Tuple[str, str, str]:
+        quarter = int(timestamp) // QUARTER_HOUR
+        keys = self._period_keys.get(quarter)
+        if keys is None:
+            local = datetime.fromtimestamp(timestamp, self.tz)
+            hour, day, week = (period_start(local, g) for g in GRANULARITIES)
+            keys = (hour.isoformat(), day.isoformat(), week.isoformat())
+            self._period_keys[quarter] = keys
+        return keys
+
+    def _fold(
+        self,
+        project: str,
+        event: Optional[str],
+        distinct_id: Optional[str],
+        timestamp: float,
+    ) -> None:
+        for granularity, key in zip(GRANULARITIES, self._keys_for(timestamp)):
+            bucket = self._buckets.get((granularity, key))
+            if bucket is None:
+                bucket = self._buckets[(granularity, key)] = Bucket()
+            bucket.events += 1
+            if event == "$pageview":
+                bucket.page_views += 1
+            if distinct_id:
+                bucket.users.add(f"{project}:{distinct_id}")
+
+    def ingest(
+        self,
+        project: str,
+        events: Events,
+        after: str,
+        now: Optional[datetime] = None,
+    ) -> int:
+        """Fold events newer than the project's watermark; events are newest first"""
+        batch = EventBatch.from_events(events) if isinstance(events, list) else events
+        with self._lock:
+            state = self._projects.setdefault(
+                project,
+                {
+                    # Epoch seconds of the newest event, and hashes of the ids
+                    # seen at exactly that timestamp
+                    "watermark": None,
+                    "seen": set(),
+                    "covered_from": parse_timestamp(after),
+                    "backfilled": False,
+                    "gaps": [],
+                },
+            )
+            watermark: Optional[float] = state["watermark"]
+
+            fresh = []
+            for timestamp, id_hash, event, distinct_id in batch.rows(
+                "event", "distinct_id"
+            ):
+                if watermark is not None and (
+                    timestamp < watermark
+                    or (timestamp == watermark and id_hash in state["seen"])
+                ):
+                    break
+                fresh.append((timestamp, id_hash))
+                self._fold(project, event, distinct_id, timestamp)
+            else:
+                # The batch stopped short of the watermark (the fetch hit its
+                # page cap), so the events in between still have to be fetched
+                if watermark is not None and fresh:
+                    oldest = fresh[-1][0]
+                    skip = {id_hash for ts, id_hash in fresh if ts == oldest}
+                    state["gaps"].append(Gap(watermark, oldest, skip | state["seen"]))
+
+            if fresh:
+                newest = fresh[0][0]
+                seen = {id_hash for ts, id_hash in fresh if ts == newest}
+                if newest == watermark:
+                    seen |= state["seen"]
+                state["watermark"] = newest
+                state["seen"] = seen
+            self._prune(now)
+            return len(fresh)
+
+    def backfill_range(
+        self, project: str, now: datetime
+    ) -> Optional[Tuple[str, str, int]]:
+        """(after, before, generation) still missing for this week, if any"""
+        with self._lock:
+            state = self._projects.get(project)
+            if state is None or state["backfilled"]:
+                return None
+            week_start = period_start(now.astimezone(self.tz), "this_week")
+            if week_start >= state["covered_from"]:
+                state["backfilled"] = True
+                return None
+            return (
+                week_start.isoformat(),
+                state["covered_from"].isoformat(),
+                self.generation,
+            )
+
+    def next_gap(self, project: str) -> Optional[Tuple[Gap, int]]:
+        """(gap, generation) of the oldest range a capped fetch skipped, if any"""
+        with self._lock:
+            state = self._projects.get(project)
+            if state is None or not state["gaps"]:
+                return None
+            return state["gaps"][0], self.generation
+
+    def apply_gap(
+        self, project: str, gap: Gap, partial: "CalendarRollups", generation: int
+    ) -> bool:
+        """Merge a filled gap in one step, like apply_backfill"""
+        with self._lock, partial._lock:
+            state = self._projects.get(project)
+            if (
+                generation != self.generation
+                or state is None
+                or gap not in state["gaps"]
+            ):
+                return False
+            self._merge(partial._buckets)
+            state["gaps"].remove(gap)
+            self._prune()
+            return True
+
+    def add_events(
+        self,
+        project: str,
+        events: Iterable[Dict[str, Any]],
+        keep: Optional[EventFilter] = None,
+    ) -> None:
+        """Fold events without watermark bookkeeping (used for backfills)"""
+        batch = EventBatch.from_events(events)
+        with self._lock:
+            for timestamp, id_hash, event, distinct_id in batch.rows(
+                "event", "distinct_id"
+            ):
+                if keep is None or keep(timestamp, id_hash):
+                    self._fold(project, event, distinct_id, timestamp)
+
+    def merge_buckets(self, buckets: Dict[Tuple[str, str], Bucket]) -> None:
+        """Add partial bucket counts, e.g. from rollup_partial"""
+        with self._lock:
+            self._merge(buckets)
+
+    def _merge(self, buckets: Dict[Tuple[str, str], Bucket]) -> None:
+        for key, source in buckets.items():
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = Bucket()
+            bucket.events += source.events
+            bucket.page_views += source.page_views
+            bucket.users |= source.users
+
+    def apply_backfill(
+        self, project: str, partial: "CalendarRollups", generation: int
+    ) -> bool:
+        """Merge a completed backfill in one step so a failed one can be retried"""
+        with self._lock, partial._lock:
+            state = self._projects.get(project)
+            if generation != self.generation or state is None or state["backfilled"]:
+                return False
+            self._merge(partial._buckets)
+            state["backfilled"] = True
+            self._prune()
+            return True
+
+    def _prune(self, now: Optional[datetime] = None) -> None:
+        """Keep the current and previous period of each granularity"""
+        if now is None:
+            # Relative to the newest event seen, which tracks the wall clock
+            watermarks = [
+                state["watermark"]
+                for state in self._projects.values()
+                if state["watermark"] is not None
+            ]
+            now = (
+                datetime.fromtimestamp(max(watermarks), timezone.utc)
+                if watermarks
+                else datetime.now(timezone.utc)
+            )
+        local = now.astimezone(self.tz)
+        oldest = {
+            "this_hour": period_start(local - timedelta(hours=1), "this_hour"),
+            "today": period_start(local - timedelta(days=1), "today"),
+            "this_week": period_start(local - timedelta(weeks=1), "this_week"),
+        }
+        for granularity, key in list(self._buckets):
+            if datetime.fromisoformat(key) < oldest[granularity]:
+                del self._buckets[(granularity, key)]
+        if len(self._period_keys) > 4 * 24 * 8:
+            self._period_keys.clear()
+
+    def snapshot(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Current-period metrics; O(1) per metric, no event scan"""
+        local = (now or datetime.now(timezone.utc)).astimezone(self.tz)
+        stats: Dict[str, Any] = {}
+        with self._lock:
+            for granularity in GRANULARITIES:
+                key = period_start(local, granularity).isoformat()
+                bucket = self._buckets.get((granularity, key)) or Bucket()
+                stats[f"events_{granularity}"] = bucket.events
+                stats[f"page_views_{granularity}"] = bucket.page_views
+                stats[f"unique_users_{granularity}"] = len(bucket.users)
+            stats["rollup_timezone"] = self.timezone_name
+            stats["rollups_complete"] = all(
+                state["backfilled"] for state in self._projects.values()
+            )
+        return stats
+
+
+def rollup_partial(
+    timezone_name: str, project: str, body: bytes
+) -> Dict[Tuple[str, str], Bucket]:
+    """Bucket one raw events page; runs in an AggregationPool worker"""
+    partial = CalendarRollups(timezone_name)
+    partial.add_events(project, parse_page(body))
+    return partial._buckets
@@ -27,15 +27,15 @@ pip install -q -r requirements-dev.txt
 # Run quality checks
 echo ""
 echo "🔍 Running Black formatting check..."
-black --check app.py config_manager.py ota_manager.py
+black --check *.py
 
 echo ""
 echo "🔍 Running Flake8 linting..."
-flake8 app.py config_manager.py ota_manager.py
+flake8 *.py
 
 echo ""
 echo "🔍 Running MyPy type checking..."
-mypy app.py config_manager.py ota_manager.py
+mypy *.py
 
 echo ""
 echo "🔍 Running pytest..."
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class StatsCache:
+    def __init__(self, snapshot_file: str, persist_interval: float = 60):
+        self.snapshot_file = snapshot_file
+        self.persist_interval = persist_interval
+        self._lock = threading.Lock()
+        self._stats: Optional[Dict[str, Any]] = None
+        self._stored_at: Optional[float] = None
+        self._persisted_at = 0.0
+        # Read on first use rather than at startup, like the stats history
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Load the last persisted snapshot so it can be served before any fetch"""
+        if self._loaded:
+            return self._stats
+        with self._load_lock:
+            if self._loaded:
+                return self._stats
+            try:
+                if os.path.exists(self.snapshot_file):
+                    with open(self.snapshot_file, "r") as f:
+                        data = json.load(f)
+                    with self._lock:
+                        # A payload put meanwhile is newer than the file
+                        if self._stats is None:
+                            self._stats = data.get("stats")
+                            self._stored_at = data.get("stored_at")
+            except Exception as e:
+                print(f"Error loading stats snapshot: {e}")
+            self._loaded = True
+
+        return self._stats
+
+    def save_snapshot(self) -> bool:
+        """Write the current snapshot to disk atomically"""
+        with self._lock:
+            data = {"stats": self._stats, "stored_at": self._stored_at}
+
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_file) or ".", exist_ok=True)
+            tmp_file = f"{self.snapshot_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.snapshot_file)
+            self._persisted_at = time.time()
+            return True
+        except Exception as e:
+            print(f"Error saving stats snapshot: {e}")
+            return False
+
+    def put(self, stats: Dict[str, Any]) -> None:
+        """Store a freshly computed stats payload"""
+        with self._lock:
+            self._stats = stats
+            self._stored_at = time.time()
+
+        # Limit SD card writes; the in-memory copy is always current
+        if time.time() - self._persisted_at >= self.persist_interval:
+            self.save_snapshot()
+
+    def age(self) -> Optional[float]:
+        """Seconds since the snapshot was stored, or None if there is none"""
+        self.load_snapshot()
+        stored_at = self._stored_at
+        if stored_at is None:
+            return None
+        return max(0.0, time.time() - stored_at)
+
+    def get_fresh(self, max_age: float) -> Optional[Dict[str, Any]]:
+        """Get the snapshot if it is younger than max_age seconds"""
+        age = self.age()
+        if self._stats is None or age is None or age > max_age:
+            return None
+        return self._stats
+
+    def get_stale(self, reason: str) -> Optional[Dict[str, Any]]:
+        """Get the snapshot regardless of age, flagged as stale"""
+        age = self.age()
+        if self._stats is None or age is None:
+            return None
+
+        stale = dict(self._stats)
+        stale.update(
+            {"stale": True, "stale_reason": reason, "snapshot_age": round(age, 1)}
+        )
+        return stale
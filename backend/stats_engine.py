@@ -0,0 +1,236 @@
+import itertools
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from event_batch import (  # noqa: F401 (re-exported for existing imports)
+    EventBatch,
+    get_session_id,
+    page_path,
+    parse_timestamp,
+    referrer,
+)
+from heavy_hitters import SlidingTopK
+
+# Raw parsed events are still accepted and converted on entry
+Events = Union[EventBatch, List[Dict[str, Any]]]
+
+TOP_N = 10
+
+# Chunks are counted exactly with Counter before being folded into the
+# sketches, which keeps memory bounded and the per-event work in C
+TOP_K_CHUNK_SIZE = 1000
+
+
+# Top-N metric name -> EventBatch column holding the counted value
+TOP_K_DIMENSIONS: Dict[str, str] = {
+    "events": "event",
+    "pages": "page",
+    "referrers": "referrer",
+}
+
+
+def as_batch(events: Events) -> EventBatch:
+    return events if isinstance(events, EventBatch) else EventBatch.from_events(events)
+
+
+def hour_key(timestamp: float) -> str:
+    """UTC hour of an epoch timestamp, e.g. "2024-01-20T12" """
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H")
+
+
+def hourly_counts(
+    batch: EventBatch, stop: Optional[int] = None
+) -> Iterator[Tuple[str, str, Dict[str, int]]]:
+    """(dimension, UTC hour, value counts) for the first `stop` rows"""
+    stop = len(batch) if stop is None else stop
+    hours = [int(t // 3600) for t in batch.timestamps[:stop]]
+    for start in range(0, stop, TOP_K_CHUNK_SIZE):
+        end = min(start + TOP_K_CHUNK_SIZE, stop)
+        # Rows arrive newest first, so each hour is a contiguous run
+        for hour, group in itertools.groupby(range(start, end), hours.__getitem__):
+            rows = list(group)
+            first, last = rows[0], rows[-1] + 1
+            key = hour_key(hour * 3600)
+            for name, column in TOP_K_DIMENSIONS.items():
+                values = batch.tables[column].values
+                counts = Counter(batch.codes[column][first:last])
+                yield name, key, {
+                    value: n
+                    for value, n in ((values[c], n) for c, n in counts.items())
+                    if value
+                }
+
+
+class ProjectTopK:
+    """A project's hourly top-N sketches, fed only the events past its watermark"""
+
+    def __init__(self):
+        self.sketches = {name: SlidingTopK() for name in TOP_K_DIMENSIONS}
+        # Newest timestamp counted, and hashes of the ids seen at exactly it
+        self.watermark: Optional[float] = None
+        self.seen: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _fresh(self, batch: EventBatch) -> int:
+        """Rows at the head of a newest-first batch not counted yet"""
+        if self.watermark is None:
+            return len(batch)
+        for index, timestamp in enumerate(batch.timestamps):
+            if timestamp < self.watermark or (
+                timestamp == self.watermark and batch.id_hashes[index] in self.seen
+            ):
+                return index
+        return len(batch)
+
+    def ingest(self, batch: EventBatch) -> int:
+        """Count new events and drop hours older than the batch reaches back"""
+        with self._lock:
+            fresh = self._fresh(batch)
+            for name, key, counts in hourly_counts(batch, fresh):
+                self.sketches[name].update(key, counts)
+            if fresh:
+                newest = batch.timestamps[0]
+                seen = set(
+                    batch.id_hashes[i]
+                    for i in range(fresh)
+                    if batch.timestamps[i] == newest
+                )
+                if newest == self.watermark:
+                    seen |= self.seen
+                self.watermark, self.seen = newest, seen
+
+            # The top lists cover the same fetched window as the counts
+            if len(batch):
+                oldest = hour_key(batch.timestamps[-1])
+                for sketch in self.sketches.values():
+                    sketch.prune(oldest)
+            else:
+                self.sketches = {name: SlidingTopK() for name in TOP_K_DIMENSIONS}
+            return fresh
+
+    def top(self, n: int = TOP_N) -> Dict[str, List[Dict[str, object]]]:
+        with self._lock:
+            return {name: sketch.top(n) for name, sketch in self.sketches.items()}
+
+
+def top_k_stats(tops: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Top-N lists plus the single leading value for each dimension"""
+    stats: Dict[str, Any] = {}
+    for name, top in tops.items():
+        stats[f"top_{name}_24h"] = top
+        # Singular metric type for a stat circle, e.g. top_page_24h
+        stats[f"top_{name[:-1]}_24h"] = top[0]["value"] if top else ""
+    return stats
+
+
+def compute_stats(
+    events: Events,
+    now: Optional[datetime] = None,
+    top_k: Optional[ProjectTopK] = None,
+) -> Dict[str, Any]:
+    """Calculate dashboard metrics from newest-first 24h events"""
+    now = now or datetime.now(timezone.utc)
+    batch = as_batch(events)
+    # A project's ProjectTopK is kept between refreshes, so only the events it
+    # has not counted yet go into the top lists
+    if top_k is None:
+        top_k = ProjectTopK()
+    top_k.ingest(batch)
+
+    # Calculate various metrics
+    total_events = len(batch)
+    unique_users = batch.distinct("distinct_id")
+    page_views = batch.count("event", "$pageview")
+    custom_events = total_events - page_views
+    sessions = batch.distinct("session_id", skip_empty=True)
+
+    # Calculate metrics for different time periods
+    last_hour = (now - timedelta(hours=1)).timestamp()
+    events_last_hour = sum(1 for t in batch.timestamps if t > last_hour)
+
+    return {
+        "events_24h": total_events,
+        "unique_users_24h": unique_users,
+        "page_views_24h": page_views,
+        "custom_events_24h": custom_events,
+        "sessions_24h": sessions,
+        "events_1h": events_last_hour,
+        "avg_events_per_user": round(total_events / unique_users, 1)
+        if unique_users > 0
+        else 0,
+        # Last 10 events, kept whole by the batch
+        "recent_events": batch.recent[:10],
+        **top_k_stats(top_k.top(TOP_N)),
+        "last_updated": now.isoformat(),
+    }
+
+
+# Counts that can simply be added across projects; users and sessions are
+# scoped to a project, so the sum is the number across all products
+SUMMED_METRICS = [
+    "events_24h",
+    "unique_users_24h",
+    "page_views_24h",
+    "custom_events_24h",
+    "sessions_24h",
+    "events_1h",
+]
+
+
+def merge_stats(
+    project_stats: Dict[str, Dict[str, Any]], now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Combine per-project stats into a single dashboard payload"""
+    now = now or datetime.now(timezone.utc)
+    combined: Dict[str, Any] = {
+        metric: sum(stats.get(metric, 0) for stats in project_stats.values())
+        for metric in SUMMED_METRICS
+    }
+
+    users = combined["unique_users_24h"]
+    combined["avg_events_per_user"] = (
+        round(combined["events_24h"] / users, 1) if users > 0 else 0
+    )
+
+    recent = [e for stats in project_stats.values() for e in stats["recent_events"]]
+    recent.sort(key=lambda e: e.get("timestamp", ""), reverse=True)
+    combined["recent_events"] = recent[:10]
+    combined.update(merge_top_lists(project_stats))
+    combined["last_updated"] = now.isoformat()
+    # Counts from page-capped projects start at their oldest fetched event
+    covered = [
+        stats["covered_from"]
+        for stats in project_stats.values()
+        if stats.get("truncated") and stats.get("covered_from")
+    ]
+    combined["truncated"] = bool(covered)
+    if covered:
+        combined["covered_from"] = max(covered)
+    combined["projects"] = {
+        name: dict(
+            {metric: stats.get(metric, 0) for metric in SUMMED_METRICS},
+            stale=bool(stats.get("stale")),
+            truncated=bool(stats.get("truncated")),
+        )
+        for name, stats in project_stats.items()
+    }
+    return combined
+
+
+def merge_top_lists(project_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Approximate combined top-N by adding each project's top-N counts"""
+    merged: Dict[str, Any] = {}
+    for name in TOP_K_DIMENSIONS:
+        totals: Counter = Counter()
+        for stats in project_stats.values():
+            for entry in stats.get(f"top_{name}_24h", []):
+                totals[entry["value"]] += entry["count"]
+        top = [
+            {"value": value, "count": count}
+            for value, count in sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))
+        ][:TOP_N]
+        merged[f"top_{name}_24h"] = top
+        merged[f"top_{name[:-1]}_24h"] = top[0]["value"] if top else ""
+    return merged
@@ -0,0 +1,202 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (bucket seconds, bucket count): 1 minute for 24h, 1 hour for 30 days
+DEFAULT_RESOLUTIONS = ((60, 24 * 60), (3600, 30 * 24))
+
+RANGE_PATTERN = re.compile(r"^(\d+)([mhd])$")
+RANGE_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_range(value: str) -> int:
+    """Parse a span like '90m', '24h' or '30d' into seconds"""
+    match = RANGE_PATTERN.match(value.strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid range: {value}")
+    return int(match.group(1)) * RANGE_UNITS[match.group(2)]
+
+
+class RingSeries:
+    """Fixed-size ring of time buckets backed by flat arrays"""
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        # Bucket number (epoch // resolution) each slot currently holds, -1 = empty
+        self.buckets = array("q", [-1]) * capacity
+        self.sums = array("d", [0.0]) * capacity
+        self.counts = array("L", [0]) * capacity
+
+    @property
+    def span(self) -> int:
+        return self.resolution * self.capacity
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Fold a sample into its bucket, recycling the slot if it is old"""
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.capacity
+        if self.buckets[slot] != bucket:
+            if self.buckets[slot] > bucket:
+                return  # older than the ring covers
+            self.buckets[slot] = bucket
+            self.sums[slot] = 0.0
+            self.counts[slot] = 0
+        self.sums[slot] += value
+        self.counts[slot] += 1
+
+    def query(
+        self, start: float, end: float, points: int
+    ) -> List[Tuple[float, Optional[float]]]:
+        """Average buckets in [start, end) into at most `points` evenly sized bins"""
+        first = int(start // self.resolution)
+        last = int(math.ceil(end / self.resolution))
+        first = max(first, last - self.capacity)
+        total = last - first
+        points = max(1, min(points, total))
+
+        sums = [0.0] * points
+        counts = [0] * points
+        for bucket in range(first, last):
+            slot = bucket % self.capacity
+            if self.buckets[slot] != bucket:
+                continue
+            index = (bucket - first) * points // total
+            sums[index] += self.sums[slot] / self.counts[slot]
+            counts[index] += 1
+
+        return [
+            (
+                (first + index * total / points) * self.resolution,
+                round(sums[index] / counts[index], 3) if counts[index] else None,
+            )
+            for index in range(points)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        used = [slot for slot in range(self.capacity) if self.buckets[slot] >= 0]
+        return {
+            "resolution": self.resolution,
+            "buckets": [self.buckets[slot] for slot in used],
+            "sums": [self.sums[slot] for slot in used],
+            "counts": [self.counts[slot] for slot in used],
+        }
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        for bucket, total, count in zip(data["buckets"], data["sums"], data["counts"]):
+            slot = bucket % self.capacity
+            if bucket > self.buckets[slot]:
+                self.buckets[slot] = bucket
+                self.sums[slot] = total
+                self.counts[slot] = count
+
+
+class StatsHistory:
+    def __init__(
+        self,
+        history_file: str,
+        resolutions: Iterable[Tuple[int, int]] = DEFAULT_RESOLUTIONS,
+        persist_interval: float = 300,
+    ):
+        self.history_file = history_file
+        self.resolutions = sorted(resolutions)
+        self.persist_interval = persist_interval
+        self._lock = threading.Lock()
+        self._series: Dict[str, List[RingSeries]] = {}
+        self._persisted_at = 0.0
+        # The file can be large, so it is read on first use, not at startup
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _series_for(self, metric: str) -> List[RingSeries]:
+        series = self._series.get(metric)
+        if series is None:
+            series = [RingSeries(res, cap) for res, cap in self.resolutions]
+            self._series[metric] = series
+        return series
+
+    def record(self, stats: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """Append every numeric metric in a stats payload to all resolutions"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self.load()
+        with self._lock:
+            for metric, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                for series in self._series_for(metric):
+                    series.add(timestamp, float(value))
+
+        # Limit SD card writes, as with the stats snapshot
+        if time.time() - self._persisted_at >= self.persist_interval:
+            self.save()
+
+    def query(
+        self,
+        metric: str,
+        span: int,
+        points: int,
+        now: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Get a downsampled series covering the last `span` seconds"""
+        now = time.time() if now is None else now
+        self.load()
+        with self._lock:
+            series_list = self._series.get(metric)
+            if series_list is None:
+                return None
+            # Finest resolution that still covers the requested span
+            series = next((s for s in series_list if s.span >= span), series_list[-1])
+            data = series.query(now - span, now, points)
+
+        return {
+            "metric": metric,
+            "resolution": series.resolution,
+            "points": [[int(ts), value] for ts, value in data],
+        }
+
+    def save(self) -> bool:
+        """Write all series to disk atomically"""
+        self.load()
+        with self._lock:
+            data = {
+                metric: [s.to_dict() for s in series]
+                for metric, series in self._series.items()
+            }
+
+        try:
+            os.makedirs(os.path.dirname(self.history_file) or ".", exist_ok=True)
+            tmp_file = f"{self.history_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_file, self.history_file)
+            self._persisted_at = time.time()
+            return True
+        except Exception as e:
+            print(f"Error saving stats history: {e}")
+            return False
+
+    def load(self) -> None:
+        """Restore persisted series once, ignoring resolutions no longer configured"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                if os.path.exists(self.history_file):
+                    with open(self.history_file, "r") as f:
+                        data = json.load(f)
+                    with self._lock:
+                        for metric, saved in data.items():
+                            by_resolution = {s["resolution"]: s for s in saved}
+                            for series in self._series_for(metric):
+                                if series.resolution in by_resolution:
+                                    series.load_dict(by_resolution[series.resolution])
+            except Exception as e:
+                print(f"Error loading stats history: {e}")
+            self._loaded = True
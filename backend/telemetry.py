@@ -0,0 +1,368 @@
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import psutil
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _callback_samples(
+    name: str, callback: Callable[[], Optional[float]]
+) -> List[str]:
+    """The single sample of a metric computed at scrape time, if it has a value"""
+    try:
+        value = callback()
+    except Exception:
+        value = None
+    return [] if value is None else [f"{name} {_format_value(value)}"]
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        # For totals kept elsewhere, such as the OS's CPU time, read at scrape
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the counter for the given label values"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        """Get the current value for the given label values"""
+        if self.callback is not None:
+            return self.callback() or 0
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            return _callback_samples(self.name, self.callback)
+
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in values
+        ]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for the given label values"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels: str) -> Optional[float]:
+        """Get the current value for the given label values"""
+        if self.callback is not None:
+            return self.callback()
+        return self._values.get(self._key(labels))
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            return _callback_samples(self.name, self.callback)
+
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in values
+        ]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation for the given label values"""
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+
+    def get_count(self, **labels: str) -> int:
+        """Get the number of observations for the given label values"""
+        return sum(self._counts.get(self._key(labels), []))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            entries = sorted(
+                (key, list(counts), self._sums[key])
+                for key, counts in self._counts.items()
+            )
+
+        lines = []
+        bucket_names = self.labelnames + ("le",)
+        for key, counts, total in entries:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(bucket_names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Optional[float]]] = None,
+    ) -> Counter:
+        """Create and register a counter, optionally read at scrape time"""
+        metric = Counter(name, documentation, labelnames, callback)
+        self._register(metric)
+        return metric
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Optional[float]]] = None,
+    ) -> Gauge:
+        """Create and register a gauge, optionally computed at scrape time"""
+        metric = Gauge(name, documentation, labelnames, callback)
+        self._register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram"""
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._register(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "dashboard_http_requests_total",
+    "HTTP requests handled, by Flask route",
+    ["route", "method", "status"],
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "dashboard_http_request_duration_seconds",
+    "HTTP request latency, by Flask route",
+    ["route", "method"],
+)
+POSTHOG_REQUEST_DURATION = REGISTRY.histogram(
+    "dashboard_posthog_request_duration_seconds",
+    "PostHog API call latency",
+    ["endpoint"],
+)
+POSTHOG_RESPONSES = REGISTRY.counter(
+    "dashboard_posthog_responses_total",
+    "PostHog API responses, by HTTP status (or 'error' for failed calls)",
+    ["endpoint", "status"],
+)
+EVENTS_PER_REFRESH = REGISTRY.histogram(
+    "dashboard_events_processed_per_refresh",
+    "Events processed by a single stats refresh",
+    buckets=(10, 100, 1000, 10000, 100000, 1000000),
+)
+STATS_CACHE_REQUESTS = REGISTRY.counter(
+    "dashboard_stats_cache_requests_total",
+    "Stats requests by cache outcome (hit, miss, stale)",
+    ["result"],
+)
+GIT_COMMAND_DURATION = REGISTRY.histogram(
+    "dashboard_git_command_duration_seconds",
+    "Duration of git subprocesses run by the OTA manager",
+    ["command"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+
+def _cache_hit_ratio() -> Optional[float]:
+    hits = STATS_CACHE_REQUESTS.get(result="hit")
+    total = hits + STATS_CACHE_REQUESTS.get(result="miss")
+    total += STATS_CACHE_REQUESTS.get(result="stale")
+    return round(hits / total, 4) if total else None
+
+
+REGISTRY.gauge(
+    "dashboard_stats_cache_hit_ratio",
+    "Share of stats requests served from the snapshot without an upstream call",
+    callback=_cache_hit_ratio,
+)
+
+_process = psutil.Process()
+REGISTRY.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory size in bytes",
+    callback=lambda: _process.memory_info().rss,
+)
+REGISTRY.counter(
+    "process_cpu_seconds_total",
+    "Total user and system CPU time spent in seconds",
+    callback=lambda: sum(_process.cpu_times()[:2]),
+)
+REGISTRY.gauge(
+    "process_cpu_percent",
+    "Process CPU utilisation since the previous scrape",
+    callback=lambda: _process.cpu_percent(interval=None),
+)
+REGISTRY.gauge(
+    "process_threads",
+    "Number of OS threads in the process",
+    callback=lambda: _process.num_threads(),
+)
+HTTP_RESPONSE_BYTES = REGISTRY.counter(
+    "dashboard_http_response_bytes_total",
+    "Response body bytes for negotiated API routes, by encoding",
+    ["route", "encoding"],
+)
+UPSTREAM_BUDGET_TOKENS = REGISTRY.gauge(
+    "dashboard_upstream_budget_tokens",
+    "Requests left in the per-host rate-limit budget",
+    ["host"],
+)
+UPSTREAM_BUDGET_SLOWDOWN = REGISTRY.gauge(
+    "dashboard_upstream_budget_slowdown",
+    "Factor the budget refill and stats refresh are slowed by (1 = normal)",
+    ["host"],
+)
+UPSTREAM_BUDGET_REQUESTS = REGISTRY.counter(
+    "dashboard_upstream_budget_requests_total",
+    "Upstream calls by budget outcome (granted, delayed, rejected)",
+    ["host", "priority", "result"],
+)
+UPSTREAM_THROTTLED = REGISTRY.counter(
+    "dashboard_upstream_throttled_total",
+    "429 responses received from upstream hosts",
+    ["host"],
+)
+FETCH_PIPELINE_WAIT = REGISTRY.counter(
+    "dashboard_fetch_pipeline_wait_seconds_total",
+    "Time the event fetch pipeline spent blocked, by side (network or cpu)",
+    ["side"],
+)
+OTA_FETCH_BYTES = REGISTRY.counter(
+    "dashboard_ota_fetch_bytes_total",
+    "Bytes added to the git object store by OTA fetches",
+)
+OTA_MAINTENANCE_RUNS = REGISTRY.counter(
+    "dashboard_ota_maintenance_runs_total",
+    "OTA repository maintenance runs, by result (ok, aborted, over_budget, error)",
+    ["result"],
+)
+OTA_OBJECT_STORE = REGISTRY.gauge(
+    "dashboard_ota_object_store",
+    "OTA checkout object store at the last maintenance check, by kind",
+    ["kind"],
+)
+DISPLAY_WAKES = REGISTRY.counter(
+    "dashboard_display_wakes_total",
+    "Times the display came back from idle, which triggers a stats warm-up",
+)
@@ -0,0 +1,108 @@
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from aggregation_pool import AggregationPool, parse_workers
+from benchmarks.posthog_stub import EventStream, PostHogStub
+from history_backfill import HourAggregate, hour_partial
+from page_stream import page_link
+from posthog_client import PostHogClient
+from rollups import CalendarRollups, rollup_partial
+
+NOW = datetime(2024, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def pool():
+    pool = AggregationPool(2)
+    yield pool
+    pool.shutdown()
+
+
+def page_bodies(total=3000, size=500):
+    stream = EventStream(total_events=total, users=60, window_hours=24 * 7, now=NOW)
+    return [
+        json.dumps({'next': None, 'results': stream.events(start, size)}).encode()
+        for start in range(0, total, size)
+    ]
+
+
+def test_page_link_finds_top_level_next():
+    """Test the link is read from the page, not from an event property"""
+    event = {'id': '1', 'properties': {'next': 'https://evil/'}}
+    first = json.dumps({'next': 'https://ph/2', 'results': [event]}).encode()
+    last = json.dumps({'results': [event], 'next': 'https://ph/3'}).encode()
+    none = json.dumps({'results': [event], 'next': None}).encode()
+
+    assert page_link(first) == 'https://ph/2'
+    assert page_link(last) == 'https://ph/3'
+    assert page_link(none) is None
+
+
+def test_parse_workers():
+    """Test AGGREGATION_WORKERS accepts a count or auto"""
+    assert parse_workers('3') == 3
+    assert parse_workers('-1') == 0
+    assert parse_workers('auto') >= 0
+
+
+def test_rollup_partials_merge_to_the_inline_result(pool):
+    """Test buckets built by worker processes add up to a single-process fold"""
+    bodies = page_bodies()
+    inline = CalendarRollups('Europe/London')
+    for body in bodies:
+        inline.add_events('shop', json.loads(body)['results'])
+
+    merged = CalendarRollups('Europe/London')
+    for buckets in pool.map(rollup_partial, bodies, 'Europe/London', 'shop'):
+        merged.merge_buckets(buckets)
+
+    assert merged.snapshot(NOW) == inline.snapshot(NOW)
+    assert merged.snapshot(NOW)['events_this_week'] > 0
+
+
+def test_hour_partials_merge_to_the_inline_result(pool):
+    """Test per-page hour aggregates merge to the same counts and id sets"""
+    bodies = page_bodies(total=1000, size=250)
+    inline = HourAggregate(0)
+    for body in bodies:
+        inline.add('shop', json.loads(body)['results'])
+
+    merged = HourAggregate(0)
+    for partial in pool.map(hour_partial, bodies, 'shop', 0):
+        merged.merge(partial)
+
+    assert merged.events == inline.events
+    assert merged.page_views == inline.page_views
+    assert merged.users == inline.users
+    assert merged.sessions == inline.sessions
+
+
+def test_pool_reads_raw_pages_from_posthog(pool):
+    """Test raw page bodies follow pagination and feed the workers"""
+    stub = PostHogStub(EventStream(total_events=2500, users=40)).start()
+    try:
+        client = PostHogClient(stub.url, 'key', '1', page_size=1000)
+        after = datetime(2000, 1, 1, tzinfo=timezone.utc).isoformat()
+        partials = list(pool.map(hour_partial, client.iter_page_bodies(after), 'p', 0))
+    finally:
+        stub.stop()
+
+    assert [p.events for p in partials] == [1000, 1000, 500]
+
+
+def test_pool_forks_only_while_single_threaded(pool):
+    """Test a pool created once other threads run starts from a forkserver"""
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        executor = pool._pool()
+        partials = list(pool.map(hour_partial, page_bodies(1000, 500), 'p', 0))
+    finally:
+        stop.set()
+        thread.join()
+
+    assert executor._mp_context.get_start_method() == 'forkserver'
+    assert [p.events for p in partials] == [500, 500]
@@ -33,4 +33,269 @@ def test_available_metrics_endpoint(client):
     assert isinstance(data, dict)
     # Check that some expected metrics are present
     assert 'events_24h' in data
-    assert 'unique_users_24h' in data
\ No newline at end of file
+    assert 'unique_users_24h' in data
+
+def test_stats_falls_back_to_snapshot(client, monkeypatch, tmp_path):
+    """Test that /api/stats serves the last snapshot when PostHog fails"""
+    import app as app_module
+    from stats_cache import StatsCache
+
+    def failing_get(*args, **kwargs):
+        raise ConnectionError('network down')
+
+    cache = StatsCache(str(tmp_path / 'stats_snapshot.json'))
+    cache.put({'events_24h': 7})
+    cache._stored_at -= 3600
+    monkeypatch.setattr(app_module, 'stats_cache', cache)
+    monkeypatch.setattr(app_module, 'POSTHOG_API_KEY', 'key')
+    monkeypatch.setattr(app_module, 'POSTHOG_PROJECT_ID', '1')
+    monkeypatch.setattr(app_module.project_fetcher.session, 'get', failing_get)
+
+    data = client.get('/api/stats').get_json()
+    assert data['events_24h'] == 7
+    assert data['stale'] is True
+    assert 'network down' in data['stale_reason']
+
+
+def test_metrics_endpoint(client):
+    """Test /metrics exposes per-route and process metrics"""
+    client.get('/api/health')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'dashboard_http_requests_total{route="/api/health",method="GET",status="200"}' in text
+    assert 'process_resident_memory_bytes' in text
+
+
+def test_readiness_without_credentials(client, monkeypatch):
+    """Test readiness reports unavailable when PostHog is not configured"""
+    import app as app_module
+
+    monkeypatch.setattr(app_module, 'POSTHOG_API_KEY', None)
+    response = client.get('/api/health/ready')
+    assert response.status_code == 503
+    data = response.get_json()
+    assert data['status'] == 'unavailable'
+    assert 'upstream' in data and 'disk' in data and 'ota' in data
+
+
+def test_readiness_does_not_build_clients(client, monkeypatch):
+    """Test a readiness probe only reads settings, never configuring clients"""
+    import app as app_module
+
+    def configure(*args, **kwargs):
+        raise AssertionError('readiness must not configure PostHog clients')
+
+    monkeypatch.setattr(app_module, 'POSTHOG_API_KEY', 'key')
+    monkeypatch.setattr(app_module, 'POSTHOG_PROJECT_ID', '1')
+    monkeypatch.setattr(app_module.project_fetcher, 'configure', configure)
+    data = client.get('/api/health/ready').get_json()
+    assert 'PostHog credentials not configured' not in data['reasons']
+
+
+def test_profiles_endpoint_with_debug_mode(client, monkeypatch):
+    """Test sampled request profiles are exposed as collapsed stacks"""
+    import app as app_module
+    from profiler import RequestProfiler
+
+    advanced = dict(app_module.config_manager.get_section('advanced'))
+    advanced.update({'debug_mode': True, 'profile_sample_rate': 1})
+    monkeypatch.setitem(app_module.config_manager.config, 'advanced', advanced)
+    monkeypatch.setattr(app_module, 'request_profiler', RequestProfiler())
+
+    client.get('/api/metrics/available')
+    data = client.get('/api/admin/profiles').get_json()
+    assert data['enabled'] is True
+    assert data['profiles'][0]['route'] == '/api/metrics/available'
+
+    response = client.get('/api/admin/profiles?format=collapsed')
+    assert response.mimetype == 'text/plain'
+
+
+def test_stats_history_endpoint(client, monkeypatch, tmp_path):
+    """Test /api/stats/history returns configured metrics and validates input"""
+    import app as app_module
+    from stats_history import StatsHistory
+
+    history = StatsHistory(str(tmp_path / 'stats_history.json'))
+    history.record({'events_24h': 12, 'unique_users_24h': 3})
+    monkeypatch.setattr(app_module, 'stats_history', history)
+
+    data = client.get('/api/stats/history?range=1h&points=30').get_json()
+    assert data['range'] == '1h'
+    assert data['series']['events_24h']['points'][-1][1] == 12
+    assert len(data['series']['unique_users_24h']['points']) == 30
+    assert data['series']['page_views_24h']['points'] == []
+
+    assert client.get('/api/stats/history?range=soon').status_code == 400
+    assert client.get('/api/stats/history?points=0').status_code == 400
+
+
+def test_stats_combines_configured_projects(client, monkeypatch, tmp_path):
+    """Test /api/stats merges projects and serves each one via ?project="""
+    import app as app_module
+    from benchmarks.posthog_stub import EventStream, PostHogStub
+    from stats_cache import StatsCache
+
+    stub = PostHogStub(EventStream(total_events=200, users=10)).start()
+    projects = [
+        {'name': name, 'project_id': name, 'host': stub.url, 'api_key': 'k'}
+        for name in ('shop', 'blog')
+    ]
+    monkeypatch.setenv('DASHBOARD_DATA_DIR', str(tmp_path))
+    monkeypatch.setitem(app_module.config_manager.config['posthog'], 'projects', projects)
+    monkeypatch.setattr(app_module, 'stats_cache', StatsCache(str(tmp_path / 'all.json')))
+    monkeypatch.setattr(app_module, 'project_caches', {})
+    monkeypatch.setattr(app_module.history_backfill, 'days', 0)
+    try:
+        combined = client.get('/api/stats').get_json()
+        shop = client.get('/api/stats?project=shop').get_json()
+    finally:
+        stub.stop()
+
+    assert combined['events_24h'] == 400
+    assert combined['events_today'] <= 400
+    assert 'rollup_timezone' in combined
+    assert set(combined['projects']) == {'shop', 'blog'}
+    assert shop['events_24h'] == 200
+    assert client.get('/api/stats?project=nope').status_code == 404
+
+
+def test_binary_encodings_are_negotiated(client):
+    """Test that Accept selects CBOR or MessagePack and JSON stays the default"""
+    from app import AVAILABLE_METRICS
+    from wire_format import encode_cbor, encode_msgpack
+
+    json_response = client.get('/api/metrics/available')
+    assert json_response.mimetype == 'application/json'
+    assert 'Accept' in json_response.headers['Vary']
+    assert json_response.get_json() == AVAILABLE_METRICS
+
+    cbor = client.get(
+        '/api/metrics/available', headers={'Accept': 'application/cbor'}
+    )
+    assert cbor.mimetype == 'application/cbor'
+    assert cbor.data == encode_cbor(AVAILABLE_METRICS)
+    assert len(cbor.data) < len(json_response.data)
+
+    msgpack = client.get(
+        '/api/metrics/available', headers={'Accept': 'application/msgpack'}
+    )
+    assert msgpack.mimetype == 'application/msgpack'
+    assert msgpack.data == encode_msgpack(AVAILABLE_METRICS)
+
+    # Routes outside the negotiated set keep JSON
+    health = client.get('/api/health', headers={'Accept': 'application/cbor'})
+    assert health.mimetype == 'application/json'
+
+
+def test_bootstrap_endpoint(client, monkeypatch):
+    """Test that /api/bootstrap batches config, OTA status and metrics"""
+    import app as app_module
+
+    monkeypatch.setattr(
+        app_module.ota_manager, 'get_status', lambda: {'current_branch': 'main'}
+    )
+    data = client.get('/api/bootstrap').get_json()
+    assert data['config'] == app_module.config_manager.get_config()
+    assert data['ota_status'] == {'current_branch': 'main'}
+    assert 'events_24h' in data['available_metrics']
+
+
+def test_idle_display_stops_upstream_refreshes(client, monkeypatch, tmp_path):
+    """Test a hidden display gets the snapshot as is and a wake warms it up"""
+    import threading
+
+    import app as app_module
+    from display_activity import DisplayActivity
+    from stats_cache import StatsCache
+
+    def failing_get(*args, **kwargs):
+        raise ConnectionError('PostHog should not be queried while idle')
+
+    woke = threading.Event()
+    cache = StatsCache(str(tmp_path / 'stats_snapshot.json'))
+    cache.put({'events_24h': 2400, 'events_1h': 300})
+    cache._stored_at -= 60
+    monkeypatch.setattr(app_module, 'stats_cache', cache)
+    monkeypatch.setattr(app_module, 'display_activity', DisplayActivity())
+    monkeypatch.setattr(app_module, 'warm_stats', woke.set)
+    monkeypatch.setattr(app_module, 'POSTHOG_API_KEY', 'key')
+    monkeypatch.setattr(app_module, 'POSTHOG_PROJECT_ID', '1')
+    monkeypatch.setattr(app_module.project_fetcher.session, 'get', failing_get)
+
+    hidden = client.post('/api/display/activity', json={'visible': False})
+    assert hidden.get_json()['state'] == 'idle'
+    assert hidden.get_json()['stats_ttl'] >= 300
+
+    response = client.get('/api/stats')
+    assert response.get_json() == {'events_24h': 2400, 'events_1h': 300}
+    assert float(response.headers['X-Refresh-Interval']) > 0
+
+    shown = client.post('/api/display/activity', json={'visible': True})
+    assert shown.get_json()['state'] == 'active'
+    # Busier than the day's average, so the display polls sooner
+    assert shown.get_json()['refresh_interval'] < 30
+    assert woke.wait(5)
+
+    assert client.post('/api/display/activity', json={}).status_code == 400
+
+
+def test_stats_served_stale_during_another_refresh(client, monkeypatch, tmp_path):
+    """Test a request arriving mid-refresh gets the old snapshot without waiting"""
+    import app as app_module
+    from stats_cache import StatsCache
+
+    def failing_get(*args, **kwargs):
+        raise ConnectionError('PostHog should not be queried twice at once')
+
+    cache = StatsCache(str(tmp_path / 'stats_snapshot.json'))
+    cache.put({'events_24h': 7})
+    cache._stored_at -= 3600
+    monkeypatch.setattr(app_module, 'stats_cache', cache)
+    monkeypatch.setattr(app_module, 'POSTHOG_API_KEY', 'key')
+    monkeypatch.setattr(app_module, 'POSTHOG_PROJECT_ID', '1')
+    monkeypatch.setattr(app_module.project_fetcher.session, 'get', failing_get)
+
+    assert app_module.stats_refresh.acquire(timeout=5)
+    try:
+        data = client.get('/api/stats').get_json()
+    finally:
+        app_module.stats_refresh.release()
+    assert data['events_24h'] == 7
+    assert data['stale'] is True
+    assert data['stale_reason'] == 'Refresh in progress'
+
+
+def test_display_idle_waits_for_every_display(client, monkeypatch):
+    """Test one tab hiding keeps the screen active while another still polls"""
+    import app as app_module
+    from display_activity import DisplayActivity
+
+    monkeypatch.setattr(app_module, 'display_activity', DisplayActivity())
+    monkeypatch.setattr(app_module, 'warm_stats', lambda: None)
+    kiosk = {'X-Display-Id': 'kiosk'}
+    laptop = {'X-Display-Id': 'laptop'}
+
+    client.post('/api/display/activity', json={'visible': True}, headers=laptop)
+    hidden = client.post(
+        '/api/display/activity', json={'visible': False}, headers=kiosk
+    )
+    assert hidden.get_json()['state'] == 'active'
+    assert hidden.get_json()['displays'] == 2
+
+    client.post('/api/display/activity', json={'visible': False}, headers=laptop)
+    assert client.get('/api/display/activity').get_json()['state'] == 'idle'
+
+
+def test_readiness_reports_rate_budget(client, monkeypatch):
+    """Test readiness shows the PostHog request budget operators tune"""
+    import app as app_module
+    from rate_budget import RateBudgeter
+
+    monkeypatch.setattr(app_module, 'upstream_budget', RateBudgeter(120, 30))
+    budget = client.get('/api/health/ready').get_json()['upstream']['rate_budget']
+    assert budget['rate_per_minute'] == 120
+    assert budget['burst'] == 30
+    assert budget['hosts'] == {}
@@ -0,0 +1,20 @@
+from benchmarks.bench_startup import (
+    DEFERRED_MODULES,
+    measure_import,
+    measure_listen,
+    startup_env,
+)
+
+
+def test_import_leaves_http_client_to_first_use(tmp_path):
+    """Test importing the app does not load requests/urllib3"""
+    work_dir = str(tmp_path)
+    probe = measure_import(startup_env(work_dir), work_dir)
+    assert probe['loaded'] == []
+    assert set(DEFERRED_MODULES) >= {'requests'}
+
+
+def test_app_listens_within_budget(tmp_path):
+    """Test python app.py accepts connections well inside a generous budget"""
+    work_dir = str(tmp_path)
+    assert measure_listen(startup_env(work_dir), work_dir) < 10
@@ -0,0 +1,85 @@
+import pytest
+from boot_orchestrator import BootOrchestrator
+
+
+class FakeOTAManager:
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result or {"no_updates": True}
+
+    def perform_boot_update(self):
+        self.calls += 1
+        return self.result
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / 'boot_state.json')
+
+
+def test_boot_update_runs_once_per_boot(state_file):
+    """Test that a second orchestrator in the same boot skips the OTA check"""
+    ota = FakeOTAManager()
+    first = BootOrchestrator(ota, state_file)
+    second = BootOrchestrator(ota, state_file)
+
+    assert first.run_boot_update() == {'no_updates': True}
+    result = second.run_boot_update()
+
+    assert ota.calls == 1
+    assert result['skipped'] is True
+    assert result['previous']['result'] == {'no_updates': True}
+
+
+def test_failed_boot_update_is_retried(state_file):
+    """Test that an errored check does not block the next caller"""
+    ota = FakeOTAManager({'error': 'fetch failed'})
+    BootOrchestrator(ota, state_file).run_boot_update()
+    BootOrchestrator(ota, state_file).run_boot_update()
+
+    assert ota.calls == 2
+
+
+def test_background_update_waits_for_network(state_file):
+    """Test the background thread records network and update phases"""
+    ota = FakeOTAManager()
+    checks = iter([False, False, True])
+    orchestrator = BootOrchestrator(
+        ota,
+        state_file,
+        network_check=lambda: next(checks),
+        network_poll_interval=0,
+    )
+
+    orchestrator.start_background_update().join(timeout=5)
+    report = orchestrator.get_report()
+
+    assert ota.calls == 1
+    assert report['phases']['network_wait']['status'] == 'ok'
+    assert report['phases']['boot_update']['status'] == 'ok'
+    assert report['boot_update'] == {'no_updates': True}
+
+
+def test_background_update_gives_up_without_network(state_file):
+    """Test the OTA check is not attempted when the network never comes up"""
+    ota = FakeOTAManager()
+    orchestrator = BootOrchestrator(
+        ota, state_file, network_check=lambda: False, network_timeout=0
+    )
+
+    orchestrator.start_background_update().join(timeout=5)
+
+    assert ota.calls == 0
+    assert orchestrator.get_report()['phases']['network_wait']['status'] == 'timeout'
+
+
+def test_milestones_record_first_occurrence(state_file):
+    """Test that milestones keep the first time they were reached"""
+    orchestrator = BootOrchestrator(FakeOTAManager(), state_file)
+    orchestrator.mark('first_stats_served')
+    first = orchestrator.get_report()['milestones']['first_stats_served']
+    orchestrator.mark('first_stats_served')
+
+    report = orchestrator.get_report()
+    assert report['milestones']['first_stats_served'] == first
+    assert report['time_to_first_paint'] == first
@@ -0,0 +1,93 @@
+import os
+import subprocess
+
+from build_cache import BuildCache, frontend_key, read_key, requirements_key
+
+GIT_ENV = dict(
+    os.environ,
+    GIT_AUTHOR_NAME='test',
+    GIT_AUTHOR_EMAIL='test@example.com',
+    GIT_COMMITTER_NAME='test',
+    GIT_COMMITTER_EMAIL='test@example.com',
+)
+
+
+def commit(repo, name, content):
+    path = os.path.join(repo, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+    for args in (['add', name], ['commit', '-q', '-m', name]):
+        subprocess.run(['git', *args], cwd=repo, env=GIT_ENV, check=True)
+
+
+def write_build(path, content):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'index.html'), 'w') as f:
+        f.write(content)
+
+
+def test_frontend_key_follows_the_frontend_tree(tmp_path):
+    """Test only frontend/ changes the key, and local edits disable it"""
+    repo = str(tmp_path)
+    subprocess.run(['git', 'init', '-q'], cwd=repo, check=True)
+    commit(repo, 'frontend/src/App.tsx', 'v1')
+    key = frontend_key(repo)
+    assert key
+
+    commit(repo, 'backend/app.py', 'changed')
+    assert frontend_key(repo) == key
+
+    commit(repo, 'frontend/src/App.tsx', 'v2')
+    assert frontend_key(repo) not in (None, key)
+
+    with open(os.path.join(repo, 'frontend/src/App.tsx'), 'w') as f:
+        f.write('uncommitted')
+    assert frontend_key(repo) is None
+
+
+def test_requirements_key_changes_with_the_file(tmp_path):
+    """Test equal requirements share a key"""
+    requirements = tmp_path / 'requirements.txt'
+    requirements.write_text('flask==2.3.3\n')
+    key = requirements_key(str(requirements))
+    assert requirements_key(str(requirements)) == key
+    requirements.write_text('flask==3.0.0\n')
+    assert requirements_key(str(requirements)) != key
+
+
+def test_restore_reuses_a_saved_build(tmp_path):
+    """Test a build saved under a key is restored in place of another"""
+    cache = BuildCache(str(tmp_path / 'cache'))
+    build = str(tmp_path / 'build')
+    assert not cache.restore('frontend', 'aaa', build)
+
+    write_build(build, 'first')
+    cache.save('frontend', 'aaa', build)
+    write_build(build, 'second')
+    cache.save('frontend', 'bbb', build)
+
+    assert cache.restore('frontend', 'aaa', build)
+    assert read_key(build) == 'aaa'
+    with open(os.path.join(build, 'index.html')) as f:
+        assert f.read() == 'first'
+
+
+def test_prune_keeps_the_most_recently_used(tmp_path):
+    """Test old entries are removed but a protected one survives"""
+    cache = BuildCache(str(tmp_path / 'cache'), keep=10)
+    build = str(tmp_path / 'build')
+    for age, key in enumerate(['new', 'mid', 'old', 'oldest']):
+        write_build(build, key)
+        entry = cache.save('frontend', key, build)
+        os.utime(entry, (1000 - age, 1000 - age))
+    cache.keep = 2
+
+    removed = cache.prune('frontend', [cache.path('frontend', 'oldest')])
+
+    assert removed == ['old']
+    assert sorted(os.listdir(tmp_path / 'cache' / 'frontend')) == [
+        'mid',
+        'new',
+        'oldest',
+    ]
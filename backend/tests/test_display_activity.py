@@ -0,0 +1,100 @@
+from display_activity import DisplayActivity, adaptive_interval
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_interval_follows_event_velocity():
+    """Test busy hours refresh sooner and quiet ones later, within bounds"""
+    usual = {'events_24h': 2400, 'events_1h': 100}
+    busy = {'events_24h': 2400, 'events_1h': 300}
+    quiet = {'events_24h': 2400, 'events_1h': 10}
+
+    assert adaptive_interval(30, usual) == 30
+    assert adaptive_interval(30, busy) == 10
+    assert adaptive_interval(30, quiet) == 120
+    assert adaptive_interval(30, {'events_24h': 0, 'events_1h': 0}) == 120
+    assert adaptive_interval(30, busy, minimum=15) == 15
+    assert adaptive_interval(30, None) == 30
+
+
+def test_hidden_display_is_idle_until_it_reports_visible():
+    """Test a hidden report idles the display and only a visible one wakes it"""
+    clock = Clock()
+    activity = DisplayActivity(clock)
+    assert not activity.is_idle()
+
+    assert activity.report(False, 'screensaver') is False
+    assert activity.is_idle()
+    assert activity.get_status()['reason'] == 'screensaver'
+    # Polls while blanked (e.g. by an external DPMS hook) don't wake it
+    assert activity.poll() is False
+    assert activity.is_idle()
+
+    assert activity.report(True) is True
+    assert not activity.is_idle()
+    assert activity.get_status()['wakes'] == 1
+
+
+def test_display_that_stops_polling_goes_idle():
+    """Test a display missing its polls is idle until the next one"""
+    clock = Clock()
+    activity = DisplayActivity(clock)
+    activity.set_interval(60)
+    activity.poll()
+
+    clock.now += 170
+    assert not activity.is_idle()
+    clock.now += 20
+    assert activity.is_idle()
+    assert activity.get_status()['reason'] == 'absent'
+
+    assert activity.poll() is True
+    assert not activity.is_idle()
+
+
+def test_screen_is_idle_only_once_every_display_is():
+    """Test one display hiding leaves the screen active while another watches"""
+    clock = Clock()
+    activity = DisplayActivity(clock)
+    activity.set_interval(60)
+    activity.poll('kiosk')
+    activity.poll('laptop')
+
+    assert activity.report(False, 'screensaver', 'kiosk') is False
+    assert not activity.is_idle()
+    assert activity.get_status()['watching'] == 1
+
+    # The laptop is closed, so nothing is watching any more
+    clock.now += 190
+    assert activity.is_idle()
+    assert activity.get_status()['reason'] == 'screensaver'
+    assert activity.get_status()['displays'] == 2
+
+    assert activity.poll('laptop') is True
+    assert not activity.is_idle()
+    # Still hidden, so its polls alone would not have woken the screen
+    assert activity.poll('kiosk') is False
+    assert activity.get_status()['watching'] == 1
+
+
+def test_report_from_an_address_covers_its_displays():
+    """Test a hook reporting without a display id hides the tabs at its address"""
+    activity = DisplayActivity(Clock())
+    activity.poll('127.0.0.1/kiosk')
+    activity.poll('10.0.0.5/laptop')
+
+    activity.report(False, 'display_off', '127.0.0.1')
+    status = activity.get_status()
+    assert status['displays'] == 2
+    assert status['watching'] == 1
+
+    activity.report(False, 'hidden', '10.0.0.5/laptop')
+    assert activity.is_idle()
+    assert activity.report(True, None, '127.0.0.1') is True
+    assert activity.get_status()['watching'] == 1
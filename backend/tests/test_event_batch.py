@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+from benchmarks.posthog_stub import EventStream
+from event_batch import EventBatch
+from stats_engine import compute_stats
+
+NOW = datetime(2024, 1, 20, 12, 30, tzinfo=timezone.utc)
+
+
+def test_batch_interns_strings_and_drops_unused_fields():
+    """Test repeated values share one table entry and extra properties are dropped"""
+    events = [
+        {
+            'id': str(i),
+            'event': '$pageview',
+            'distinct_id': f'user-{i % 2}',
+            'timestamp': '2024-01-20T12:00:00Z',
+            'properties': {
+                '$current_url': 'https://example.com/docs?page=1',
+                '$session_id': 's1' if i else '',
+                '$browser': 'Firefox',
+            },
+        }
+        for i in range(5)
+    ]
+    batch = EventBatch.from_events(events)
+
+    assert len(batch) == 5
+    assert batch.tables['event'].values == [None, '$pageview']
+    assert batch.tables['page'].values == [None, 'https://example.com/docs']
+    assert batch.distinct('distinct_id') == 2
+    assert batch.distinct('session_id', skip_empty=True) == 1
+    assert batch.count('event', '$pageview') == 5
+    assert batch.count('event', 'missing') == 0
+    assert (
+        batch.timestamps[0]
+        == datetime(2024, 1, 20, 12, tzinfo=timezone.utc).timestamp()
+    )
+    assert len(batch.recent) == 5
+
+
+def test_stats_from_batch_match_stats_from_dicts():
+    """Test compute_stats gives the same answer for a batch built page by page"""
+    stream = EventStream(total_events=2500, users=50, now=NOW)
+    events = stream.events(0, 2500)
+    batch = EventBatch()
+    for start in range(0, 2500, 1000):
+        batch.extend(events[start : start + 1000])
+
+    assert compute_stats(batch, now=NOW) == compute_stats(events, now=NOW)
+    assert compute_stats(batch, now=NOW)['recent_events'] == events[:10]
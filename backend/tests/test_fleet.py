@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+
+import pytest
+import requests
+from benchmarks.load_test import BACKEND_DIR, free_port, wait_until_ready
+from benchmarks.posthog_stub import EventStream, PostHogStub
+from fleet import FleetHub, get_fleet_settings
+
+
+def test_fleet_settings_env_overrides_config(monkeypatch):
+    """Test env vars override the fleet config and bad modes fall back"""
+    monkeypatch.delenv('DASHBOARD_FLEET_MODE', raising=False)
+    monkeypatch.delenv('DASHBOARD_HUB_URL', raising=False)
+    assert get_fleet_settings({'mode': 'mesh'})['mode'] == 'standalone'
+
+    monkeypatch.setenv('DASHBOARD_FLEET_MODE', 'leaf')
+    monkeypatch.setenv('DASHBOARD_HUB_URL', 'http://hub.local:5000/')
+    settings = get_fleet_settings({'mode': 'hub', 'hub_url': 'http://other'})
+    assert settings['mode'] == 'leaf'
+    assert settings['hub_url'] == 'http://hub.local:5000'
+
+
+def test_hub_tracks_subscribers():
+    """Test the hub counts polls per leaf device"""
+    hub = FleetHub()
+    hub.record_subscriber('kitchen', '10.0.0.2')
+    hub.record_subscriber('kitchen', '10.0.0.2')
+    hub.record_subscriber('lobby', '10.0.0.3')
+
+    subscribers = hub.get_subscribers()
+    assert [s['device'] for s in subscribers] == ['kitchen', 'lobby']
+    assert subscribers[0]['polls'] == 2
+
+
+@pytest.fixture
+def stub():
+    stub = PostHogStub(EventStream(total_events=500, users=25)).start()
+    yield stub
+    stub.stop()
+
+
+def start_app(stub_url, **env):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.load_test', '--serve',
+         '--stub-url', stub_url, '--port', str(port)],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, **env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_ready(url)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process, url
+
+
+def test_leaf_follows_hub_across_processes(stub):
+    """Test a leaf process serves the hub's snapshot without calling PostHog"""
+    hub, hub_url = start_app(stub.url, DASHBOARD_FLEET_MODE='hub', STATS_CACHE_TTL='30')
+    leaf = None
+    try:
+        leaf, leaf_url = start_app(
+            'http://127.0.0.1:9',
+            DASHBOARD_FLEET_MODE='leaf',
+            DASHBOARD_HUB_URL=hub_url,
+            STATS_CACHE_TTL='0',
+        )
+        hub_stats = requests.get(f'{hub_url}/api/stats').json()
+        leaf_stats = [requests.get(f'{leaf_url}/api/stats').json() for _ in range(3)]
+
+        assert all(stats == hub_stats for stats in leaf_stats)
+        # The hub may also backfill its weekly rollups with a 'before' query
+        assert len([q for q in stub.queries if 'before' not in q]) == 1
+
+        leaf_status = requests.get(f'{leaf_url}/api/fleet/status').json()
+        assert leaf_status['mode'] == 'leaf'
+        assert leaf_status['not_modified'] >= 2
+        hub_status = requests.get(f'{hub_url}/api/fleet/status').json()
+        assert hub_status['subscribers'][0]['polls'] == 3
+
+        # Without the hub the leaf keeps showing its last snapshot
+        hub.terminate()
+        hub.wait()
+        stale = requests.get(f'{leaf_url}/api/stats').json()
+        assert stale['stale'] is True
+        assert stale['events_24h'] == hub_stats['events_24h']
+    finally:
+        for process in (hub, leaf):
+            if process is not None:
+                process.terminate()
+                process.wait()
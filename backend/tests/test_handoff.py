@@ -0,0 +1,116 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import requests
+from benchmarks.load_test import BACKEND_DIR, free_port, wait_until_ready
+
+APP = '''
+import os
+import sys
+
+sys.path.insert(0, {backend!r})
+from flask import Flask, jsonify
+from handoff import HandoffServer
+
+app = Flask(__name__)
+server = HandoffServer(app, "127.0.0.1", {port}, ready_timeout=20, drain_timeout=5)
+
+
+@app.route("/api/health")
+def health():
+    return jsonify({{"release": {release!r}, "pid": os.getpid()}})
+
+
+@app.route("/hand-over/<name>", methods=["POST"])
+def hand_over(name):
+    return jsonify(server.hand_over(os.path.join({root!r}, name)))
+
+
+server.serve_forever()
+'''
+
+
+def write_release(root, name, port, broken=False):
+    os.makedirs(os.path.join(root, name))
+    source = APP.format(backend=BACKEND_DIR, port=port, release=name, root=root)
+    if broken:
+        source = 'raise SystemExit(1)\n'
+    with open(os.path.join(root, name, 'app.py'), 'w') as f:
+        f.write(source)
+
+
+@pytest.fixture
+def serving(tmp_path):
+    """The 'blue' release serving on a free port, plus its url and root"""
+    root, port = str(tmp_path), free_port()
+    write_release(root, 'blue', port)
+    process = subprocess.Popen(
+        [sys.executable, 'app.py'],
+        cwd=os.path.join(root, 'blue'),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    pids = [process.pid]
+    try:
+        wait_until_ready(url)
+        yield root, port, url, pids, process
+    finally:
+        process.kill()
+        process.wait()
+        for pid in pids[1:]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def test_handover_serves_every_request(serving):
+    """Test traffic moves to the new release without a failed request"""
+    root, port, url, pids, blue = serving
+    write_release(root, 'green', port)
+    releases, errors, stop = [], [], threading.Event()
+
+    def poll():
+        with requests.Session() as session:
+            while not stop.is_set():
+                try:
+                    releases.append(session.get(f'{url}/api/health').json()['release'])
+                except requests.RequestException as e:
+                    errors.append(e)
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    try:
+        result = requests.post(f'{url}/hand-over/green', timeout=30).json()
+        assert result['success'], result
+        pids.append(result['pid'])
+        deadline = time.monotonic() + 10
+        while releases.count('green') < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        poller.join()
+
+    assert errors == []
+    assert releases[0] == 'blue' and releases[-1] == 'green'
+    # The old server exits once its requests have drained
+    assert blue.wait(timeout=10) == 0
+    assert requests.get(f'{url}/api/health').json()['pid'] == result['pid']
+
+
+def test_failed_handover_keeps_serving(serving):
+    """Test a release that never becomes ready leaves the old one in place"""
+    root, port, url, pids, _ = serving
+    write_release(root, 'broken', port, broken=True)
+    before = requests.get(f'{url}/api/health').json()
+
+    result = requests.post(f'{url}/hand-over/broken', timeout=30).json()
+
+    assert not result['success']
+    assert requests.get(f'{url}/api/health').json() == before
@@ -0,0 +1,52 @@
+from health import HealthMonitor, percentile
+
+
+def make_monitor(tmp_path, **kwargs):
+    return HealthMonitor({'data': str(tmp_path)}, **kwargs)
+
+
+def test_percentile_nearest_rank():
+    """Test p50/p99 over a small window"""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+def test_ready_with_fresh_snapshot(tmp_path):
+    """Test a fresh snapshot with a healthy upstream is ready"""
+    monitor = make_monitor(tmp_path, min_disk_free=0)
+    monitor.record_upstream(0.2, True)
+
+    report = monitor.readiness(True, 5, 90, None)
+    assert report['status'] == 'ready'
+    assert report['upstream']['latency']['p50_ms'] == 200.0
+    assert report['upstream']['last_success_at'] is not None
+    assert report['disk']['data']['free_bytes'] > 0
+    assert report['ota'] == {'running': False, 'operation': None}
+
+
+def test_degraded_when_stale_and_failing(tmp_path):
+    """Test stale data and upstream failures degrade readiness"""
+    monitor = make_monitor(tmp_path, min_disk_free=0)
+    monitor.record_upstream(1.5, False, 'PostHog API error: 500')
+
+    report = monitor.readiness(True, 600, 90, {'name': 'pull_updates'})
+    assert report['status'] == 'degraded'
+    assert report['upstream']['consecutive_failures'] == 1
+    assert any('stale' in reason for reason in report['reasons'])
+    assert report['ota']['running'] is True
+
+
+def test_unavailable_without_credentials(tmp_path):
+    """Test missing credentials make the device unavailable"""
+    report = make_monitor(tmp_path).readiness(False, None, 90, None)
+    assert report['status'] == 'unavailable'
+
+
+def test_low_disk_degrades(tmp_path):
+    """Test free space below the threshold is reported"""
+    monitor = make_monitor(tmp_path, min_disk_free=1 << 62)
+    report = monitor.readiness(True, 5, 90, None)
+    assert report['status'] == 'degraded'
+    assert 'Low disk space for data' in report['reasons']
@@ -0,0 +1,118 @@
+import random
+from collections import Counter
+
+from event_batch import EventBatch
+from heavy_hitters import CountMinSketch, SlidingTopK, SpaceSaving, TopK
+from stats_engine import ProjectTopK, compute_stats, merge_top_lists
+
+
+def zipf_stream(n, distinct, seed):
+    rng = random.Random(seed)
+    return [f'item-{int(distinct * rng.random() ** 3)}' for _ in range(n)]
+
+
+def test_count_min_never_undercounts():
+    """Test Count-Min estimates are upper bounds of the true counts"""
+    stream = zipf_stream(20000, 5000, seed=1)
+    sketch = CountMinSketch(width=512, depth=4)
+    for item in stream:
+        sketch.add(item)
+
+    for item, count in Counter(stream).items():
+        assert sketch.estimate(item) >= count
+
+
+def test_space_saving_finds_heavy_hitters_in_bounded_memory():
+    """Test every item above N/capacity is tracked with bounded error"""
+    stream = zipf_stream(50000, 10000, seed=2)
+    summary = SpaceSaving(capacity=50)
+    for item in stream:
+        summary.add(item)
+
+    assert len(summary.counts) == 50
+    exact = Counter(stream)
+    for item, count in exact.items():
+        if count > len(stream) / 50:
+            assert item in summary.counts
+    for item, estimate in summary.counts.items():
+        assert estimate - summary.errors[item] <= exact[item] <= estimate
+
+
+def test_merged_top_k_matches_single_stream():
+    """Test merging two partial sketches finds the same top items as one pass"""
+    left, right = zipf_stream(20000, 3000, seed=3), zipf_stream(20000, 3000, seed=4)
+    first, second = TopK(capacity=256), TopK(capacity=256)
+    for item in left:
+        first.add(item)
+    for item in right:
+        second.add(item)
+    first.merge(second)
+
+    exact = Counter(left + right)
+    top = first.top(3)
+    assert [entry['value'] for entry in top] == [i for i, _ in exact.most_common(3)]
+    for entry in top:
+        assert entry['count'] >= exact[entry['value']]
+
+
+def test_compute_stats_reports_top_lists():
+    """Test stats include top events, pages and referrers"""
+    events = [
+        {'event': '$pageview', 'timestamp': '2024-01-20T12:00:00Z', 'properties': {
+            '$current_url': 'https://x.io/pricing?utm=1', '$referrer': '$direct'}},
+        {'event': '$pageview', 'timestamp': '2024-01-20T11:59:00Z', 'properties': {
+            '$current_url': 'https://x.io/pricing#faq', '$referrer': 'https://google.com/'}},
+        {'event': 'signed_up', 'timestamp': '2024-01-20T11:00:00Z', 'properties': {
+            '$current_url': 'https://x.io/signup', '$referrer': '$direct'}},
+    ]
+    top_k = ProjectTopK()
+    stats = compute_stats(events, top_k=top_k)
+
+    assert stats['top_event_24h'] == '$pageview'
+    assert stats['top_pages_24h'][0] == {'value': 'https://x.io/pricing', 'count': 2}
+    assert stats['top_referrer_24h'] == '$direct'
+    hours = set(top_k.sketches['events'].buckets)
+    assert hours == {'2024-01-20T12', '2024-01-20T11'}
+
+    combined = merge_top_lists({'a': stats, 'b': stats})
+    assert combined['top_events_24h'][0] == {'value': '$pageview', 'count': 4}
+
+
+def test_sliding_top_k_expires_hours_from_its_window():
+    """Test expired hours leave both the candidates and the window sketch"""
+    sliding = SlidingTopK()
+    sliding.update('2024-01-20T10', {'/old': 50})
+    sliding.update('2024-01-20T11', {'/a': 5, '/b': 3})
+    sliding.update('2024-01-20T12', {'/b': 4})
+    assert sliding.top(1) == [{'value': '/old', 'count': 50}]
+
+    sliding.prune('2024-01-20T11')
+    assert sliding.top(2) == [{'value': '/b', 'count': 7}, {'value': '/a', 'count': 5}]
+    assert sliding.window.estimate('/old') == 0
+
+
+def test_project_top_k_counts_each_event_once():
+    """Test overlapping refreshes only count the events not seen before"""
+
+    def pageview(minute, url):
+        return {
+            'id': f'{minute}-{url}',
+            'event': '$pageview',
+            'timestamp': f'2024-01-20T12:{minute:02d}:00Z',
+            'properties': {'$current_url': url},
+        }
+
+    first = [pageview(5, '/a'), pageview(5, '/b'), pageview(1, '/a')]
+    second = [pageview(9, '/b'), pageview(9, '/b2')] + first
+
+    top_k = ProjectTopK()
+    assert top_k.ingest(EventBatch.from_events(first)) == 3
+    assert top_k.ingest(EventBatch.from_events(second)) == 2
+    assert top_k.top()['pages'] == [
+        {'value': '/a', 'count': 2},
+        {'value': '/b', 'count': 2},
+        {'value': '/b2', 'count': 1},
+    ]
+    assert compute_stats(second, top_k=ProjectTopK())['top_pages_24h'] == (
+        top_k.top()['pages']
+    )
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timezone
+
+from benchmarks.posthog_stub import EventStream, PostHogStub
+from history_backfill import HOUR, HistoryBackfill
+from posthog_client import PostHogClient
+from stats_history import StatsHistory
+
+NOW = datetime(2024, 3, 10, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+def make_backfill(tmp_path, stub, days=1, **kwargs):
+    history = StatsHistory(str(tmp_path / 'history.json'))
+    client = PostHogClient(stub.url, 'key', '1', page_size=1000)
+    backfill = HistoryBackfill(
+        str(tmp_path / 'checkpoint.json'), history, lambda: {'1': client},
+        days=days, **kwargs
+    )
+    backfill.plan(NOW)
+    return backfill, history
+
+
+def test_backfill_writes_hourly_window_points(tmp_path):
+    """Test each backfilled hour records the trailing 24h metrics"""
+    stream = EventStream(
+        total_events=4800, users=50, window_hours=48,
+        now=datetime.fromtimestamp(NOW, timezone.utc),
+    )
+    stub = PostHogStub(stream).start()
+    try:
+        backfill, history = make_backfill(tmp_path, stub)
+        while backfill.step():
+            pass
+    finally:
+        stub.stop()
+
+    assert backfill.get_status()['progress'] == 1.0
+    points = history.query('events_24h', 86400, 24, now=NOW + 1)['points']
+    values = [value for _, value in points if value is not None]
+    # 48 hours hold 4800 evenly spread events, so every 24h window has ~2400
+    assert len(values) == 24
+    assert all(2300 <= value <= 2500 for value in values)
+    # 24 hours to fill the window, then one point per hour of the range
+    assert len(stub.queries) == 48
+    assert all('before' in query for query in stub.queries)
+
+
+def test_backfill_resumes_from_checkpoint(tmp_path):
+    """Test a restarted worker continues at the saved watermark"""
+    stream = EventStream(
+        total_events=480, users=10, window_hours=48,
+        now=datetime.fromtimestamp(NOW, timezone.utc),
+    )
+    stub = PostHogStub(stream).start()
+    try:
+        first, _ = make_backfill(tmp_path, stub)
+        for _ in range(30):
+            first.step()
+        # As a stopped worker does on its way out
+        first.save_checkpoint()
+        cursor = first.get_status()['cursor']
+
+        resumed, history = make_backfill(tmp_path, stub)
+        assert resumed.get_status()['cursor'] == cursor
+        steps = 0
+        while resumed.step():
+            steps += 1
+    finally:
+        stub.stop()
+
+    # The window's 24 hours are refetched before new points are written
+    assert steps == 48 - 30 + 24
+    assert len(stub.queries) == 48 + 24
+    # The window was rebuilt, so the first resumed point is already full
+    points = history.query('events_24h', 18 * HOUR, 18, now=NOW + 1)['points']
+    values = [value for _, value in points if value is not None]
+    assert len(values) == 18
+    assert all(200 <= value <= 280 for value in values)
+
+
+def test_backfill_checkpoints_every_few_hours(tmp_path):
+    """Test the checkpoint is written per batch of hours and at completion"""
+    stream = EventStream(
+        total_events=480, users=10, window_hours=48,
+        now=datetime.fromtimestamp(NOW, timezone.utc),
+    )
+    stub = PostHogStub(stream).start()
+    checkpoint = tmp_path / 'checkpoint.json'
+    try:
+        backfill, _ = make_backfill(tmp_path, stub, checkpoint_hours=10)
+        for _ in range(9):
+            backfill.step()
+        assert not checkpoint.exists()
+        backfill.step()
+        assert json.loads(checkpoint.read_text())['cursor'] == NOW - 86400 - 14 * HOUR
+        while backfill.step():
+            pass
+    finally:
+        stub.stop()
+
+    saved = json.loads(checkpoint.read_text())
+    assert saved['cursor'] == NOW
+    # Only the watermark is kept, not the window's user and session ids
+    assert 'window' not in saved
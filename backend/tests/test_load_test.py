@@ -0,0 +1,39 @@
+import subprocess
+
+from benchmarks.load_test import FAKE_GIT, compare, summarize
+
+
+def test_summarize_reports_tail_latency_and_errors():
+    """Test per-route summary percentiles, throughput and error rate"""
+    samples = [(i / 1000, i % 10 != 0) for i in range(1, 101)]
+    result = summarize(samples, elapsed=10)
+
+    assert result['requests'] == 100
+    assert result['errors'] == 10
+    assert result['error_rate'] == 0.1
+    assert result['throughput_rps'] == 10.0
+    assert result['latency_ms']['p50'] == 50.0
+    assert result['latency_ms']['p99'] == 99.0
+    assert result['latency_ms']['max'] == 100.0
+
+
+def test_compare_shows_change_per_route():
+    """Test comparing two reports lists throughput and p95 deltas"""
+    before = summarize([(0.1, True)] * 10, elapsed=1)
+    after = summarize([(0.05, True)] * 20, elapsed=1)
+    text = compare(
+        {'routes': {'/api/stats': after}, 'total': after},
+        {'routes': {'/api/stats': before}, 'total': before},
+    )
+
+    assert '/api/stats: rps 10.0 -> 20.0 (+100%)' in text
+    assert 'p95 100.0 -> 50.0 (-50%)' in text
+
+
+def test_fake_git_answers_ota_status_commands():
+    """Test the fake git returns canned branch output without a repository"""
+    result = subprocess.run(
+        [FAKE_GIT, 'branch', '-r'], capture_output=True, text=True, cwd='/'
+    )
+    assert result.returncode == 0
+    assert 'origin/main' in result.stdout
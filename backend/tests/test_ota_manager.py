@@ -0,0 +1,255 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from build_cache import BuildCache, requirements_key
+from config_manager import ConfigManager
+from ota_manager import OTAManager
+from release_manager import ReleaseManager
+
+GIT_ENV = dict(
+    os.environ,
+    GIT_AUTHOR_NAME='test',
+    GIT_AUTHOR_EMAIL='test@example.com',
+    GIT_COMMITTER_NAME='test',
+    GIT_COMMITTER_EMAIL='test@example.com',
+)
+
+
+def git(cwd, *args):
+    return subprocess.run(
+        ['git', *args], cwd=cwd, env=GIT_ENV, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit(repo, name, content):
+    with open(os.path.join(repo, name), 'w') as f:
+        f.write(content)
+    git(repo, 'add', name)
+    git(repo, 'commit', '-q', '-m', name)
+
+
+@pytest.fixture
+def repos(tmp_path):
+    """An upstream with main and dev, and a device clone of it"""
+    upstream = str(tmp_path / 'upstream')
+    os.makedirs(upstream)
+    git(upstream, 'init', '-q', '-b', 'main')
+    commit(upstream, 'a.txt', 'a')
+    git(upstream, 'branch', 'dev')
+    device = str(tmp_path / 'device')
+    git(str(tmp_path), 'clone', '-q', upstream, device)
+    return upstream, device
+
+
+@pytest.fixture
+def ota(repos, tmp_path):
+    manager = OTAManager(ConfigManager(str(tmp_path / 'device_config.json')))
+    manager.repo_path = repos[1]
+    return manager
+
+
+def test_fetch_transfers_only_the_target_branch(repos, ota):
+    """Test other branches are left alone and bytes and time are recorded"""
+    upstream, device = repos
+    commit(upstream, 'b.txt', os.urandom(4096).hex())
+    git(upstream, 'checkout', '-q', 'dev')
+    commit(upstream, 'c.txt', 'dev only')
+    dev_before = git(device, 'rev-parse', 'origin/dev')
+
+    result = ota.fetch_branch('main')
+
+    assert result['success'] and not result['skipped']
+    assert result['bytes'] > 4096
+    assert result['seconds'] >= 0
+    assert git(device, 'rev-parse', 'origin/main') == git(upstream, 'rev-parse', 'main')
+    assert git(device, 'rev-parse', 'origin/dev') == dev_before
+    assert ota.get_status()['recent_fetches'][0]['branch'] == 'main'
+
+
+def test_fetch_is_reused_within_the_freshness_window(repos, ota):
+    """Test a second fetch moments later is skipped unless forced"""
+    assert not ota.fetch_branch('main')['skipped']
+    assert ota.fetch_branch('main')['skipped']
+    assert not ota.fetch_branch('main', force=True)['skipped']
+
+    ota.config_manager.update_section('ota', {'fetch_max_age': 0})
+    assert not ota.fetch_branch('main')['skipped']
+
+
+def test_fetch_refuses_option_like_branch_names(ota):
+    """Test a branch name cannot smuggle options into git"""
+    result = ota.fetch_branch('--upload-pack=touch /tmp/x')
+    assert not result['success']
+    assert ota.get_recent_fetches() == []
+
+
+def test_update_fast_forwards_after_a_single_fetch(repos, ota):
+    """Test check then pull fetches once and lands on the upstream commit"""
+    upstream, device = repos
+    commit(upstream, 'b.txt', 'b')
+
+    check = ota.check_for_updates()
+    assert check['updates_available'] and check['commits_behind'] == 1
+
+    result = ota.pull_updates()
+    assert result['success'], result
+    assert git(device, 'rev-parse', 'HEAD') == git(upstream, 'rev-parse', 'main')
+    assert len(ota.get_recent_fetches()) == 1
+
+
+HEALTH_APP = '''
+from flask import Flask
+
+app = Flask(__name__)
+
+
+@app.route("/api/health")
+def health():
+    return "ok"
+'''
+
+
+@pytest.fixture
+def releases(repos, ota):
+    """The device in worktree apply mode, with a recorded stand-in handover"""
+    upstream, device = repos
+    os.makedirs(os.path.join(upstream, 'backend'))
+    commit(upstream, 'backend/app.py', HEALTH_APP)
+    git(device, 'pull', '-q')
+    commit(upstream, 'b.txt', 'b')
+
+    handovers = []
+
+    def hand_over(backend_dir, env, python):
+        handovers.append((backend_dir, env, python))
+        return {'success': True, 'pid': 1234, 'seconds': 0.1}
+
+    ota.config_manager.update_section('ota', {'apply_mode': 'worktree'})
+    ota.release_manager = ReleaseManager(ota, hand_over=hand_over)
+    return ota.release_manager, handovers
+
+
+def test_worktree_update_leaves_the_live_checkout_alone(repos, ota, releases):
+    """Test an update is built beside the live tree and switched by symlink"""
+    upstream, device = repos
+    manager, handovers = releases
+    live_head = git(device, 'rev-parse', 'HEAD')
+
+    result = ota.pull_updates()
+
+    assert result['success'], result
+    assert git(device, 'rev-parse', 'HEAD') == live_head
+    current = os.path.join(device, 'releases', 'current')
+    assert git(current, 'rev-parse', 'HEAD') == git(upstream, 'rev-parse', 'main')
+    assert os.path.realpath(os.path.join(device, 'releases', 'previous')) == device
+    backend_dir, env, python = handovers[0]
+    assert backend_dir == os.path.join(os.path.realpath(current), 'backend')
+    assert env['DASHBOARD_CONFIG_FILE'] == ota.config_manager.config_file
+    assert python == sys.executable
+    assert manager.get_status()['releases'] == [os.path.basename(result['release'])]
+
+
+def test_failed_handover_keeps_the_serving_release(repos, ota, releases):
+    """Test the links go back when the new release never takes traffic"""
+    manager, _ = releases
+    manager.hand_over = lambda backend_dir, env, python: {
+        'success': False,
+        'error': 'boom',
+    }
+
+    result = ota.pull_updates()
+
+    assert not result['success'] and result['rollback']
+    assert manager.get_status()['current'] == repos[1]
+
+
+def test_broken_release_is_never_switched_to(repos, ota, releases):
+    """Test a release that fails validation is removed before any switch"""
+    upstream, device = repos
+    manager, handovers = releases
+    commit(upstream, 'backend/app.py', 'raise SystemExit("broken")\n')
+
+    result = ota.pull_updates()
+
+    assert not result['success'] and 'broken' in result['error']
+    assert handovers == [] and manager.list_releases() == []
+    assert manager.get_status()['current'] is None
+
+
+def test_release_runs_from_the_cached_virtualenv(repos, ota, releases, tmp_path):
+    """Test a release uses the venv cached for its requirements, not this one"""
+    upstream, device = repos
+    manager, handovers = releases
+    manager.build_cache = BuildCache(str(tmp_path / 'cache'))
+    requirements = str(tmp_path / 'requirements.txt')
+    with open(requirements, 'w') as f:
+        f.write('flask\n')
+    commit(upstream, 'backend/requirements.txt', 'flask\n')
+    # Stands in for a venv run.py built earlier for the same requirements
+    cached = manager.build_cache.path('venvs', requirements_key(requirements))
+    os.makedirs(os.path.join(cached, 'bin'))
+    python = os.path.join(cached, 'bin', 'python3')
+    with open(python, 'w') as f:
+        f.write(f'#!/bin/sh\nexec {sys.executable} "$@"\n')
+    os.chmod(python, 0o755)
+    manager.build_cache.mark_complete('venvs', cached)
+
+    result = ota.pull_updates()
+
+    assert result['success'], result
+    release_python = os.path.join(result['release'], 'backend/venv/bin/python3')
+    assert handovers[0][2] == release_python
+    assert os.path.realpath(release_python) == python
+
+
+def add_backup_tags(repo, names):
+    """Create many tags with a single git call"""
+    head = git(repo, 'rev-parse', 'HEAD')
+    subprocess.run(
+        ['git', 'update-ref', '--stdin'],
+        cwd=repo,
+        input=''.join(f'create refs/tags/{name} {head}\n' for name in names),
+        text=True,
+        check=True,
+    )
+
+
+def test_backups_are_pruned_and_packed(repos, ota):
+    """Test retention keeps the newest backups and leaves no loose tag refs"""
+    device = repos[1]
+    add_backup_tags(device, [f'backup-2024{m:02d}01-120000' for m in range(1, 13)])
+    ota.config_manager.update_section(
+        'ota', {'backup_keep': 5, 'backup_max_age_days': 0}
+    )
+
+    result = ota.create_backup()
+
+    assert result['success'] and len(result['pruned']) == 8
+    backups = ota.get_backups()
+    assert backups[0] == result['backup_tag']
+    assert backups[1:] == [f'backup-2024{m:02d}01-120000' for m in (12, 11, 10, 9)]
+    assert git(device, 'tag', '-l', 'backup-*').split() == sorted(backups)
+    assert os.listdir(os.path.join(device, '.git', 'refs', 'tags')) == []
+
+
+def test_backup_age_limit_keeps_the_newest(repos, ota):
+    """Test old backups expire by age, except the most recent one"""
+    add_backup_tags(repos[1], ['backup-20200101-000000', 'backup-20210101-000000'])
+    ota.config_manager.update_section('ota', {'backup_max_age_days': 30})
+
+    assert ota.prune_backups()['deleted'] == ['backup-20200101-000000']
+    assert ota.get_backups() == ['backup-20210101-000000']
+
+
+def test_backup_index_is_served_from_memory(repos, ota):
+    """Test listing backups again needs no git call and carries commit details"""
+    add_backup_tags(repos[1], ['backup-20240101-120000'])
+    first = ota.get_backup_index()
+    ota.git_command = 'false'
+
+    assert ota.get_backup_index() == first
+    assert first[0]['commit'] == git(repos[1], 'rev-parse', 'HEAD')[:8]
+    assert first[0]['subject'] == 'a.txt'
+    assert first[0]['created_at'] == '2024-01-01T12:00:00'
@@ -0,0 +1,66 @@
+import json
+import tracemalloc
+
+import pytest
+from benchmarks.posthog_stub import EventStream
+from page_stream import EventPageParser
+
+
+def page_body(size, **fields):
+    events = EventStream(total_events=size, users=20).events(0, size)
+    events[0]['properties']['$current_url'] = 'https://example.com/café?x=1'
+    return events, json.dumps(dict(fields, results=events), ensure_ascii=False).encode()
+
+
+def parse(body, chunk_size):
+    parser = EventPageParser()
+    events = []
+    for start in range(0, len(body), chunk_size):
+        events.extend(parser.feed(body[start : start + chunk_size]))
+    events.extend(parser.finish())
+    return parser, events
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 64, 65536])
+def test_parser_handles_any_chunk_boundary(chunk_size):
+    """Test results and top-level fields survive splits mid-token and mid-character"""
+    original, body = page_body(50, count=123456, next='https://ph/next?offset=50')
+    parser, events = parse(body, chunk_size)
+
+    assert parser.fields == {'count': 123456, 'next': 'https://ph/next?offset=50'}
+    assert [e['id'] for e in events] == [e['id'] for e in original]
+    assert events[0]['properties']['$current_url'].endswith('café?x=1')
+
+
+def test_parser_keeps_only_metric_fields():
+    """Test everything the metrics don't read is dropped from each event"""
+    _, body = page_body(1)
+    _, events = parse(body, 65536)
+
+    assert set(events[0]) == {'id', 'event', 'distinct_id', 'timestamp', 'properties'}
+    assert set(events[0]['properties']) == {'$session_id', '$current_url', '$referrer'}
+
+
+def test_truncated_page_raises():
+    """Test a body cut off mid-results is an error, not a short page"""
+    _, body = page_body(10, next=None)
+    parser = EventPageParser()
+    parser.feed(body[: len(body) // 2])
+    with pytest.raises(ValueError):
+        parser.finish()
+
+
+def test_parse_peak_does_not_grow_with_page_size():
+    """Test streaming a 10x larger page needs about the same working memory"""
+    peaks = []
+    for size in (500, 5000):
+        _, body = page_body(size, next=None)
+        parser = EventPageParser()
+        tracemalloc.start()
+        for start in range(0, len(body), 65536):
+            parser.feed(body[start : start + 65536])
+        parser.finish()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    assert peaks[1] < peaks[0] * 2
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+from pipeline import prefetch
+
+
+def slow_source(items, delay, produced=None):
+    for item in items:
+        time.sleep(delay)
+        if produced is not None:
+            produced.append(item)
+        yield item
+
+
+def test_prefetch_overlaps_producer_and_consumer():
+    """Test total time tracks the slower side rather than the sum of both"""
+    started = time.perf_counter()
+    results = []
+    for item in prefetch(slow_source(range(10), 0.03), depth=2):
+        time.sleep(0.03)
+        results.append(item)
+    elapsed = time.perf_counter() - started
+
+    assert results == list(range(10))
+    # Sequential would take ~0.6s
+    assert elapsed < 0.48
+
+
+def test_prefetch_applies_back_pressure():
+    """Test the producer runs at most depth items ahead of the consumer"""
+    produced = []
+    items = prefetch(slow_source(range(100), 0, produced), depth=3)
+    assert next(items) == 0
+    time.sleep(0.2)
+
+    # One handed out, three queued and one held by the blocked producer
+    assert len(produced) <= 5
+    items.close()
+
+
+def test_prefetch_reraises_producer_errors():
+    """Test an upstream failure surfaces in the consumer after earlier items"""
+
+    def failing():
+        yield 1
+        raise RuntimeError('upstream down')
+
+    items = prefetch(failing(), depth=2)
+    assert next(items) == 1
+    with pytest.raises(RuntimeError, match='upstream down'):
+        next(items)
+
+
+def test_prefetch_stops_producer_when_consumer_stops():
+    """Test abandoning the iteration retires the background thread"""
+    items = prefetch(slow_source(range(1000), 0), depth=1)
+    next(items)
+    items.close()
+    time.sleep(0.3)
+
+    assert not [t for t in threading.enumerate() if t.name == 'prefetch']
+
+
+def test_depth_zero_runs_inline():
+    """Test depth 0 iterates in the caller's thread"""
+    threads = []
+
+    def source():
+        threads.append(threading.current_thread())
+        yield 1
+
+    assert list(prefetch(source(), depth=0)) == [1]
+    assert threads == [threading.current_thread()]
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from benchmarks.posthog_stub import EventStream, PostHogStub
+from posthog_client import PostHogClient, PostHogError
+from stats_engine import compute_stats
+
+
+@pytest.fixture
+def stub():
+    stub = PostHogStub(EventStream(total_events=2500, users=40), max_page_size=1000)
+    stub.start()
+    yield stub
+    stub.stop()
+
+
+def last_24h():
+    return (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+
+
+def test_follows_pagination(stub):
+    """Test every page is fetched via the 'next' links"""
+    client = PostHogClient(stub.url, 'key', '1', page_size=1000)
+    pages = list(client.iter_event_pages(last_24h()))
+
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    assert stub.requests_served == 3
+    ids = [event['id'] for page in pages for event in page]
+    assert len(set(ids)) == 2500
+
+
+def test_max_pages_caps_fetch(stub):
+    """Test max_pages stops pagination early"""
+    client = PostHogClient(stub.url, 'key', '1', page_size=1000, max_pages=1)
+    assert sum(len(page) for page in client.iter_event_pages(last_24h())) == 1000
+
+
+def test_before_and_after_partition_the_stream(stub):
+    """Test adjacent time chunks neither overlap nor drop events"""
+    client = PostHogClient(stub.url, 'key', '1', page_size=1000)
+    middle = (datetime.now(timezone.utc) - timedelta(hours=12)).isoformat()
+
+    newer = [e['id'] for p in client.iter_event_pages(middle) for e in p]
+    older = [e['id'] for p in client.iter_event_pages(last_24h(), middle) for e in p]
+
+    assert newer and older
+    assert not set(newer) & set(older)
+    assert len(newer) + len(older) == 2500
+
+
+def test_error_status_raises(stub):
+    """Test a non-200 response surfaces as PostHogError"""
+    client = PostHogClient(f'{stub.url}/missing', 'key', '1')
+    with pytest.raises(PostHogError) as exc_info:
+        list(client.iter_event_pages(last_24h()))
+    assert exc_info.value.status_code == 404
+
+
+def test_compute_stats_reads_session_from_properties():
+    """Test sessions are counted from properties.$session_id"""
+    now = datetime.now(timezone.utc)
+    events = EventStream(total_events=500, users=10, now=now).events(0, 500)
+    stats = compute_stats(events, now)
+
+    assert stats['events_24h'] == 500
+    assert 0 < stats['sessions_24h'] <= 30
+    assert stats['page_views_24h'] + stats['custom_events_24h'] == 500
+    assert 0 < stats['events_1h'] < 500
+
+
+def test_prefetching_reads_the_same_pages(stub):
+    """Test reading ahead in a background thread keeps pages and order intact"""
+    plain = PostHogClient(stub.url, 'key', '1', page_size=1000)
+    prefetched = PostHogClient(stub.url, 'key', '1', page_size=1000, prefetch_depth=2)
+
+    expected = [[e['id'] for e in page] for page in plain.iter_event_pages(last_24h())]
+    pages = [
+        [e['id'] for e in page] for page in prefetched.iter_event_pages(last_24h())
+    ]
+    assert pages == expected
+
+
+def test_prefetching_stops_with_the_consumer(stub):
+    """Test abandoning a prefetched fetch early leaves no reader behind"""
+    client = PostHogClient(stub.url, 'key', '1', page_size=1000, prefetch_depth=2)
+    chunks = client.iter_event_chunks(last_24h())
+    next(chunks)
+    chunks.close()
+
+    assert stub.requests_served == 1
@@ -0,0 +1,55 @@
+import time
+
+from profiler import RequestProfiler, collapse_stack
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def profile_call(profiler, route, seconds):
+    started = time.perf_counter()
+    profiler.start()
+    busy_wait(seconds)
+    profiler.stop(route, 'GET', time.perf_counter() - started)
+
+
+def test_collapse_stack_is_root_first():
+    """Test collapsed stacks end with the innermost frame"""
+    import sys
+
+    stack = collapse_stack(sys._getframe())
+    assert stack.endswith('test_profiler:test_collapse_stack_is_root_first')
+
+
+def test_profile_samples_request_thread():
+    """Test the sampler records the profiled thread's stacks"""
+    profiler = RequestProfiler(sample_rate=1, interval_ms=1)
+    profile_call(profiler, '/api/stats', 0.05)
+
+    profiles = profiler.get_profiles()
+    assert len(profiles) == 1
+    assert profiles[0]['route'] == '/api/stats'
+    assert profiles[0]['samples'] > 0
+    assert 'test_profiler:busy_wait' in profiles[0]['collapsed']
+    assert profiles[0]['collapsed'].splitlines()[0].rsplit(' ', 1)[1].isdigit()
+
+
+def test_keeps_only_slowest_profiles():
+    """Test the ring keeps the top N slowest requests"""
+    profiler = RequestProfiler(sample_rate=1, top_n=2, interval_ms=1)
+    for route, seconds in [('/a', 0.01), ('/b', 0.04), ('/c', 0.02)]:
+        profile_call(profiler, route, seconds)
+
+    assert [p['route'] for p in profiler.get_profiles()] == ['/b', '/c']
+
+    profiler.configure(sample_rate=1, top_n=1, interval_ms=1)
+    assert [p['route'] for p in profiler.get_profiles()] == ['/b']
+
+
+def test_zero_sample_rate_never_samples():
+    """Test profiling is skipped when the sample rate is zero"""
+    profiler = RequestProfiler(sample_rate=0)
+    assert not any(profiler.should_sample() for _ in range(100))
@@ -0,0 +1,128 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from benchmarks.posthog_stub import EventStream, PostHogStub
+from project_fetcher import ProjectFetcher, load_projects, snapshot_name
+from stats_engine import merge_stats
+
+
+@pytest.fixture
+def slow_stub():
+    stub = PostHogStub(EventStream(total_events=300, users=20), latency=0.3)
+    stub.start()
+    yield stub
+    stub.stop()
+
+
+def test_load_projects_from_config_and_env():
+    """Test configured projects win over the comma-separated env fallback"""
+    env_projects = load_projects({}, 'https://ph', 'key', '1, 2')
+    assert [p['name'] for p in env_projects] == ['1', '2']
+    assert env_projects[1]['api_key'] == 'key'
+
+    configured = load_projects(
+        {'projects': [{'name': 'shop', 'project_id': 7}, {'name': 'no-id'}]},
+        'https://ph',
+        'key',
+        '1',
+    )
+    assert configured == [
+        {'name': 'shop', 'project_id': '7', 'host': 'https://ph', 'api_key': 'key'}
+    ]
+    assert load_projects({}, 'https://ph', None, '1') == []
+    assert snapshot_name('my shop/eu') == 'my_shop_eu'
+
+
+def test_fetch_all_runs_projects_in_parallel(slow_stub):
+    """Test refresh time tracks the slowest project, not the sum"""
+    fetcher = ProjectFetcher(max_workers=4)
+    projects = [
+        {'name': name, 'project_id': name, 'host': slow_stub.url, 'api_key': 'k'}
+        for name in ('a', 'b', 'c')
+    ]
+    fetcher.configure(projects, timeout=5, page_size=1000)
+    after = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+
+    started = time.monotonic()
+    results = fetcher.fetch_all(after)
+    elapsed = time.monotonic() - started
+
+    assert sorted(results) == ['a', 'b', 'c']
+    assert all(stats['events_24h'] == 300 for stats in results.values())
+    assert elapsed < 0.8
+    assert {c.session for c in fetcher.clients.values()} == {fetcher.session}
+
+
+def test_fetch_all_returns_failures_per_project(slow_stub):
+    """Test one failing project does not hide the others"""
+    fetcher = ProjectFetcher(max_workers=2)
+    fetcher.configure(
+        [
+            {'name': 'ok', 'project_id': '1', 'host': slow_stub.url, 'api_key': 'k'},
+            {'name': 'bad', 'project_id': '2', 'host': 'http://127.0.0.1:9', 'api_key': 'k'},
+        ],
+        timeout=2,
+        page_size=1000,
+    )
+    results = fetcher.fetch_all(datetime.now(timezone.utc).isoformat())
+    assert isinstance(results['bad'], Exception)
+    assert isinstance(results['ok'], dict)
+
+
+def test_merge_stats_combines_projects():
+    """Test combined stats sum counts and interleave recent events"""
+    shop = {'events_24h': 10, 'unique_users_24h': 2, 'recent_events': [
+        {'timestamp': '2024-01-20T12:00:00Z'}]}
+    blog = {'events_24h': 5, 'unique_users_24h': 3, 'stale': True, 'recent_events': [
+        {'timestamp': '2024-01-20T13:00:00Z'}]}
+
+    combined = merge_stats({'shop': shop, 'blog': blog})
+    assert combined['events_24h'] == 15
+    assert combined['avg_events_per_user'] == 3.0
+    assert combined['recent_events'][0]['timestamp'] == '2024-01-20T13:00:00Z'
+    assert combined['projects']['blog']['stale'] is True
+    assert combined['projects']['shop']['events_24h'] == 10
+
+
+def test_max_pages_caps_each_refresh():
+    """Test a refresh reads only the newest pages and reports where they stop"""
+    stub = PostHogStub(EventStream(total_events=500, users=20)).start()
+    sunk = {}
+    fetcher = ProjectFetcher(
+        max_workers=1,
+        event_sink=lambda name, batch, after: sunk.update(after=after),
+        max_pages=2,
+    )
+    fetcher.configure(
+        [{'name': 'p', 'project_id': '1', 'host': stub.url, 'api_key': 'k'}],
+        timeout=5,
+        page_size=100,
+    )
+    after = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    try:
+        stats = fetcher.fetch_all(after)['p']
+    finally:
+        stub.stop()
+
+    assert stats['events_24h'] == 200
+    assert datetime.fromisoformat(sunk['after']) > datetime.fromisoformat(after)
+    assert stats['truncated'] is True
+    assert stats['covered_from'] == sunk['after']
+
+
+def test_merge_stats_marks_truncated_windows():
+    """Test a page-capped project marks the combined 24h counts as partial"""
+    shop = {'events_24h': 10, 'recent_events': [], 'truncated': False}
+    blog = {
+        'events_24h': 5,
+        'recent_events': [],
+        'truncated': True,
+        'covered_from': '2024-01-20T09:00:00+00:00',
+    }
+
+    combined = merge_stats({'shop': shop, 'blog': blog})
+    assert combined['truncated'] is True
+    assert combined['covered_from'] == '2024-01-20T09:00:00+00:00'
+    assert combined['projects']['blog']['truncated'] is True
+    assert merge_stats({'shop': shop})['truncated'] is False
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from benchmarks.posthog_stub import EventStream, PostHogStub
+from posthog_client import PostHogClient, PostHogError
+from rate_budget import BACKGROUND, DISPLAY, RateBudgeter, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_at_rate():
+    """Test the burst is spent and then refills at the configured rate"""
+    clock = FakeClock()
+    budget = RateBudgeter(rate_per_minute=60, burst=3, clock=clock)
+
+    assert all(budget.acquire('h', timeout=0) for _ in range(3))
+    assert not budget.acquire('h', timeout=0)
+    clock.now += 1
+    assert budget.acquire('h', timeout=0)
+    # Hosts have separate buckets
+    assert budget.acquire('other', timeout=0)
+
+
+def test_background_leaves_reserve_for_display():
+    """Test background calls stop at the reserve while display calls continue"""
+    clock = FakeClock()
+    budget = RateBudgeter(
+        rate_per_minute=60, burst=4, background_reserve=0.5, clock=clock
+    )
+
+    assert budget.acquire('h', BACKGROUND, timeout=0)
+    assert budget.acquire('h', BACKGROUND, timeout=0)
+    assert not budget.acquire('h', BACKGROUND, timeout=0)
+    assert budget.acquire('h', DISPLAY, timeout=0)
+    assert budget.acquire('h', DISPLAY, timeout=0)
+    assert not budget.acquire('h', DISPLAY, timeout=0)
+
+
+def test_429_blocks_host_and_slows_refresh():
+    """Test a 429 honours Retry-After and raises the slowdown until recovery"""
+    clock = FakeClock()
+    budget = RateBudgeter(rate_per_minute=600, burst=10, clock=clock)
+
+    budget.record_response('h', 429, {'Retry-After': '5'})
+    assert budget.slowdown() == 2
+    assert not budget.acquire('h', timeout=4)
+    clock.now += 5
+    assert budget.acquire('h', timeout=1)
+
+    for _ in range(10):
+        budget.record_response('h', 200, {})
+    assert budget.slowdown() == 1
+
+
+def test_quota_headers_cap_tokens():
+    """Test low remaining quota limits the bucket and slows refills"""
+    clock = FakeClock()
+    budget = RateBudgeter(rate_per_minute=60, burst=10, clock=clock)
+
+    budget.record_response(
+        'h', 200, {'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '1'}
+    )
+    assert budget.slowdown() == 1.5
+    assert budget.acquire('h', timeout=0)
+    assert not budget.acquire('h', timeout=0)
+    status = budget.get_status()
+    assert status['hosts']['h']['slowdown'] == 1.5
+
+
+def test_parse_retry_after():
+    """Test both Retry-After forms are understood"""
+    assert parse_retry_after('7') == 7
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    when = datetime.now(timezone.utc) + timedelta(seconds=120)
+    http_date = when.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert 100 < parse_retry_after(http_date) <= 120
+
+
+def test_client_backs_off_after_429():
+    """Test the client stops calling a host that returned 429"""
+    stub = PostHogStub(EventStream(total_events=500), rate_limit=1).start()
+    try:
+        budget = RateBudgeter(rate_per_minute=600, burst=10)
+        client = PostHogClient(stub.url, 'key', '1', timeout=0.5, budget=budget)
+        after = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+
+        assert len(next(client.iter_event_pages(after))) == 500
+        with pytest.raises(PostHogError) as exc_info:
+            list(client.iter_event_pages(after))
+        assert exc_info.value.status_code == 429
+
+        # Retry-After: 60 keeps further calls local instead of hitting the stub
+        with pytest.raises(PostHogError, match='budget exhausted'):
+            list(client.iter_event_pages(after))
+        assert len(stub.queries) == 1
+    finally:
+        stub.stop()
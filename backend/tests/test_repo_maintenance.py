@@ -0,0 +1,95 @@
+import os
+import threading
+from datetime import datetime
+
+import pytest
+from config_manager import ConfigManager
+from ota_manager import OTAManager, tracked_operation
+from repo_maintenance import RepoMaintenance, in_window
+from tests.test_ota_manager import commit, git
+
+
+@pytest.fixture
+def maintenance(tmp_path):
+    """Maintenance for a repository with a few hundred loose objects"""
+    repo = str(tmp_path / 'repo')
+    os.makedirs(repo)
+    git(repo, 'init', '-q')
+    for i in range(40):
+        commit(repo, f'file{i}.txt', f'content {i}')
+    ota = OTAManager(ConfigManager(str(tmp_path / 'device_config.json')))
+    ota.repo_path = repo
+    return RepoMaintenance(ota)
+
+
+def test_window_can_span_midnight():
+    """Test both plain and overnight windows"""
+    assert in_window('02:00-05:00', datetime(2024, 1, 1, 3, 30))
+    assert not in_window('02:00-05:00', datetime(2024, 1, 1, 5, 0))
+    assert in_window('23:00-01:00', datetime(2024, 1, 1, 0, 15))
+    assert not in_window('23:00-01:00', datetime(2024, 1, 1, 12, 0))
+
+
+def test_maintenance_packs_objects_and_records_timings(maintenance):
+    """Test a run leaves no loose objects, writes a commit graph and reports"""
+    report = maintenance.run(force=True)
+
+    assert report['result'] == 'ok', report
+    assert [t['name'] for t in report['tasks']] == [
+        'pack-refs',
+        'repack',
+        'commit-graph',
+        'prune',
+    ]
+    assert report['before']['objects']['loose_objects'] >= 100
+    assert report['after']['objects']['loose_objects'] == 0
+    assert set(report['after']['timings']) == {'rev-list', 'for-each-ref', 'cat-file'}
+    repo = maintenance.ota_manager.repo_path
+    assert os.path.exists(os.path.join(repo, '.git/objects/info/commit-graph'))
+    assert maintenance.get_status()['last_report'] == report
+    assert maintenance.not_due() == 'Ran recently'
+
+
+def test_maintenance_waits_for_its_window(maintenance):
+    """Test an unforced run outside the window does nothing"""
+    maintenance.config_manager.update_section(
+        'ota', {'maintenance_window': '00:00-00:01'}
+    )
+    result = maintenance.run()
+    assert result['skipped'] and 'window' in result['reason']
+    assert maintenance.get_status()['last_run'] is None
+
+
+def test_maintenance_never_overlaps_an_update(maintenance):
+    """Test maintenance skips while an OTA job runs, and gives way to one"""
+    ota = maintenance.ota_manager
+    started, release = threading.Event(), threading.Event()
+
+    @tracked_operation
+    def update(self):
+        started.set()
+        release.wait(10)
+
+    job = threading.Thread(target=update, args=(ota,))
+    job.start()
+    started.wait(10)
+    try:
+        result = maintenance.run(force=True)
+    finally:
+        release.set()
+        job.join()
+    assert result == {'skipped': True, 'reason': 'An OTA operation is running'}
+
+    ota.job_waiting = lambda: True
+    report = maintenance.run(force=True)
+    assert report['result'] == 'aborted'
+    assert {t['status'] for t in report['tasks']} == {'skipped'}
+    assert maintenance.get_status()['last_run'] is None
+
+
+def test_maintenance_stops_at_its_budget(maintenance):
+    """Test no task starts once the time budget is spent"""
+    maintenance.config_manager.update_section('ota', {'maintenance_budget_seconds': 0})
+    report = maintenance.run(force=True)
+    assert report['result'] == 'over_budget'
+    assert report['after']['objects']['loose_objects'] > 0
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+from rollups import CalendarRollups, period_start
+
+# Wednesday 2024-01-17 15:30 in New York (UTC-5)
+NOW = datetime(2024, 1, 17, 20, 30, tzinfo=timezone.utc)
+
+
+def event(event_id, minutes_ago, name='$pageview', user='u1'):
+    timestamp = NOW - timedelta(minutes=minutes_ago)
+    return {
+        'id': event_id,
+        'event': name,
+        'distinct_id': user,
+        'timestamp': timestamp.isoformat().replace('+00:00', 'Z'),
+    }
+
+
+def test_period_start_is_calendar_aligned():
+    """Test hour, day and Monday-based week starts in local time"""
+    local = NOW.astimezone(CalendarRollups('America/New_York').tz)
+    assert period_start(local, 'this_hour').isoformat() == '2024-01-17T15:00:00-05:00'
+    assert period_start(local, 'today').isoformat() == '2024-01-17T00:00:00-05:00'
+    assert period_start(local, 'this_week').isoformat() == '2024-01-15T00:00:00-05:00'
+
+
+def test_rollups_follow_device_timezone():
+    """Test 'today' starts at local midnight, not UTC midnight"""
+    events = [
+        event('a', 10),
+        event('b', 60, name='signed_up', user='u2'),
+        # 23:00 local yesterday, but the same UTC day as NOW
+        event('c', 16 * 60 + 30, user='u3'),
+    ]
+    utc = CalendarRollups('UTC')
+    utc.ingest('p', events, (NOW - timedelta(days=1)).isoformat(), now=NOW)
+    local = CalendarRollups('America/New_York')
+    local.ingest('p', events, (NOW - timedelta(days=1)).isoformat(), now=NOW)
+
+    assert utc.snapshot(NOW)['events_today'] == 3
+    stats = local.snapshot(NOW)
+    assert stats['events_today'] == 2
+    assert stats['unique_users_today'] == 2
+    assert stats['page_views_today'] == 1
+    assert stats['events_this_hour'] == 1
+    assert stats['events_this_week'] == 3
+    assert stats['rollup_timezone'] == 'America/New_York'
+
+
+def test_ingest_only_folds_new_events():
+    """Test refreshes with overlapping windows are counted once"""
+    rollups = CalendarRollups('UTC')
+    after = (NOW - timedelta(days=1)).isoformat()
+    assert rollups.ingest('p', [event('b', 5), event('a', 10)], after, now=NOW) == 2
+
+    # Next refresh: one new event plus one sharing the watermark timestamp
+    overlap = [event('d', 1), event('c', 5), event('b', 5), event('a', 10)]
+    assert rollups.ingest('p', overlap, after, now=NOW) == 2
+    assert rollups.snapshot(NOW)['events_today'] == 4
+
+
+def test_backfill_is_applied_once_and_dropped_after_reset():
+    """Test backfills merge atomically and stale ones are rejected"""
+    rollups = CalendarRollups('UTC')
+    rollups.ingest('p', [event('a', 10)], (NOW - timedelta(days=1)).isoformat(), now=NOW)
+    after, before, generation = rollups.backfill_range('p', NOW)
+    assert after == '2024-01-15T00:00:00+00:00'
+
+    partial = CalendarRollups('UTC')
+    partial.add_events('p', [event('old', 2 * 24 * 60, user='u9')])
+    assert rollups.apply_backfill('p', partial, generation)
+    assert not rollups.apply_backfill('p', partial, generation)
+    stats = rollups.snapshot(NOW)
+    assert stats['events_this_week'] == 2
+    assert stats['unique_users_this_week'] == 2
+    assert stats['rollups_complete'] is True
+    assert rollups.backfill_range('p', NOW) is None
+
+    assert rollups.set_timezone('Europe/Berlin')
+    assert not rollups.apply_backfill('p', partial, generation)
+    assert rollups.snapshot(NOW)['events_this_week'] == 0
+
+
+def test_capped_batch_queues_the_gap_to_its_watermark():
+    """Test a batch that stops short of the watermark leaves a gap to backfill"""
+    rollups = CalendarRollups('UTC')
+    after = (NOW - timedelta(days=1)).isoformat()
+    rollups.ingest('p', [event('b', 50), event('a', 60)], after, now=NOW)
+    assert rollups.next_gap('p') is None
+
+    # The capped refresh only reached 'e'; 'c' and 'd' are in the gap
+    rollups.ingest('p', [event('f', 5), event('e', 20)], after, now=NOW)
+    gap, generation = rollups.next_gap('p')
+    assert gap.bounds() == (
+        (NOW - timedelta(minutes=50)).isoformat(),
+        (NOW - timedelta(minutes=20)).isoformat(),
+    )
+
+    page = [event('e', 20), event('d', 30), event('c', 40), event('b', 50)]
+    partial = CalendarRollups('UTC')
+    partial.add_events('p', page, keep=gap.covers)
+    assert rollups.apply_gap('p', gap, partial, generation)
+    assert not rollups.apply_gap('p', gap, partial, generation)
+    assert rollups.next_gap('p') is None
+    assert rollups.snapshot(NOW)['events_today'] == 6
+
+
+def test_unique_users_are_counted_per_project():
+    """Test the same distinct_id in two projects is two users"""
+    rollups = CalendarRollups('UTC')
+    after = (NOW - timedelta(days=1)).isoformat()
+    rollups.ingest('shop', [event('a', 10)], after, now=NOW)
+    rollups.ingest('blog', [event('b', 10)], after, now=NOW)
+    assert rollups.snapshot(NOW)['unique_users_today'] == 2
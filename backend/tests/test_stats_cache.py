@@ -0,0 +1,41 @@
+from stats_cache import StatsCache
+
+
+def test_snapshot_survives_restart(tmp_path):
+    """Test that a stored snapshot is reloaded by a new cache instance"""
+    snapshot_file = str(tmp_path / 'stats_snapshot.json')
+    StatsCache(snapshot_file, persist_interval=0).put({'events_24h': 42})
+
+    cache = StatsCache(snapshot_file)
+    stale = cache.get_stale('PostHog unreachable')
+
+    assert stale['events_24h'] == 42
+    assert stale['stale'] is True
+    assert stale['stale_reason'] == 'PostHog unreachable'
+
+
+def test_fresh_snapshot_respects_max_age(tmp_path):
+    """Test that get_fresh only returns snapshots within max_age"""
+    cache = StatsCache(str(tmp_path / 'stats_snapshot.json'))
+    assert cache.get_fresh(10) is None
+
+    cache.put({'events_24h': 1})
+    assert cache.get_fresh(10) == {'events_24h': 1}
+
+    cache._stored_at -= 60
+    assert cache.get_fresh(10) is None
+    assert cache.get_stale('old')['snapshot_age'] >= 60
+
+
+def test_snapshot_is_read_on_first_use(tmp_path):
+    """Test the snapshot file is read lazily and never overrides a newer put"""
+    snapshot_file = tmp_path / 'stats_snapshot.json'
+    StatsCache(str(snapshot_file), persist_interval=0).put({'events_24h': 42})
+
+    unread = StatsCache(str(snapshot_file))
+    newer = StatsCache(str(snapshot_file))
+    newer.put({'events_24h': 7})
+    snapshot_file.unlink()
+
+    assert unread.get_stale('old') is None
+    assert newer.get_fresh(10) == {'events_24h': 7}
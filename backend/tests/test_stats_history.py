@@ -0,0 +1,70 @@
+import pytest
+from stats_history import RingSeries, StatsHistory, parse_range
+
+NOW = 1_700_000_000.0
+
+
+def test_parse_range():
+    """Test range strings are converted to seconds"""
+    assert parse_range('90m') == 5400
+    assert parse_range('24h') == 86400
+    assert parse_range('30d') == 30 * 86400
+    with pytest.raises(ValueError):
+        parse_range('0h')
+    with pytest.raises(ValueError):
+        parse_range('week')
+
+
+def test_ring_overwrites_oldest_bucket():
+    """Test the ring keeps only the last capacity buckets"""
+    series = RingSeries(60, 10)
+    for minute in range(25):
+        series.add(minute * 60, minute)
+
+    points = series.query(0, 25 * 60, 100)
+    assert len(points) == 10
+    assert [value for _, value in points] == list(range(15, 25))
+
+    # Samples older than the ring are dropped rather than clobbering newer ones
+    series.add(0, 99)
+    assert [value for _, value in series.query(0, 25 * 60, 100)][0] == 15
+
+
+def test_query_downsamples_to_display_width():
+    """Test buckets are averaged into the requested number of points"""
+    history = StatsHistory('/nonexistent/history.json', persist_interval=1e9)
+    for minute in range(120):
+        history.record({'events_24h': minute}, NOW - (119 - minute) * 60)
+
+    result = history.query('events_24h', 7200, 4, now=NOW)
+    assert result['resolution'] == 60
+    values = [value for _, value in result['points']]
+    assert len(values) == 4
+    assert values == sorted(values)
+    assert values[0] == pytest.approx(14.5, abs=1)
+
+
+def test_long_ranges_use_hourly_series():
+    """Test spans beyond 24h are served from the hourly resolution"""
+    history = StatsHistory('/nonexistent/history.json', persist_interval=1e9)
+    for hour in range(72):
+        history.record({'events_24h': hour}, NOW - (71 - hour) * 3600)
+
+    result = history.query('events_24h', 7 * 86400, 7, now=NOW)
+    assert result['resolution'] == 3600
+    assert len(result['points']) == 7
+    assert result['points'][0][1] is None
+    assert result['points'][-1][1] is not None
+    assert history.query('missing', 3600, 10) is None
+
+
+def test_history_survives_restart(tmp_path):
+    """Test recorded series are persisted and reloaded"""
+    history_file = str(tmp_path / 'stats_history.json')
+    history = StatsHistory(history_file, persist_interval=0)
+    history.record({'events_24h': 5, 'recent_events': [], 'stale': True}, NOW)
+
+    reloaded = StatsHistory(history_file)
+    points = reloaded.query('events_24h', 60, 1, now=NOW)['points']
+    assert points[0][1] == 5
+    assert reloaded.query('stale', 60, 1, now=NOW) is None
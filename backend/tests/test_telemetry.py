@@ -0,0 +1,51 @@
+from telemetry import MetricsRegistry
+
+
+def test_counter_renders_labels():
+    """Test counters render one sample per label set"""
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Requests', ['route'])
+    counter.inc(route='/api/stats')
+    counter.inc(2, route='/api/stats')
+    counter.inc(route='/api/"health"')
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{route="/api/stats"} 3' in text
+    assert 'requests_total{route="/api/\\"health\\""} 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test histogram buckets, sum and count follow the exposition format"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_sum 5.55' in text
+    assert 'latency_seconds_count 3' in text
+
+
+def test_callback_gauge_skips_missing_values():
+    """Test callback gauges are evaluated at render time"""
+    registry = MetricsRegistry()
+    values = [None]
+    registry.gauge('snapshot_age_seconds', 'Age', callback=lambda: values[0])
+    assert '\nsnapshot_age_seconds ' not in registry.render()
+
+    values[0] = 12.5
+    assert 'snapshot_age_seconds 12.5' in registry.render()
+
+
+def test_process_cpu_time_is_a_counter():
+    """Test the cumulative CPU time is typed as a counter for rate()"""
+    from telemetry import REGISTRY
+
+    text = REGISTRY.render()
+    assert '# TYPE process_cpu_seconds_total counter' in text
+    assert '\nprocess_cpu_seconds_total ' in text
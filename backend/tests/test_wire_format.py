@@ -0,0 +1,81 @@
+import uuid
+
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from wire_format import encode_cbor, encode_msgpack, negotiate
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        (0, '00'),
+        (23, '17'),
+        (24, '1818'),
+        (1000, '1903e8'),
+        (1000000, '1a000f4240'),
+        (-1, '20'),
+        (-1000, '3903e7'),
+        (100000.0, 'fa47c35000'),
+        (1.1, 'fb3ff199999999999a'),
+        (False, 'f4'),
+        (True, 'f5'),
+        (None, 'f6'),
+        ('a', '6161'),
+        ('ü', '62c3bc'),
+        ([1, [2, 3], [4, 5]], '8301820203820405'),
+        ({'a': 1, 'b': [2, 3]}, 'a26161016162820203'),
+    ],
+)
+def test_cbor_rfc_vectors(value, expected):
+    """Test CBOR output against the RFC 8949 appendix A examples"""
+    assert encode_cbor(value).hex() == expected
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        (0, '00'),
+        (127, '7f'),
+        (128, 'cc80'),
+        (65536, 'ce00010000'),
+        (-32, 'e0'),
+        (-33, 'd0df'),
+        (-40000, 'd2ffff63c0'),
+        (0.5, 'ca3f000000'),
+        (1.1, 'cb3ff199999999999a'),
+        (None, 'c0'),
+        ('a' * 32, 'd920' + '61' * 32),
+        ({'compact': True, 'schema': 0}, '82a7636f6d70616374c3a6736368656d6100'),
+        (list(range(16)), 'dc0010' + ''.join(f'{i:02x}' for i in range(16))),
+    ],
+)
+def test_msgpack_encoding(value, expected):
+    """Test MessagePack output for each size class"""
+    assert encode_msgpack(value).hex() == expected
+
+
+def test_default_hook_for_unsupported_types():
+    """Test that unsupported objects go through default() or raise"""
+    value = uuid.UUID(int=1)
+    with pytest.raises(TypeError):
+        encode_cbor(value)
+    assert encode_cbor(value, str) == encode_cbor(str(value))
+    assert encode_msgpack([value], str) == encode_msgpack([str(value)])
+
+
+@pytest.mark.parametrize(
+    'header, expected',
+    [
+        ('application/cbor', 'application/cbor'),
+        ('application/x-msgpack', 'application/x-msgpack'),
+        ('application/cbor, application/json;q=0.9', 'application/cbor'),
+        ('application/json, application/cbor;q=0.5', None),
+        ('*/*', None),
+        ('', None),
+    ],
+)
+def test_negotiate(header, expected):
+    """Test that JSON stays the default unless a binary type is preferred"""
+    assert negotiate(parse_accept_header(header, MIMEAccept)) == expected
@@ -0,0 +1,231 @@
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MIMEAccept
+
+from telemetry import HTTP_RESPONSE_BYTES
+
+Default = Optional[Callable[[Any], Any]]
+
+
+def _compact_float(value: float) -> Optional[bytes]:
+    """Single precision bytes if that loses nothing, else None"""
+    try:
+        packed = struct.pack(">f", value)
+    except OverflowError:
+        return None
+    if struct.unpack(">f", packed)[0] == value:
+        return packed
+    return None
+
+
+def _cbor_head(out: bytearray, major: int, length: int) -> None:
+    if length < 24:
+        out.append(major << 5 | length)
+    elif length < 0x100:
+        out += bytes((major << 5 | 24, length))
+    elif length < 0x10000:
+        out.append(major << 5 | 25)
+        out += struct.pack(">H", length)
+    elif length < 0x100000000:
+        out.append(major << 5 | 26)
+        out += struct.pack(">I", length)
+    else:
+        out.append(major << 5 | 27)
+        out += struct.pack(">Q", length)
+
+
+def _cbor(out: bytearray, value: Any, default: Default) -> None:
+    if value is None:
+        out.append(0xF6)
+    elif value is True:
+        out.append(0xF5)
+    elif value is False:
+        out.append(0xF4)
+    elif isinstance(value, int):
+        if value >= 0:
+            _cbor_head(out, 0, value)
+        else:
+            _cbor_head(out, 1, -1 - value)
+    elif isinstance(value, float):
+        single = _compact_float(value)
+        if single is not None:
+            out.append(0xFA)
+            out += single
+        else:
+            out.append(0xFB)
+            out += struct.pack(">d", value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _cbor_head(out, 3, len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        _cbor_head(out, 2, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        _cbor_head(out, 4, len(value))
+        for item in value:
+            _cbor(out, item, default)
+    elif isinstance(value, dict):
+        _cbor_head(out, 5, len(value))
+        for key, item in value.items():
+            _cbor(out, key, default)
+            _cbor(out, item, default)
+    elif default is not None:
+        _cbor(out, default(value), None)
+    else:
+        raise TypeError(f"Cannot CBOR-encode {type(value).__name__}")
+
+
+def encode_cbor(value: Any, default: Default = None) -> bytes:
+    """CBOR bytes; default() converts unsupported objects, as in json.dumps"""
+    out = bytearray()
+    _cbor(out, value, default)
+    return bytes(out)
+
+
+def _msgpack_length(
+    out: bytearray,
+    length: int,
+    fix: int,
+    fix_max: int,
+    codes: Tuple[Tuple[int, str, int], ...],
+) -> None:
+    """Write a str/array/map header: fix form, then 8/16/32-bit lengths"""
+    if length < fix_max:
+        out.append(fix | length)
+        return
+    for code, fmt, limit in codes:
+        if length < limit:
+            out.append(code)
+            out += struct.pack(fmt, length)
+            return
+    raise ValueError("Value too large for MessagePack")
+
+
+STR_CODES = ((0xD9, ">B", 0x100), (0xDA, ">H", 0x10000), (0xDB, ">I", 0x100000000))
+ARRAY_CODES = ((0xDC, ">H", 0x10000), (0xDD, ">I", 0x100000000))
+MAP_CODES = ((0xDE, ">H", 0x10000), (0xDF, ">I", 0x100000000))
+BIN_CODES = ((0xC4, ">B", 0x100), (0xC5, ">H", 0x10000), (0xC6, ">I", 0x100000000))
+
+
+def _msgpack(out: bytearray, value: Any, default: Default) -> None:
+    if value is None:
+        out.append(0xC0)
+    elif value is True:
+        out.append(0xC3)
+    elif value is False:
+        out.append(0xC2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80 or -32 <= value < 0:
+            out += struct.pack(">b" if value < 0 else ">B", value)
+        elif value >= 0:
+            for code, fmt, limit in (
+                (0xCC, ">B", 0x100),
+                (0xCD, ">H", 0x10000),
+                (0xCE, ">I", 0x100000000),
+                (0xCF, ">Q", 0x10000000000000000),
+            ):
+                if value < limit:
+                    out.append(code)
+                    out += struct.pack(fmt, value)
+                    return
+            raise ValueError("Integer too large for MessagePack")
+        else:
+            for code, fmt, limit in (
+                (0xD0, ">b", 0x80),
+                (0xD1, ">h", 0x8000),
+                (0xD2, ">i", 0x80000000),
+                (0xD3, ">q", 0x8000000000000000),
+            ):
+                if -value <= limit:
+                    out.append(code)
+                    out += struct.pack(fmt, value)
+                    return
+            raise ValueError("Integer too small for MessagePack")
+    elif isinstance(value, float):
+        single = _compact_float(value)
+        if single is not None:
+            out.append(0xCA)
+            out += single
+        else:
+            out.append(0xCB)
+            out += struct.pack(">d", value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _msgpack_length(out, len(data), 0xA0, 32, STR_CODES)
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        _msgpack_length(out, len(value), 0, 0, BIN_CODES)
+        out += value
+    elif isinstance(value, (list, tuple)):
+        _msgpack_length(out, len(value), 0x90, 16, ARRAY_CODES)
+        for item in value:
+            _msgpack(out, item, default)
+    elif isinstance(value, dict):
+        _msgpack_length(out, len(value), 0x80, 16, MAP_CODES)
+        for key, item in value.items():
+            _msgpack(out, key, default)
+            _msgpack(out, item, default)
+    elif default is not None:
+        _msgpack(out, default(value), None)
+    else:
+        raise TypeError(f"Cannot MessagePack-encode {type(value).__name__}")
+
+
+def encode_msgpack(value: Any, default: Default = None) -> bytes:
+    """MessagePack bytes; default() converts unsupported objects"""
+    out = bytearray()
+    _msgpack(out, value, default)
+    return bytes(out)
+
+
+ENCODERS: Dict[str, Callable[[Any, Default], bytes]] = {
+    "application/cbor": encode_cbor,
+    "application/msgpack": encode_msgpack,
+    "application/vnd.msgpack": encode_msgpack,
+    "application/x-msgpack": encode_msgpack,
+}
+
+
+def negotiate(accept: MIMEAccept) -> Optional[str]:
+    """Binary media type the client prefers over JSON, if any"""
+    # JSON first so "*/*" (browsers, curl) keeps getting JSON
+    best = accept.best_match(["application/json"] + list(ENCODERS))
+    return best if best in ENCODERS else None
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """jsonify() that answers in CBOR or MessagePack when the Accept header asks"""
+
+    # Route prefixes that negotiate; the fleet snapshot keeps JSON for its ETag
+    prefixes: Tuple[str, ...] = (
+        "/api/stats",
+        "/api/admin/",
+        "/api/bootstrap",
+        "/api/metrics/available",
+    )
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not has_request_context() or not request.path.startswith(self.prefixes):
+            return super().response(*args, **kwargs)
+
+        media_type = negotiate(request.accept_mimetypes)
+        if media_type is None:
+            response = super().response(*args, **kwargs)
+            encoding = "json"
+        else:
+            encode = ENCODERS[media_type]
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(
+                encode(obj, self.default), mimetype=media_type
+            )
+            encoding = "cbor" if encode is encode_cbor else "msgpack"
+        response.vary.add("Accept")
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_RESPONSE_BYTES.inc(
+            response.content_length or 0, route=route, encoding=encoding
+        )
+        return response
@@ -1,5 +1,26 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
+import { fetchCompactResponse } from './cbor';
+
+// Used until the backend advises an interval via X-Refresh-Interval
+const DEFAULT_REFRESH_MS = 30000;
+const WAKE_EVENTS = ['pointerdown', 'keydown', 'touchstart'];
+
+// Tells this tab apart from other displays of the same dashboard, so the
+// backend only idles once none of them is being watched
+const DISPLAY_HEADERS = {
+  'X-Display-Id': Math.random().toString(36).slice(2),
+};
+
+// Tell the backend whether the screen is being watched; it stops querying
+// PostHog while it is not and warms the stats back up on wake
+const reportVisibility = (visible: boolean, reason?: string) =>
+  fetch('/api/display/activity', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', ...DISPLAY_HEADERS },
+    body: JSON.stringify({ visible, reason }),
+    keepalive: true,
+  }).catch((err) => console.error('Error reporting visibility:', err));
 
 interface PostHogStats {
   events_24h: number;
@@ -11,10 +32,14 @@ interface PostHogStats {
   avg_events_per_user: number;
   recent_events: any[];
   last_updated: string;
+  stale?: boolean;
+  truncated?: boolean;
+  covered_from?: string;
   error?: string;
 }
 
 interface DisplayConfig {
+  screensaver_timeout: number;
   metrics: {
     top: { type: string; label: string; enabled: boolean };
     left: { type: string; label: string; enabled: boolean };
@@ -29,11 +54,21 @@ const App: React.FC = () => {
   );
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [screensaver, setScreensaver] = useState(false);
+  const pollTimer = useRef<ReturnType<typeof setTimeout>>();
+  const sleeping = useRef(false);
+  const blanked = useRef(false);
 
-  const fetchStats = async () => {
+  // Returns how long to wait before the next poll
+  const fetchStats = async (): Promise<number> => {
+    let delay = DEFAULT_REFRESH_MS;
     try {
-      const response = await fetch('/api/stats');
-      const data = await response.json();
+      const { data, headers } = await fetchCompactResponse(
+        '/api/stats',
+        DISPLAY_HEADERS,
+      );
+      const advised = parseFloat(headers.get('X-Refresh-Interval') || '');
+      if (advised > 0) delay = advised * 1000;
 
       if (data.error) {
         setError(data.error);
@@ -47,25 +82,85 @@ const App: React.FC = () => {
     } finally {
       setLoading(false);
     }
+    return delay;
+  };
+
+  const poll = async () => {
+    const delay = await fetchStats();
+    // Polling stops while the screen is hidden or blanked; waking resumes it
+    if (sleeping.current) return;
+    clearTimeout(pollTimer.current);
+    pollTimer.current = setTimeout(poll, delay);
+  };
+
+  const updateActivity = () => {
+    const reason = document.hidden
+      ? 'hidden'
+      : blanked.current
+        ? 'screensaver'
+        : undefined;
+    if ((reason !== undefined) === sleeping.current) return;
+    sleeping.current = reason !== undefined;
+    clearTimeout(pollTimer.current);
+    if (reason) {
+      reportVisibility(false, reason);
+    } else {
+      reportVisibility(true).then(poll);
+    }
   };
 
   const fetchDisplayConfig = async () => {
     try {
       const response = await fetch('/api/admin/config');
       const data = await response.json();
-      setDisplayConfig({ metrics: data.display.metrics });
+      setDisplayConfig({
+        screensaver_timeout: data.display.screensaver_timeout || 0,
+        metrics: data.display.metrics,
+      });
     } catch (err) {
       console.error('Error fetching display config:', err);
     }
   };
 
   useEffect(() => {
-    fetchStats();
+    poll();
     fetchDisplayConfig();
-    const interval = setInterval(fetchStats, 30000); // Refresh every 30 seconds
-    return () => clearInterval(interval);
+    // Loaded in a background tab: report it so polling stops after this one
+    updateActivity();
+    document.addEventListener('visibilitychange', updateActivity);
+    return () => {
+      document.removeEventListener('visibilitychange', updateActivity);
+      clearTimeout(pollTimer.current);
+    };
   }, []);
 
+  // Blank the screen after screensaver_timeout seconds without input
+  const screensaverTimeout = displayConfig?.screensaver_timeout ?? 0;
+  useEffect(() => {
+    if (screensaverTimeout <= 0) return;
+    let timer: ReturnType<typeof setTimeout>;
+    const blank = () => {
+      blanked.current = true;
+      setScreensaver(true);
+      updateActivity();
+    };
+    const onInput = () => {
+      clearTimeout(timer);
+      timer = setTimeout(blank, screensaverTimeout * 1000);
+      if (blanked.current) {
+        blanked.current = false;
+        setScreensaver(false);
+        updateActivity();
+      }
+    };
+    WAKE_EVENTS.forEach((name) => window.addEventListener(name, onInput));
+    onInput();
+    return () => {
+      clearTimeout(timer);
+      WAKE_EVENTS.forEach((name) => window.removeEventListener(name, onInput));
+    };
+  }, [screensaverTimeout]);
+
   const formatTime = (timestamp: string): string => {
     try {
       const date = new Date(timestamp);
@@ -97,13 +192,14 @@ const App: React.FC = () => {
       <div className="app error">
         <h2>Error</h2>
         <p>{error}</p>
-        <button onClick={fetchStats}>Retry</button>
+        <button onClick={() => fetchStats()}>Retry</button>
       </div>
     );
   }
 
   return (
     <div className="app">
+      {screensaver && <div className="screensaver" />}
       <div className="circular-container">
         {/* Center logo/title */}
         <div className="center-logo">
@@ -150,8 +246,15 @@ const App: React.FC = () => {
         {/* Status and time at bottom */}
         <div className="bottom-info">
           <div className="status-indicator">
-            <div className="status-dot active"></div>
-            <span>Live</span>
+            <div
+              className={`status-dot ${stats?.stale ? 'stale' : 'active'}`}
+            ></div>
+            <span>{stats?.stale ? 'Cached' : 'Live'}</span>
+            {stats?.truncated && stats.covered_from && (
+              <span className="coverage">
+                since {formatTime(stats.covered_from)}
+              </span>
+            )}
           </div>
           <div className="last-updated">
             {stats?.last_updated ? formatTime(stats.last_updated) : '--:--'}
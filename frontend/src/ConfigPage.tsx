@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import './ConfigPage.css';
+import { fetchCompact } from './cbor';
 
 interface DeviceConfig {
   device: {
@@ -18,6 +19,8 @@ interface DeviceConfig {
     brightness: number;
     rotation: number;
     screensaver_timeout: number;
+    idle_refresh_interval: number;
+    adaptive_refresh: boolean;
     metrics: {
       top: { type: string; label: string; enabled: boolean };
       left: { type: string; label: string; enabled: boolean };
@@ -32,10 +35,18 @@ interface DeviceConfig {
   };
   advanced: {
     debug_mode: boolean;
+    profile_sample_rate: number;
+    profile_top_n: number;
+    profile_interval_ms: number;
     log_level: string;
     auto_update: boolean;
     backup_enabled: boolean;
   };
+  fleet: {
+    mode: string;
+    hub_url: string;
+    token: string;
+  };
   ota: {
     enabled: boolean;
     branch: string;
@@ -112,12 +123,24 @@ const ConfigPage: React.FC = () => {
   const API_BASE = process.env.REACT_APP_API_URL || '';
 
   useEffect(() => {
-    loadConfig();
+    loadBootstrap();
     loadDeviceInfo();
-    loadOTAStatus();
-    loadAvailableMetrics();
   }, []);
 
+  // Config, OTA status and metric definitions in one round trip
+  const loadBootstrap = async () => {
+    try {
+      const data = await fetchCompact(`${API_BASE}/api/bootstrap`);
+      setConfig(data.config);
+      setOtaStatus(data.ota_status);
+      setAvailableMetrics(data.available_metrics);
+    } catch (error) {
+      showMessage('error', 'Failed to load configuration');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const loadConfig = async () => {
     try {
       const response = await fetch(`${API_BASE}/api/admin/config`);
@@ -150,16 +173,6 @@ const ConfigPage: React.FC = () => {
     }
   };
 
-  const loadAvailableMetrics = async () => {
-    try {
-      const response = await fetch(`${API_BASE}/api/metrics/available`);
-      const data = await response.json();
-      setAvailableMetrics(data);
-    } catch (error) {
-      console.error('Failed to load available metrics:', error);
-    }
-  };
-
   const saveConfig = async () => {
     if (!config) return;
 
@@ -526,6 +539,53 @@ const ConfigPage: React.FC = () => {
                   }
                 />
               </div>
+              <div className="form-group">
+                <label>
+                  <input
+                    type="checkbox"
+                    checked={config.display.adaptive_refresh}
+                    onChange={(e) =>
+                      updateConfig(
+                        'display',
+                        'adaptive_refresh',
+                        e.target.checked,
+                      )
+                    }
+                  />
+                  Refresh faster when events are busier than usual
+                </label>
+              </div>
+              <div className="form-group">
+                <label>Screensaver After (seconds, 0 = never)</label>
+                <input
+                  type="number"
+                  min="0"
+                  value={config.display.screensaver_timeout}
+                  onChange={(e) =>
+                    updateConfig(
+                      'display',
+                      'screensaver_timeout',
+                      parseInt(e.target.value),
+                    )
+                  }
+                />
+              </div>
+              <div className="form-group">
+                <label>Refresh Interval While Idle (seconds)</label>
+                <input
+                  type="number"
+                  min="30"
+                  max="3600"
+                  value={config.display.idle_refresh_interval}
+                  onChange={(e) =>
+                    updateConfig(
+                      'display',
+                      'idle_refresh_interval',
+                      parseInt(e.target.value),
+                    )
+                  }
+                />
+              </div>
               <div className="form-group">
                 <label>Theme</label>
                 <select
@@ -739,6 +799,25 @@ const ConfigPage: React.FC = () => {
                   Debug Mode
                 </label>
               </div>
+              {config.advanced.debug_mode && (
+                <div className="form-group">
+                  <label>Request Profiling Sample Rate (0-1)</label>
+                  <input
+                    type="number"
+                    min="0"
+                    max="1"
+                    step="0.01"
+                    value={config.advanced.profile_sample_rate}
+                    onChange={(e) =>
+                      updateConfig(
+                        'advanced',
+                        'profile_sample_rate',
+                        parseFloat(e.target.value),
+                      )
+                    }
+                  />
+                </div>
+              )}
               <div className="form-group">
                 <label>Log Level</label>
                 <select
@@ -781,6 +860,44 @@ const ConfigPage: React.FC = () => {
                   Enable Backups
                 </label>
               </div>
+              <div className="form-group">
+                <label>Fleet Mode</label>
+                <select
+                  value={config.fleet.mode}
+                  onChange={(e) =>
+                    updateConfig('fleet', 'mode', e.target.value)
+                  }
+                >
+                  <option value="standalone">Standalone</option>
+                  <option value="hub">Hub (fetch and publish to leaves)</option>
+                  <option value="leaf">Leaf (follow a hub)</option>
+                </select>
+              </div>
+              {config.fleet.mode === 'leaf' && (
+                <div className="form-group">
+                  <label>Hub URL</label>
+                  <input
+                    type="text"
+                    value={config.fleet.hub_url}
+                    onChange={(e) =>
+                      updateConfig('fleet', 'hub_url', e.target.value)
+                    }
+                    placeholder="http://dashboard-hub.local:5000"
+                  />
+                </div>
+              )}
+              {config.fleet.mode !== 'standalone' && (
+                <div className="form-group">
+                  <label>Fleet Token (optional, shared by hub and leaves)</label>
+                  <input
+                    type="password"
+                    value={config.fleet.token}
+                    onChange={(e) =>
+                      updateConfig('fleet', 'token', e.target.value)
+                    }
+                  />
+                </div>
+              )}
             </div>
           )}
 
@@ -0,0 +1,130 @@
+// Minimal CBOR (RFC 8949) decoder for the subset the backend emits:
+// integers, floats, strings, byte strings, arrays, maps, booleans and null.
+
+const utf8 = new TextDecoder();
+
+class Reader {
+  private view: DataView;
+  private offset = 0;
+
+  constructor(buffer: ArrayBuffer) {
+    this.view = new DataView(buffer);
+  }
+
+  private length(info: number): number {
+    if (info < 24) return info;
+    const start = this.offset;
+    switch (info) {
+      case 24:
+        this.offset += 1;
+        return this.view.getUint8(start);
+      case 25:
+        this.offset += 2;
+        return this.view.getUint16(start);
+      case 26:
+        this.offset += 4;
+        return this.view.getUint32(start);
+      case 27:
+        this.offset += 8;
+        return (
+          this.view.getUint32(start) * 0x100000000 +
+          this.view.getUint32(start + 4)
+        );
+      default:
+        throw new Error(`Unsupported CBOR length encoding ${info}`);
+    }
+  }
+
+  private half(bits: number): number {
+    const exponent = (bits >> 10) & 0x1f;
+    const fraction = bits & 0x3ff;
+    const sign = bits & 0x8000 ? -1 : 1;
+    if (exponent === 0) return sign * fraction * Math.pow(2, -24);
+    if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+    return sign * (1 + fraction / 1024) * Math.pow(2, exponent - 15);
+  }
+
+  read(): any {
+    const initial = this.view.getUint8(this.offset++);
+    const major = initial >> 5;
+    const info = initial & 0x1f;
+
+    if (major === 7) {
+      const start = this.offset;
+      switch (info) {
+        case 20:
+          return false;
+        case 21:
+          return true;
+        case 22:
+        case 23:
+          return null;
+        case 25:
+          this.offset += 2;
+          return this.half(this.view.getUint16(start));
+        case 26:
+          this.offset += 4;
+          return this.view.getFloat32(start);
+        case 27:
+          this.offset += 8;
+          return this.view.getFloat64(start);
+        default:
+          throw new Error(`Unsupported CBOR simple value ${info}`);
+      }
+    }
+
+    const length = this.length(info);
+    switch (major) {
+      case 0:
+        return length;
+      case 1:
+        return -1 - length;
+      case 2:
+      case 3: {
+        const bytes = new Uint8Array(
+          this.view.buffer,
+          this.view.byteOffset + this.offset,
+          length,
+        );
+        this.offset += length;
+        return major === 2 ? bytes : utf8.decode(bytes);
+      }
+      case 4: {
+        const items = [];
+        for (let i = 0; i < length; i++) items.push(this.read());
+        return items;
+      }
+      case 5: {
+        const map: { [key: string]: any } = {};
+        for (let i = 0; i < length; i++) {
+          const key = this.read();
+          map[key] = this.read();
+        }
+        return map;
+      }
+      default:
+        throw new Error(`Unsupported CBOR major type ${major}`);
+    }
+  }
+}
+
+export const decodeCbor = (buffer: ArrayBuffer): any =>
+  new Reader(buffer).read();
+
+// Fetch an API payload as CBOR, falling back to JSON if the server sends that
+export const fetchCompactResponse = async (
+  url: string,
+  headers: Record<string, string> = {},
+): Promise<{ data: any; headers: Headers }> => {
+  const response = await fetch(url, {
+    headers: { Accept: 'application/cbor, application/json;q=0.9', ...headers },
+  });
+  const contentType = response.headers.get('Content-Type') || '';
+  const data = contentType.startsWith('application/cbor')
+    ? decodeCbor(await response.arrayBuffer())
+    : await response.json();
+  return { data, headers: response.headers };
+};
+
+export const fetchCompact = async (url: string): Promise<any> =>
+  (await fetchCompactResponse(url)).data;
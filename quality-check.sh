@@ -63,9 +63,9 @@ ORIGINAL_DIR=$(pwd)
     fi
     
     # Run checks with venv active
-    run_check "Black formatting" "black --check app.py config_manager.py ota_manager.py"
-    run_check "Flake8 linting" "flake8 app.py config_manager.py ota_manager.py"
-    run_check "MyPy type checking" "mypy app.py config_manager.py ota_manager.py"
+    run_check "Black formatting" "black --check *.py"
+    run_check "Flake8 linting" "flake8 *.py"
+    run_check "MyPy type checking" "mypy *.py"
     run_check "Python tests" "pytest tests/ -v"
 )
 
@@ -4,10 +4,14 @@ Quick production runner for Pi Analytics Dashboard
 Builds frontend and starts integrated Flask server
 """
 import os
+import shutil
 import subprocess
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from build_cache import BuildCache, frontend_key, read_key, requirements_key, write_key
+
 def run_command(cmd, cwd=None):
     """Run a command and wait for completion"""
     print(f"Running: {' '.join(cmd)}")
@@ -18,6 +22,54 @@ def run_command(cmd, cwd=None):
         print(f"Error running command: {e}")
         return False
 
+def install_requirements(venv):
+    """Create venv if needed and install the backend requirements into it"""
+    if not (venv / "bin" / "python3").exists():
+        print("🔧 Creating virtual environment...")
+        if not run_command([sys.executable, "-m", "venv", str(venv)]):
+            print("❌ Failed to create virtual environment!")
+            return False
+
+    print("📦 Installing dependencies...")
+    pip_cmd = [str(venv / "bin" / "pip"), "install", "-r", "backend/requirements.txt"]
+    if not run_command(pip_cmd):
+        print("❌ Failed to install dependencies!")
+        return False
+    return True
+
+def prepare_venv(cache):
+    """Point backend/venv at an environment built for these requirements"""
+    venv = Path("backend/venv")
+    key = requirements_key("backend/requirements.txt")
+
+    if venv.is_dir() and not venv.is_symlink():
+        # An environment created before the cache: reinstall only on changes
+        if read_key(venv) == key:
+            print("✅ Dependencies unchanged")
+            return True
+        if not install_requirements(venv):
+            return False
+        write_key(venv, key)
+        return True
+
+    cached = Path(cache.path("venvs", key))
+    if cache.is_complete(cached):
+        print("✅ Dependencies unchanged, using cached environment")
+    else:
+        # Absolute paths inside a venv pin it, so it is built in the cache
+        shutil.rmtree(cached, ignore_errors=True)
+        if not install_requirements(cached):
+            return False
+        cache.mark_complete("venvs", str(cached))
+    os.utime(cached)
+
+    link = Path("backend/venv.link")
+    if link.is_symlink():
+        link.unlink()
+    link.symlink_to(cached.resolve())
+    os.replace(link, venv)
+    return True
+
 def main():
     # Ensure we're in the right directory
     script_dir = Path(__file__).parent
@@ -26,29 +78,24 @@ def main():
     print("🚀 Pi Analytics Dashboard Quick Production Run")
     print("=" * 40)
     
-    # Build frontend
-    print("🔨 Building React frontend...")
-    if not run_command(["npm", "run", "build"], cwd="frontend"):
-        print("❌ Frontend build failed!")
-        sys.exit(1)
-    
-    print("✅ Frontend built successfully!")
-    
-    # Check for virtual environment
-    venv_path = Path("backend/venv")
-    if not venv_path.exists():
-        print("🔧 Creating virtual environment...")
-        if not run_command(["python3", "-m", "venv", "venv"], cwd="backend"):
-            print("❌ Failed to create virtual environment!")
+    cache = BuildCache()
+
+    # Build frontend, unless this frontend/ tree was built before
+    key = frontend_key(".")
+    if key and cache.restore("frontend", key, "frontend/build"):
+        print("✅ Frontend unchanged, using cached build")
+    else:
+        print("🔨 Building React frontend...")
+        if not run_command(["npm", "run", "build"], cwd="frontend"):
+            print("❌ Frontend build failed!")
             sys.exit(1)
-    
-    # Install dependencies
-    print("📦 Installing dependencies...")
-    pip_cmd = ["backend/venv/bin/pip", "install", "-r", "backend/requirements.txt"]
-    if not run_command(pip_cmd):
-        print("❌ Failed to install dependencies!")
+        if key:
+            cache.save("frontend", key, "frontend/build")
+        print("✅ Frontend built successfully!")
+
+    if not prepare_venv(cache):
         sys.exit(1)
-    
+
     # Start the server
     print("🌶️  Starting integrated Flask server...")
     print("🌐 Server will be available at: http://localhost:5000")
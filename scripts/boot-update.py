@@ -15,6 +15,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
 from config_manager import ConfigManager
 from ota_manager import OTAManager
+from release_manager import ReleaseManager
+from boot_orchestrator import BootOrchestrator
 
 def setup_logging():
     """Setup logging configuration"""
@@ -39,11 +41,20 @@ def main():
     
     try:
         # Initialize managers
-        config_manager = ConfigManager()
+        config_manager = ConfigManager(os.getenv('DASHBOARD_CONFIG_FILE', 'device_config.json'))
         ota_manager = OTAManager(config_manager)
+        # The service is not running yet, so a worktree release is just switched to
+        ota_manager.release_manager = ReleaseManager(ota_manager)
+        orchestrator = BootOrchestrator(
+            ota_manager,
+            os.path.join(config_manager.get_data_dir(), 'boot_state.json')
+        )
         
-        # Perform boot update check
-        result = ota_manager.perform_boot_update()
+        # Perform boot update check (skipped if app.py already ran it this boot)
+        result = orchestrator.run_boot_update()
+        phase = orchestrator.get_report()['phases'].get('boot_update', {})
+        if phase:
+            logger.info(f"Boot update check took {phase.get('duration', 0):.1f}s")
         
         if result.get('skipped'):
             logger.info(f"Boot update skipped: {result.get('reason', 'Unknown')}")
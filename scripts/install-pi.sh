@@ -131,7 +131,15 @@ Group=$CURRENT_USER
 WorkingDirectory=$INSTALL_DIR/backend
 Environment=DISPLAY=:0
 Environment=HOME=$HOME
-ExecStart=$INSTALL_DIR/backend/venv/bin/python app.py
+# Every release shares the main checkout's config, data and secrets; each has
+# its own venv link, built for its requirements
+Environment=DASHBOARD_CONFIG_FILE=$INSTALL_DIR/backend/device_config.json
+Environment=DASHBOARD_DATA_DIR=$INSTALL_DIR/backend/data
+EnvironmentFile=-$INSTALL_DIR/backend/.env
+# Lets a zero-downtime OTA handover name the new process as the main one
+NotifyAccess=main
+# Serve the release 'current' points at (worktree OTA mode), else this checkout
+ExecStart=/bin/sh -c 'cd $INSTALL_DIR/releases/current/backend 2>/dev/null || cd $INSTALL_DIR/backend; exec venv/bin/python app.py'
 Restart=always
 RestartSec=10
 